@@ -2,10 +2,16 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
-from psycopg import connect
-from config.settings import DB_CONFIG
-from utils.auth import hash_password, verify_password, create_jwt, verify_jwt
+from utils.auth import (
+    create_jwt, decode_user_id, hash_password_async, verify_jwt, verify_password_async,
+)
+from utils.circuit_breaker import CircuitOpenError
+from utils.logger import setup_logger
+from utils.user_store import EmailTaken, create_user, get_credentials, get_user
+
+logger = setup_logger("startupscout.auth")
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -27,38 +33,39 @@ class MeOut(BaseModel):
 # ---------------------------------------------------------------------------
 # Handlers
 # ---------------------------------------------------------------------------
+def _db_unavailable(e: Exception) -> HTTPException:
+    logger.error("User store unavailable: %s", e)
+    return HTTPException(status_code=503, detail="Database unavailable.")
+
 @router.post("/register")
-def register(payload: RegisterIn):
+async def register(payload: RegisterIn):
     email = payload.email.lower().strip()
-    pw_hash = hash_password(payload.password)
-
-    with connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM users WHERE email = %s", (email,))
-            if cur.fetchone():
-                raise HTTPException(status_code=400, detail="Email already registered.")
-            cur.execute(
-                "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id",
-                (email, pw_hash),
-            )
-            uid = cur.fetchone()[0]
+    # PBKDF2 runs on the hashing pool; DB calls on the threadpool
+    pw_hash = await hash_password_async(payload.password)
+
+    try:
+        uid = await run_in_threadpool(create_user, email, pw_hash)
+    except EmailTaken:
+        raise HTTPException(status_code=400, detail="Email already registered.")
+    except (CircuitOpenError, RuntimeError) as e:
+        raise _db_unavailable(e)
 
     token = create_jwt({"sub": uid, "email": email})
     return {"token": token}
 
 @router.post("/login")
-def login(payload: LoginIn):
+async def login(payload: LoginIn):
     email = payload.email.lower().strip()
 
-    with connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, password_hash FROM users WHERE email = %s", (email,))
-            row = cur.fetchone()
-            if not row:
-                raise HTTPException(status_code=401, detail="Invalid credentials.")
-            uid, pw_hash = row
+    try:
+        row = await run_in_threadpool(get_credentials, email)
+    except (CircuitOpenError, RuntimeError) as e:
+        raise _db_unavailable(e)
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid credentials.")
+    uid, pw_hash = row
 
-    if not verify_password(payload.password, pw_hash):
+    if not await verify_password_async(payload.password, pw_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials.")
 
     token = create_jwt({"sub": uid, "email": email})
@@ -70,10 +77,20 @@ def get_current_user(x_auth_token: str | None = Header(default=None)) -> MeOut:
     payload = verify_jwt(x_auth_token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid/expired token.")
+    uid = decode_user_id(payload)
+    if not isinstance(uid, int):
+        raise HTTPException(status_code=401, detail="Invalid token payload.")
+
+    try:
+        user = get_user(uid)
+    except Exception as e:
+        # Token is verified; answer from its claims while the DB is unreachable
+        logger.warning("User lookup failed, using token claims: %s", e)
+        user = {"id": uid, "email": payload.get("email")}
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unknown user.")
     try:
-        uid = int(payload["sub"])
-        email = payload.get("email")
-        return MeOut(user_id=uid, email=email)  # type: ignore[arg-type]
+        return MeOut(user_id=uid, email=user["email"])  # type: ignore[arg-type]
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token payload.")
 
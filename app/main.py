@@ -1,31 +1,75 @@
 # app/main.py
 import os
+import json
 import time
 import uuid
+import asyncio
+import threading
 import traceback
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime, timezone
+from contextlib import asynccontextmanager, contextmanager
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 from fastapi import FastAPI, Query, Request, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field
 from psycopg.errors import DatabaseError
 from psycopg_pool import ConnectionPool
-from openai import OpenAI
 
-from config.settings import DB_CONFIG, OPENAI_API_KEY
 from app.search import router as search_router
 from app.auth import router as auth_router
-from utils.embeddings import get_embedding
-from utils.logger import setup_logger
+from utils.admission import AdmissionRejected, admission_get_stats, admit, set_request_priority
+from utils.circuit_breaker import CircuitOpenError, breaker_get_stats
+from utils.db import db_get_stats, get_pool, pool_connection, refresh_capabilities
+from utils.embeddings import get_embedding, get_embeddings, is_degraded
+from utils.health import DOWN, UNKNOWN, UP, dependency_status, is_ready, start_health_prober, stop_health_prober
+from utils.logger import logging_get_stats, setup_logger
+from utils.observability.langfuse import lf_log_event, lf_trace, shutdown_tracing, tracing_get_stats
 from utils.cache import cache_result, cache_get_stats, cache_clear
-from utils.chat_store import ensure_session, add_message, get_history, clear_history
-from utils.rerank import derive_keywords, keyword_score, evidence_bonus
-from utils.cross_rerank import rerank as cross_rerank
-from utils.auth import verify_jwt
-
-
-app = FastAPI(title="StartupScout API", version="1.0.0")
+from utils.warmup import start_warmup, stop_warmup, warmup_get_stats
+from utils.completion_cache import cached_completion, completion_cache_clear, completion_cache_get_stats
+from utils.llm_gateway import LLM_PROVIDERS, close_gateway, complete as llm_complete, gateway_get_stats
+from utils.context_builder import build_context, count_tokens
+from utils.conversation import build_history, history_get_stats, stop_history_folds
+from utils.chat_store import (
+    ensure_session, add_message, get_history, latest_message_id, clear_history,
+    chat_store_get_stats, stop_chat_writer,
+)
+from utils.rate_limiter import RateLimitMiddleware, charge_request
+from utils.queries import queries_get_stats
+from utils.rerank import derive_keywords
+from utils.stage_timing import ServerTimingMiddleware, stage, stage_get_stats
+from utils.profiler import (
+    ProfilerBusy, ProfilerMiddleware, collapsed_stacks, last_profile, start_profile, stop_profile,
+)
+from utils.retrieval import fetch_candidates, fetch_candidates_batch, rank_candidates
+from utils.auth import (
+    auth_get_stats, decode_user_id, password_pool_get_stats, shutdown_password_pool, start_password_pool,
+    verify_jwt,
+)
+from utils.user_store import user_store_get_stats
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    # Nothing here blocks the first request: the pool is opened (and warm-up
+    # and the hashing workers started) on a background thread; LLM/Redis
+    # clients connect on first use.
+    threading.Thread(target=_open_pool_and_warm, name="startup", daemon=True).start()
+    start_health_prober(_db_pool)
+    yield
+    stop_health_prober()
+    stop_warmup()
+    close_gateway()
+    stop_history_folds()
+    stop_chat_writer()
+    shutdown_password_pool()
+    shutdown_tracing()
+
+
+app = FastAPI(title="StartupScout API", version="1.0.0", lifespan=_lifespan)
 logger = setup_logger("startupscout.api")
 
 # Startup logging
@@ -43,6 +87,17 @@ allow_origins = (
     [o.strip() for o in _allowed_origins.split(",")] if _allowed_origins else _default_origins
 )
 
+# Middleware added last runs outermost.
+# Per-stage Server-Timing header (SERVER_TIMING_ENABLED); added first so it is
+# innermost and `total` times the app itself, not the middlewares around it
+app.add_middleware(ServerTimingMiddleware)
+
+# On-demand sampling profiler (/admin/profile or an `x-profile: <admin key>` header)
+app.add_middleware(ProfilerMiddleware, admin_key=lambda: ADMIN_API_KEY)
+
+# Rate limiting (GCRA; RATE_LIMIT_ENABLED). Added before CORS so 429s still get CORS headers.
+app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware with comprehensive configuration
 app.add_middleware(
     CORSMiddleware,
@@ -78,42 +133,21 @@ SESSION_COOKIE = "scout_sid"
 SESSION_TTL_SEC = 7 * 24 * 3600
 IS_PROD = os.getenv("ENV") == "prod"
 
-# OpenAI client
-oai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 STYLE_SYSTEM = (
     "You are StartupScout, a pragmatic startup advisor. Write in crisp, confident, non-generic language. "
     "Prefer short sentences. Lead with specifics. Avoid hedging and filler. "
     "Use bullets when listing. Keep quotes ≤ 10 words. Include [n] citations matching the provided context."
 )
 
-def _build_conninfo(cfg: Dict[str, Any]) -> str:
-    if "dsn" in cfg and cfg["dsn"]:
-        return cfg["dsn"]
-    host = cfg.get("host", "localhost")
-    port = cfg.get("port", 5432)
-    dbname = cfg.get("dbname") or cfg.get("database") or "postgres"
-    user = cfg.get("user") or cfg.get("username") or "postgres"
-    password = cfg.get("password", "")
-    return f"host={host} port={port} dbname={dbname} user={user} password={password}"
+# Shared connection pool (also used by /search); created on first use
+POOL: Optional[ConnectionPool] = None
 
 
-POOL: Optional[ConnectionPool] = None
-try:
-    conninfo = _build_conninfo(DB_CONFIG)
-    logger.info(f"Connecting to database: {DB_CONFIG.get('host', 'unknown')}:{DB_CONFIG.get('port', 5432)}/{DB_CONFIG.get('dbname', 'unknown')}")
-    logger.info(f"Database URL: {os.getenv('DATABASE_URL', 'Not set')[:50]}...")
-    
-    POOL = ConnectionPool(
-        conninfo=conninfo,
-        min_size=int(os.getenv("DB_POOL_MIN", "1")),
-        max_size=int(os.getenv("DB_POOL_MAX", "10")),
-        timeout=int(os.getenv("DB_POOL_TIMEOUT_SEC", "10")),
-        max_idle=int(os.getenv("DB_POOL_MAX_IDLE", "30")),
-    )
-    logger.info("Database connection pool initialized successfully.")
-except Exception as e:
-    logger.exception("Failed to initialize DB pool: %s", e)
+def _db_pool() -> Optional[ConnectionPool]:
+    global POOL
+    if POOL is None:
+        POOL = get_pool()
+    return POOL
 
 
 def _get_session_id(request: Request) -> str:
@@ -154,18 +188,24 @@ async def all_exception_handler(request: Request, exc: Exception):
 
 @app.get("/health")
 def health_check():
-    db_status = "unreachable"
-    if POOL is not None:
-        try:
-            with POOL.connection() as conn, conn.cursor() as cur:
-                cur.execute("SELECT 1;")
-                cur.fetchone()
-            db_status = "connected"
-        except Exception:
-            db_status = "unreachable"
+    """Liveness, from the background prober's cache (never touches the DB)."""
+    deps = dependency_status()
+    pg = deps.get("postgres", {}).get("status", UNKNOWN)
+    db_status = {UP: "connected", DOWN: "unreachable"}.get(pg, UNKNOWN)
 
     uptime = round(time.time() - START_TIME, 1)
-    return {"status": "ok", "uptime_sec": uptime, "db": db_status}
+    return {"status": "ok", "uptime_sec": uptime, "db": db_status, "dependencies": deps}
+
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness: 503 until every critical dependency's last probe succeeded."""
+    deps = dependency_status()
+    ready = is_ready(deps)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "dependencies": deps},
+    )
 
 
 @app.post("/import-local-data")
@@ -182,11 +222,12 @@ def import_local_data():
 @app.post("/fix-schema")
 def fix_schema():
     """Fix database schema by adding missing columns"""
-    if POOL is None:
+    pool = _db_pool()
+    if pool is None:
         raise HTTPException(status_code=503, detail="Database unavailable.")
     
     try:
-        with POOL.connection() as conn, conn.cursor() as cur:
+        with pool.connection() as conn, conn.cursor() as cur:
             # Add missing columns if they don't exist
             columns_to_add = [
                 "ALTER TABLE decisions ADD COLUMN IF NOT EXISTS summary TEXT",
@@ -316,197 +357,87 @@ def fix_schema():
         raise HTTPException(status_code=500, detail=f"Schema fix failed: {str(e)}")
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus exposition (stage histograms, LLM, admission, health probes)."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/stats")
 def stats():
     return {
         "requests": REQUEST_COUNT,
         "uptime_sec": round(time.time() - START_TIME, 1),
         "cache": cache_get_stats(),
+        "warmup": warmup_get_stats(),
+        "completion_cache": completion_cache_get_stats(),
+        "llm": gateway_get_stats(),
+        "circuit_breakers": breaker_get_stats(),
+        "admission": admission_get_stats(),
+        "chat_writes": chat_store_get_stats(),
+        "stages": stage_get_stats(),
+        "logging": logging_get_stats(),
+        "tracing": tracing_get_stats(),
+        "history": history_get_stats(),
+        "db": {**db_get_stats(), "statements": queries_get_stats()},
+        "auth": {
+            "tokens": auth_get_stats(),
+            "users": user_store_get_stats(),
+            "password_hashing": password_pool_get_stats(),
+        },
     }
 
 
-def _clip(s: Optional[str], n: int) -> str:
-    if not s:
-        return ""
-    s2 = " ".join(s.split())
-    return (s2[:n] + "…") if len(s2) > n else s2
-
-
-def _comments_top(c: Any, k: int = 3) -> str:
-    if not c:
-        return ""
-    if isinstance(c, list):
-        c = c[:k]
-        return "\n".join(f"- {str(x)[:200]}" for x in c)
-    return ""
-
-
-def _prepare_session(cur) -> None:
-    timeout_ms = int(os.getenv("PG_STMT_TIMEOUT_MS", "3000"))
-    cur.execute(f"SET LOCAL statement_timeout = '{timeout_ms}ms';")
-
-
-def _recency_score(fetched_at) -> float:
-    if not fetched_at or not isinstance(fetched_at, datetime):
-        return 0.0
-    try:
-        fa = fetched_at if fetched_at.tzinfo else fetched_at.replace(tzinfo=timezone.utc)
-        age_days = (datetime.now(timezone.utc) - fa).days
-    except Exception:
-        return 0.0
-    if age_days <= 0:
-        return 1.0
-    if age_days >= 365:
-        return 0.3
-    return max(0.3, 1.0 - (age_days / 365.0) * 0.7)
-
-
-def _bm25_available(cur) -> bool:
-    try:
-        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname='pg_bm25');")
-        return bool(cur.fetchone()[0])
-    except Exception:
-        return False
-
-
-def _build_tsquery(cur, q: str) -> Tuple[str, str]:
-    lang = os.getenv("TS_LANG", "english")
-    tsv = f"to_tsvector('{lang}', coalesce(title,'') || ' ' || coalesce(decision,'') || ' ' || coalesce(content,''))"
-    tsq = f"websearch_to_tsquery('{lang}', %s)"
-    return tsv, tsq
-
-
-@app.get("/ask")
-@cache_result(ttl=60)
-def ask(
-    request: Request,
-    question: str = Query(..., description="Ask a startup-related question"),
-    top_k: int = Query(5, ge=1, le=10, description="Top-K similar items to return"),
-    x_auth_token: Optional[str] = Header(default=None, convert_underscores=False),
-):
-    logger.info(f"ASK REQUEST: '{question}' (top_k={top_k})")
-    
-    # Normalize input
+def _normalize_question(question: Optional[str]) -> str:
     q = (question or "").strip()
     if not q:
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
     if len(q) > 1000:
         q = q[:1000]
-    q = " ".join(q.split())
-    logger.info(f"Normalized question: '{q}'")
+    return " ".join(q.split())
 
-    # Optional user id
-    user_id: Optional[int] = None
-    if x_auth_token:
-        payload = verify_jwt(x_auth_token)
-        if payload:
-            try:
-                user_id = int(payload["sub"])
-                logger.info(f"Authenticated user: {user_id}")
-            except Exception:
-                user_id = None
 
-    # Embedding
-    logger.info("Generating embedding...")
+def _embed_question(q: str) -> Optional[List[float]]:
+    """Query vector, or None when embeddings are degraded (retrieval goes lexical-only)."""
+    logger.debug("Generating embedding...")
     try:
-        q_vec, model = get_embedding(q)
-        logger.info(f"Embedding generated: {len(q_vec) if q_vec else 0} dimensions, model: {model}")
+        with admit("embed"), stage("embed"):
+            q_vec, model = get_embedding(q)
+        logger.debug("Embedding generated: %d dimensions, model: %s", len(q_vec) if q_vec else 0, model)
         if not q_vec:
             raise ValueError("Empty embedding returned.")
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error("Embedding generation failed: %s", e)
         raise HTTPException(status_code=500, detail="Embedding generation failed.")
+    return None if is_degraded(model) else q_vec
 
-    if POOL is None:
-        logger.error("Database pool is None!")
-        raise HTTPException(status_code=503, detail="Database unavailable.")
 
-    # Recall + floors
+def _retrieval_params(top_k: int, has_vector: bool) -> Tuple[int, float, int]:
+    """(fetch_k, min_sim, rrf_k) for one question."""
     fetch_k = min(20, max(top_k * 3, top_k + 7))
-    min_sim = float(os.getenv("MIN_SIMILARITY", "0.35"))
+    # Lexical-only rows carry sim=0, so the floor only applies with a real vector
+    min_sim = float(os.getenv("MIN_SIMILARITY", "0.35")) if has_vector else 0.0
     rrf_k = int(os.getenv("RRF_K", "60"))
-    logger.info(f"Search parameters: fetch_k={fetch_k}, min_sim={min_sim}, rrf_k={rrf_k}")
+    return fetch_k, min_sim, rrf_k
 
-    kws = derive_keywords(q)
-    kw_patterns = [f"%{kw}%" for kw in kws][:8] or [f"%{q[:32]}%"]
-    logger.info(f"Derived keywords: {kws}")
-    logger.info(f"Keyword patterns: {kw_patterns}")
 
-    # Hybrid candidate fetch: vector + BM25 (or ts_rank) + ILIKE
+@contextmanager
+def _retrieval_db(pool: Optional[ConnectionPool]) -> Iterator[Any]:
+    """Admitted pooled cursor; DB failures become 503/500 HTTPExceptions."""
+    if pool is None:
+        logger.error("Database pool is None!")
+        raise HTTPException(status_code=503, detail="Database unavailable.")
     try:
-        logger.info("Starting database queries...")
-        with POOL.connection() as conn, conn.cursor() as cur:
-            _prepare_session(cur)
-            logger.info("Database session prepared")
-
-            # Vector ANN
-            logger.info("Executing vector similarity search...")
-            cur.execute(
-                """
-                SELECT
-                    id, title, decision, summary, content, comments, tags, stage, source, url,
-                    1 - (embedding <=> %s::vector) AS sim, fetched_at
-                FROM decisions
-                WHERE embedding IS NOT NULL
-                ORDER BY embedding <-> %s::vector
-                LIMIT %s;
-                """,
-                (q_vec, q_vec, fetch_k),
-            )
-            vec_rows = cur.fetchall()
-            logger.info(f"Vector search returned {len(vec_rows)} results")
-
-            # BM25 (if available) else ts_rank
-            has_bm25 = _bm25_available(cur)
-            logger.info(f"BM25 available: {has_bm25}")
-            tsv, tsq = _build_tsquery(cur, q)
-            if has_bm25:
-                bm25_sql = f"""
-                    SELECT
-                        id, title, decision, summary, content, comments, tags, stage, source, url,
-                        0.0 AS sim, fetched_at,
-                        bm25({tsv}, {tsq}) AS bm25_score
-                    FROM decisions
-                    WHERE {tsv} @@ {tsq}
-                    ORDER BY bm25_score DESC
-                    LIMIT %s;
-                """
-            else:
-                bm25_sql = f"""
-                    SELECT
-                        id, title, decision, summary, content, comments, tags, stage, source, url,
-                        0.0 AS sim, fetched_at,
-                        ts_rank({tsv}, {tsq}) AS bm25_score
-                    FROM decisions
-                    WHERE {tsv} @@ {tsq}
-                    ORDER BY bm25_score DESC
-                    LIMIT %s;
-                """
-            # tsq appears twice → two %s plus LIMIT
-            logger.info("Executing BM25/ts_rank search...")
-            cur.execute(bm25_sql, (q, q, fetch_k))
-            bm25_rows = cur.fetchall()
-            logger.info(f"BM25/ts_rank search returned {len(bm25_rows)} results")
-
-            # Keyword ILIKE (broad)
-            logger.info("Executing keyword ILIKE search...")
-            cur.execute(
-                """
-                SELECT
-                    id, title, decision, summary, content, comments, tags, stage, source, url,
-                    0.0 AS sim, fetched_at
-                FROM decisions
-                WHERE (title ILIKE ANY(%s) OR decision ILIKE ANY(%s) OR content ILIKE ANY(%s))
-                ORDER BY fetched_at DESC NULLS LAST
-                LIMIT %s;
-                """,
-                (kw_patterns, kw_patterns, kw_patterns, fetch_k),
-            )
-            kw_rows = cur.fetchall()
-            logger.info(f"Keyword search returned {len(kw_rows)} results")
-            
-            logger.info(f"Total results: vec={len(vec_rows)}, bm25={len(bm25_rows)}, kw={len(kw_rows)}")
-            
+        logger.debug("Starting database queries...")
+        with admit("db"), pool_connection(pool) as conn, conn.cursor() as cur:
+            yield cur
+    except (AdmissionRejected, HTTPException):
+        raise
+    except CircuitOpenError as e:
+        logger.error("Database unavailable in /ask: %s", e)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
     except DatabaseError as e:
         logger.error("Database error in /ask: %s", e)
         raise HTTPException(status_code=500, detail="Database query failed.")
@@ -514,126 +445,86 @@ def ask(
         logger.error("Unexpected DB error in /ask: %s", e)
         raise HTTPException(status_code=500, detail="Database query failed.")
 
+
+def _rank_rows(
+    q: str, kws: List[str], candidates: tuple, top_k: int, has_vector: bool
+) -> Tuple[List[tuple], List[float], Dict[Any, List[str]], Optional[str]]:
+    """Ranking + similarity floor over one question's fetched candidates (see _select_rows)."""
+    vec_rows, bm25_rows, kw_rows, passages = candidates
+    logger.debug("Total results: vec=%d, bm25=%d, kw=%d", len(vec_rows), len(bm25_rows), len(kw_rows))
     if not (vec_rows or bm25_rows or kw_rows):
         logger.warning("No results found from any search method!")
-        return {"question": q, "answer": "No related startup cases found.", "references": []}
-
-    # Build rank maps for RRF
-    def _rank_map(rows: List[tuple]) -> Dict[Any, int]:
-        return {(r[9] or (r[1], r[8])): i + 1 for i, r in enumerate(rows)}
-
-    vec_rank = _rank_map(vec_rows)
-    bm25_rank = _rank_map(bm25_rows)
-    kw_rank = _rank_map(kw_rows)
-
-    # Merge by key and keep best vector sim per key
-    merged: Dict[Any, Dict[str, Any]] = {}
-    for source_rows, tag in [(vec_rows, "vec"), (bm25_rows, "bm25"), (kw_rows, "kw")]:
-        for r in source_rows:
-            key = (r[9] or (r[1], r[8]))
-            if key not in merged:
-                merged[key] = {
-                    "row": r,
-                    "sim": float(r[10]),
-                    "bm25": 0.0,
-                    "vec_rank": vec_rank.get(key),
-                    "bm25_rank": bm25_rank.get(key),
-                    "kw_rank": kw_rank.get(key),
-                }
-            else:
-                if float(r[10]) > merged[key]["sim"]:
-                    merged[key]["row"] = r
-                    merged[key]["sim"] = float(r[10])
-                if tag == "vec":
-                    merged[key]["vec_rank"] = vec_rank.get(key)
-                elif tag == "bm25":
-                    merged[key]["bm25_rank"] = bm25_rank.get(key)
-                else:
-                    merged[key]["kw_rank"] = kw_rank.get(key)
-
-    # Attach bm25 score
-    bm25_scores: Dict[Any, float] = {}
-    for r in bm25_rows:
-        key = (r[9] or (r[1], r[8]))
-        bm25_scores[key] = float(r[12]) if len(r) > 12 and r[12] is not None else 0.0
-    for k in merged.keys():
-        merged[k]["bm25"] = bm25_scores.get(k, 0.0)
-
-    # Cross-encoder inputs
-    candidates = list(merged.values())
-    logger.info(f"Processing {len(candidates)} candidates for reranking")
-    blobs: List[Tuple[str, str]] = []
-    for c in candidates:
-        r = c["row"]
-        title, decision, summary, content = r[1], r[2], r[3], r[4]
-        blob = " ".join(t for t in (decision, summary, content) if t)[:2000]
-        blobs.append((title or "", blob or ""))
-
-    logger.info("Starting cross-encoder reranking...")
-    try:
-        ce_scores = cross_rerank(q, blobs)  # 0..1 list aligned to candidates
-        logger.info(f"Cross-encoder reranking completed, scores: {[f'{s:.3f}' for s in ce_scores[:5]]}")
-    except Exception as e:
-        logger.warning("Cross-encoder rerank failed, falling back to zeros: %s", e)
-        ce_scores = [0.0] * len(candidates)
-
-    def rrf(rank: Optional[int]) -> float:
-        if rank is None:
-            return 0.0
-        return 1.0 / (rrf_k + rank)
-
-    # Score and rank
-    logger.info("Calculating final scores...")
-    scored: List[Tuple[float, tuple]] = []
-    for (c, ce) in zip(candidates, ce_scores):
-        r = c["row"]
-        title, decision, summary, content = r[1], r[2], r[3], r[4]
-        sim = float(c["sim"])
-        rec = _recency_score(r[11])
-        text = " ".join(t for t in (title, decision, summary, content) if t)
-        kw = keyword_score(text, kws)               # 0..1
-        ev = evidence_bonus(text)                   # 0..0.05
-        rrf_score = rrf(c["vec_rank"]) + rrf(c["bm25_rank"]) + rrf(c["kw_rank"])
-
-        # Weighted hybrid + small evidence nudge
-        score = (0.50 * ce) + (0.22 * rrf_score) + (0.18 * sim) + (0.07 * kw) + (0.03 * rec) + ev
-        scored.append((score, r))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
-    logger.info(f"Top 3 scores: {[f'{s[0]:.3f}' for s in scored[:3]]}")
-    
-    rows = [r for _, r in scored[:max(top_k * 2, top_k + 3)]]
-    logger.info(f"Candidates before similarity filter: {len(rows)}")
+        return [], [], {}, "No related startup cases found."
+
+    _, min_sim, rrf_k = _retrieval_params(top_k, has_vector)
+    scored = rank_candidates(q, kws, vec_rows, bm25_rows, kw_rows, rrf_k)
+
+    scored = scored[:max(top_k * 2, top_k + 3)]
+    logger.debug("Candidates before similarity filter: %d", len(scored))
 
     # Real similarity floor (fixes earlier 'or True')
-    rows = [r for r in rows if float(r[10]) >= min_sim]
-    logger.info(f"Candidates after similarity filter (min_sim={min_sim}): {len(rows)}")
-    
-    rows = rows[:top_k]
-    logger.info(f"Final selected rows: {len(rows)}")
-    
-    if not rows:
-        logger.warning(f"No rows passed similarity threshold (min_sim={min_sim})")
-        return {"question": q, "answer": "Not enough relevant context found.", "references": []}
-
-    # Build context
-    blocks = []
-    for i, r in enumerate(rows, start=1):
-        _id, title, decision, summary, content, comments, tags, stage, source, url, sim, fetched_at = r
-        block = (
-            f"[{i}] {title} | source: {source or '-'} | tags: {tags or '-'} | "
-            f"stage: {stage or '-'} | sim≈{float(sim):.2f}\n"
-            f"Decision: {_clip(decision, 700)}\n"
-            f"Summary:  {_clip(summary, 400)}\n"
-            f"Content:  {_clip(content, 600)}\n"
-            f"Comments:\n{_comments_top(comments)}"
-        )
-        blocks.append(block)
-    context_str = "\n\n".join(blocks)
+    scored = [(s, r) for s, r in scored if float(r[10]) >= min_sim]
+    logger.debug("Candidates after similarity filter (min_sim=%s): %d", min_sim, len(scored))
+
+    scored = scored[:top_k]
+    logger.debug("Final selected rows: %d", len(scored))
+
+    if not scored:
+        logger.warning("No rows passed similarity threshold (min_sim=%s)", min_sim)
+        return [], [], {}, "Not enough relevant context found."
+    return [r for _, r in scored], [s for s, _ in scored], passages, None
+
+
+def _select_rows(
+    q: str, q_vec: Optional[List[float]], top_k: int
+) -> Tuple[List[tuple], List[float], Dict[Any, List[str]], Optional[str]]:
+    """
+    Hybrid retrieval + ranking + similarity floor for one question.
+    Returns (rows, scores, passages, no_context_answer); the last is set when nothing usable was found.
+    """
+    fetch_k, min_sim, rrf_k = _retrieval_params(top_k, q_vec is not None)
+    logger.debug("Search parameters: fetch_k=%d, min_sim=%s, rrf_k=%d", fetch_k, min_sim, rrf_k)
+
+    kws = derive_keywords(q)
+    logger.debug("Derived keywords: %s", kws)
+
+    # Hybrid candidate fetch: vector + BM25 (or ts_rank) + ILIKE
+    with _retrieval_db(_db_pool()) as cur:
+        candidates = fetch_candidates(cur, q, q_vec, kws, fetch_k)
+    return _rank_rows(q, kws, candidates, top_k, q_vec is not None)
+
+
+def _fetch_batch(
+    vectors: Dict[str, Optional[List[float]]], top_k: int
+) -> Dict[str, Tuple[List[str], tuple]]:
+    """Candidates for every batch question in one admitted pooled pass: {q: (keywords, candidates)}."""
+    fetch_k, _, _ = _retrieval_params(top_k, True)
+    items = [(q, v, derive_keywords(q)) for q, v in vectors.items()]
+    with _retrieval_db(_db_pool()) as cur:
+        fetched = fetch_candidates_batch(cur, items, fetch_k)
+    return {q: (kws, candidates) for (q, _, kws), candidates in zip(items, fetched)}
+
+
+def _generate_answer(
+    q: str, rows: List[tuple], scores: List[float], passages: Dict[Any, List[str]],
+    history: str = "",
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Build the grounded prompt from the selected rows and call the LLM.
+    `history` (conversational mode) is the bounded conversation slice from
+    utils/conversation.py. Returns (answer, usage) with local token counts.
+    """
+    with stage("context"):
+        context_str, usage = build_context(rows, scores, passages)
+    history_block = (
+        "Conversation so far (for resolving follow-ups; not a source):\n"
+        f"{history}\n\n"
+    ) if history else ""
 
     prompt = (
         "Use ONLY the context. If it's insufficient, say so briefly and ask a pointed follow-up.\n\n"
         f"Context:\n{context_str}\n\n"
+        f"{history_block}"
         f"User question:\n{q}\n\n"
         "Respond with exactly this structure:\n"
         "1) 3–5 bullet insights (each ends with [n] and one short quote \"...\") \n"
@@ -641,31 +532,56 @@ def ask(
         "Rules: short sentences; no fluff; contrast viewpoints when present."
     )
 
+    usage["prompt_tokens"] = count_tokens(STYLE_SYSTEM) + count_tokens(prompt)
+    logger.debug(
+        "Prompt built: prompt_tokens=%d context_tokens=%d dropped_sentences=%d",
+        usage["prompt_tokens"], usage["context_tokens"], usage["dropped_sentences"],
+    )
+
     llm_model = os.getenv("LLM_MODEL", "gpt-4o-mini")
     llm_temp = float(os.getenv("LLM_TEMPERATURE", "0.18"))
     max_tokens = int(os.getenv("LLM_MAX_TOKENS", "600"))
-    client = oai_client.with_options(timeout=int(os.getenv("OPENAI_TIMEOUT_SEC", "20")))
+
+    messages = [
+        {"role": "system", "content": STYLE_SYSTEM},
+        {"role": "user", "content": prompt},
+    ]
+
+    primary = LLM_PROVIDERS[0] if LLM_PROVIDERS else ""
+    answered_by: List[str] = []
+
+    def _create() -> str:
+        # Hedged + provider fallback; see utils/llm_gateway.py
+        with admit("llm"):
+            content, provider = llm_complete(
+                messages, model=llm_model, temperature=llm_temp, max_tokens=max_tokens
+            )
+        logger.debug("Answer generated by provider=%s", provider)
+        answered_by.append(provider)
+        return content
 
     try:
-        response = client.chat.completions.create(
-            model=llm_model,
-            messages=[
-                {"role": "system", "content": STYLE_SYSTEM},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=llm_temp,
-            max_tokens=max_tokens,
-        )
-        answer = (response.choices[0].message.content or "").strip()
+        with stage("llm"):
+            # Keyed on the primary provider; a fallback answer is served but not cached
+            answer, usage["completion_cached"] = cached_completion(
+                _create, provider=primary, model=llm_model, messages=messages,
+                temperature=llm_temp, max_tokens=max_tokens,
+                store=lambda: answered_by == [primary],
+            )
+        answer = answer.strip()
         if not answer:
             answer = "Not enough grounded context to answer confidently."
         # Keep newlines; avoid collapsing bullets
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        logger.error("OpenAI API call failed: %s", e)
+        logger.error("LLM call failed: %s", e)
         raise HTTPException(status_code=502, detail="Failed to fetch answer from LLM.")
+    return answer, usage
 
-    # References
-    slim_refs: List[Dict[str, Any]] = [
+
+def _slim_refs(rows: List[tuple]) -> List[Dict[str, Any]]:
+    return [
         {
             "id": r[0],
             "title": r[1],
@@ -678,50 +594,226 @@ def ask(
         for r in rows
     ]
 
-    # Persist chat turns (best-effort)
+
+@app.get("/ask")
+@cache_result(ttl=60, bypass="conversational")
+def ask(
+    request: Request,
+    question: str = Query(..., description="Ask a startup-related question"),
+    top_k: int = Query(5, ge=1, le=10, description="Top-K similar items to return"),
+    conversational: bool = Query(False, description="Use this session's earlier turns as context"),
+    x_auth_token: Optional[str] = Header(default=None, convert_underscores=False),
+):
+    logger.debug("ASK REQUEST: %r (top_k=%d)", question, top_k)
+
+    # Normalize input
+    q = _normalize_question(question)
+    logger.debug("Normalized question: %r", q)
+
+    # Optional user id
+    user_id: Optional[int] = None
+    if x_auth_token:
+        uid = decode_user_id(verify_jwt(x_auth_token))
+        if isinstance(uid, int):
+            user_id = uid
+            logger.debug("Authenticated user: %s", user_id)
+    set_request_priority(user_id is not None)
+
     sid = _get_session_id(request)
+    with lf_trace("ask", user_id=user_id, session_id=sid, input_text=q,
+                  metadata={"top_k": top_k, "conversational": conversational}) as (trace, _):
+        result = _answer(q, top_k, sid, user_id, conversational)
+        lf_log_event(trace, "ask.usage", result.get("usage") or {})
+    return result
+
+
+def _answer(q: str, top_k: int, sid: str, user_id: Optional[int], conversational: bool) -> Dict[str, Any]:
+    """Retrieval, generation and chat persistence for one /ask (traced by the caller)."""
+    q_vec = _embed_question(q)
+    rows, scores, passages, no_context = _select_rows(q, q_vec, top_k)
+    if no_context:
+        return {"question": q, "answer": no_context, "references": []}
+
+    history, history_stats = "", {}
+    if conversational:
+        try:
+            ensure_session(sid, user_id=user_id)
+            with stage("history"):
+                history, history_stats = build_history(sid)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            logger.warning("Conversation history unavailable, answering standalone: %s", e)
+
+    answer, usage = _generate_answer(q, rows, scores, passages, history=history)
+    usage.update(history_stats)
+    slim_refs = _slim_refs(rows)
+
+    # Persist chat turns (queued; written in batches off the request path)
     try:
-        ensure_session(sid, user_id=user_id)
-        now_ms = int(time.time() * 1000)
-        add_message(sid, "user", q, now_ms, None, user_id=user_id)
-        add_message(
-            sid,
-            "assistant",
-            answer,
-            now_ms + 1,
-            {"references": slim_refs},
-            user_id=user_id,
-        )
+        with stage("persist"):
+            ensure_session(sid, user_id=user_id)
+            now_ms = int(time.time() * 1000)
+            add_message(sid, "user", q, now_ms, None, user_id=user_id)
+            add_message(
+                sid,
+                "assistant",
+                answer,
+                now_ms + 1,
+                {"references": slim_refs},
+                user_id=user_id,
+            )
     except Exception as e:
         logger.warning("Chat persistence failed: %s", e)
 
+    logger.debug("/ask ok qlen=%d top_k=%d used=%d", len(q), top_k, len(rows))
+
+    return {"question": q, "answer": answer, "references": slim_refs, "usage": usage}
+
+
+def _warm_answer(q: str) -> Optional[Dict[str, Any]]:
+    """/ask result for the warm-up job; None when there is no usable context."""
+    q = _normalize_question(q)
+    rows, scores, passages, no_context = _select_rows(q, _embed_question(q), 5)
+    if no_context:
+        return None
+    answer, usage = _generate_answer(q, rows, scores, passages)
+    return {"question": q, "answer": answer, "references": _slim_refs(rows), "usage": usage}
+
+
+def _open_pool_and_warm() -> None:
+    # forkserver workers start from a fresh interpreter, so other threads are harmless here
     try:
-        logger.info(
-            f"/ask ok qlen={len(q)} top_k={top_k} fetch_k={fetch_k} min_sim={min_sim} used={len(rows)} model={llm_model}"
-        )
-    except Exception:
-        pass
+        start_password_pool()
+    except Exception as e:
+        logger.warning("Password hashing workers not pre-started (started on first use): %s", e)
+    pool = _db_pool()
+    refresh_capabilities(pool)
+    start_warmup(pool, answer_fn=_warm_answer)
+
 
-    return {"question": q, "answer": answer, "references": slim_refs}
+class AskBatchIn(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+    top_k: int = Field(5, ge=1, le=10)
+    stream: bool = False
+
+
+@app.post("/ask/batch")
+async def ask_batch(
+    request: Request,
+    payload: AskBatchIn,
+    x_auth_token: Optional[str] = Header(default=None, convert_underscores=False),
+):
+    """
+    Answer many questions in one call: one batched embedding request, one
+    pooled retrieval pass for all questions and bounded LLM concurrency.
+    With stream=true, results are emitted as NDJSON lines as each finishes.
+    """
+    max_questions = int(os.getenv("ASK_BATCH_MAX", "50"))
+    if len(payload.questions) > max_questions:
+        raise HTTPException(status_code=400, detail=f"At most {max_questions} questions per batch.")
+    # Each question costs one /ask; the rate limit middleware already charged the first
+    charge_request(request, len(payload.questions) - 1)
+    questions = [" ".join((q or "").split())[:1000] for q in payload.questions]
+    set_request_priority(bool(x_auth_token and verify_jwt(x_auth_token)))
+
+    # Identical questions are answered once
+    unique = [q for q in dict.fromkeys(questions) if q]
+
+    def _embed_all() -> List[Tuple[List[float], str]]:
+        with admit("embed"):
+            return get_embeddings(unique)
+
+    embedded = await run_in_threadpool(_embed_all)
+    vectors = {q: None if is_degraded(m) else v for q, (v, m) in zip(unique, embedded)}
+
+    # One pooled pass fetches every question's candidates; identical lexical and
+    # keyword stages across overlapping questions run once (fetch_candidates_batch)
+    fetched = asyncio.ensure_future(run_in_threadpool(_fetch_batch, vectors, payload.top_k))
+    llm_sem = asyncio.Semaphore(int(os.getenv("ASK_BATCH_LLM_CONCURRENCY", "4")))
+
+    async def _run(q: str) -> Dict[str, Any]:
+        if not q:
+            return {"question": q, "error": "Question cannot be empty.", "status": 400}
+        try:
+            kws, candidates = (await asyncio.shield(fetched))[q]
+            rows, scores, passages, no_context = await run_in_threadpool(
+                _rank_rows, q, kws, candidates, payload.top_k, vectors[q] is not None
+            )
+            if no_context:
+                return {"question": q, "answer": no_context, "references": []}
+            async with llm_sem:
+                answer, usage = await run_in_threadpool(_generate_answer, q, rows, scores, passages)
+            return {"question": q, "answer": answer, "references": _slim_refs(rows), "usage": usage}
+        except HTTPException as e:
+            return {"question": q, "error": e.detail, "status": e.status_code}
+        except Exception as e:
+            logger.error("Batch question failed: %s", e)
+            return {"question": q, "error": "Internal server error", "status": 500}
+
+    tasks = {q: asyncio.ensure_future(_run(q)) for q in dict.fromkeys(questions)}
+
+    async def _indexed(i: int, q: str) -> Dict[str, Any]:
+        return {"index": i, **(await tasks[q])}
+
+    jobs = [_indexed(i, q) for i, q in enumerate(questions)]
+    if payload.stream:
+        async def _ndjson():
+            for fut in asyncio.as_completed(jobs):
+                yield json.dumps(await fut, ensure_ascii=False, default=str) + "\n"
+        return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*jobs)
+    logger.debug("/ask/batch ok questions=%d unique=%d", len(questions), len(unique))
+    return {"results": results}
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
 
 
 @app.get("/chat/history")
-def chat_history(request: Request, limit: int = 100):
+def chat_history(
+    request: Request,
+    response: Response,
+    limit: int = 100,
+    before_id: Optional[int] = Query(None, description="Page of messages older than this id"),
+    after_id: Optional[int] = Query(None, description="Only messages newer than this id (polling)"),
+    include_refs: bool = Query(True, description="Include per-message references"),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    Newest-first keyset pages of the session's chat. Turns within a page are
+    oldest first; `next_before_id` fetches the previous page and `last_id`
+    is the cursor for polling with `after_id`. Supports If-None-Match.
+    """
     sid = _get_session_id(request)
+    limit = max(1, min(limit, 200))
     try:
         ensure_session(sid)
-        turns = get_history(sid, limit=max(1, min(limit, 200)))
+        last_id = latest_message_id(sid)
+        etag = f'W/"{last_id or 0}-{limit}-{before_id or ""}-{after_id or ""}-{int(include_refs)}"'
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        turns = [] if last_id is None else get_history(
+            sid, limit=limit, before_id=before_id, after_id=after_id, include_refs=include_refs,
+        )
+        response.headers["ETag"] = etag
     except Exception as e:
         logger.error("Failed to load chat history: %s", e)
-        turns = []
+        last_id, turns = None, []
 
-    if not turns:
+    next_before_id = turns[0]["id"] if turns and after_id is None and len(turns) == limit else None
+    if not turns and before_id is None and after_id is None:
         turns = [{
             "role": "system",
             "content": "Ask anything about growth, pricing, fundraising, or product decisions.",
             "ts": int(time.time() * 1000),
         }]
-    return {"turns": turns}
+    return {"turns": turns, "next_before_id": next_before_id, "last_id": last_id}
 
 
 @app.post("/chat/clear")
@@ -740,6 +832,48 @@ def clear_cache_admin(x_api_key: str = Header(..., description="Admin API key"))
     if x_api_key != ADMIN_API_KEY:
         raise HTTPException(status_code=401, detail="Unauthorized")
     cache_clear()
+    completion_cache_clear()
     logger.info("Cache cleared via admin endpoint.")
     return {"status": "ok", "message": "Cache cleared."}
 
+
+
+@app.post("/admin/profile")
+async def start_profile_admin(
+    x_api_key: str = Header(..., description="Admin API key"),
+    requests: Optional[int] = Query(None, ge=1, description="Stop after this many requests"),
+    seconds: Optional[float] = Query(None, gt=0, description="Stop after this long (capped by PROFILER_MAX_SECONDS)"),
+    interval_ms: Optional[float] = Query(None, ge=1, description="Sampling interval"),
+    wait: bool = Query(False, description="Block until the profile ends and return collapsed stacks"),
+):
+    if x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        session = start_profile(requests=requests, seconds=seconds, interval_ms=interval_ms)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not wait:
+        return session.status()
+    # Wait off the request threadpool: a long profile must not pin one of its workers
+    await asyncio.to_thread(session.done.wait, session.seconds + 1)
+    return Response(collapsed_stacks(session), media_type="text/plain")
+
+
+@app.get("/admin/profile")
+def get_profile_admin(
+    x_api_key: str = Header(..., description="Admin API key"),
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+    stop: bool = Query(False, description="End the running profile first"),
+):
+    """Running or last profile: status + hottest stacks, or collapsed-stack text."""
+    if x_api_key != ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    session = stop_profile() if stop else last_profile()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No profile has been recorded.")
+    if stop:
+        session.done.wait(1)
+    text = collapsed_stacks(session)
+    if format == "collapsed":
+        return Response(text, media_type="text/plain")
+    return {**session.status(), "top_stacks": text.splitlines()[:20]}
@@ -1,51 +1,193 @@
-from fastapi import APIRouter, Query
-from psycopg import connect
-from config.settings import DB_CONFIG
-from utils.embeddings import get_embedding  # reuse your existing embedding function
+# app/search.py
+from __future__ import annotations
+
+import os
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from psycopg.errors import DatabaseError
+
+from utils.admission import admit
+from utils.circuit_breaker import CircuitOpenError
+from utils.db import get_pool, pool_connection
+from utils.embeddings import get_embedding, is_degraded
+from utils.logger import setup_logger
+from utils.rerank import derive_keywords
+from utils.retrieval import fetch_candidates, rank_candidates
+from utils.stage_timing import stage
 
 router = APIRouter(prefix="/search", tags=["Search"])
+logger = setup_logger("startupscout.search")
+
+# Projectable result fields (?fields=title,url,score)
+SEARCH_FIELDS = ("id", "title", "decision", "summary", "tags", "stage", "source", "url", "similarity", "score")
+DEFAULT_FIELDS = ("id", "title", "decision", "tags", "stage", "source", "url", "score")
+
+# Scored candidate set per normalized query, so later pages are slices, not searches
+SEARCH_PAGE_CACHE_SEC = float(os.getenv("SEARCH_PAGE_CACHE_SEC", "60"))
+SEARCH_PAGE_CACHE_MAX = int(os.getenv("SEARCH_PAGE_CACHE_MAX", "256"))
+_RESULTS: "OrderedDict[str, Tuple[float, List[Tuple[float, tuple]]]]" = OrderedDict()
+_RESULTS_LOCK = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+# Cursor helpers (opaque keyset token over (score DESC, id ASC))
+# ---------------------------------------------------------------------------
+def encode_cursor(score: float, row_id: int) -> str:
+    raw = json.dumps([score, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str) -> Tuple[float, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        score, row_id = json.loads(raw)
+        return float(score), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+
+def _page(scored: List[Tuple[float, tuple]], cursor: Optional[Tuple[float, int]], limit: int):
+    """Slice one page from best-first results; returns (page, next_token)."""
+    ordered = sorted(scored, key=lambda x: (-x[0], x[1][0]))
+    if cursor is not None:
+        c_score, c_id = cursor
+        ordered = [(s, r) for s, r in ordered if s < c_score or (s == c_score and r[0] > c_id)]
+    page = ordered[:limit]
+    next_token = None
+    if len(ordered) > limit and page:
+        last_score, last_row = page[-1]
+        next_token = encode_cursor(last_score, last_row[0])
+    return page, next_token
+
+
+def _project(score: float, r: tuple, fields: Sequence[str]) -> Dict[str, Any]:
+    full = {
+        "id": r[0],
+        "title": r[1],
+        "decision": r[2],
+        "summary": r[3],
+        "tags": r[6],
+        "stage": r[7],
+        "source": r[8],
+        "url": r[9],
+        "similarity": round(float(r[10]), 4),
+        "score": score,
+    }
+    return {f: full[f] for f in fields}
+
+
+def _parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return DEFAULT_FIELDS
+    wanted = tuple(f.strip() for f in fields.split(",") if f.strip())
+    unknown = [f for f in wanted if f not in SEARCH_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return wanted or DEFAULT_FIELDS
 
 
+# ---------------------------------------------------------------------------
+# Result-set cache (query -> best-first scored rows, short TTL)
+# ---------------------------------------------------------------------------
+def _cached_results(key: str) -> Optional[List[Tuple[float, tuple]]]:
+    with _RESULTS_LOCK:
+        entry = _RESULTS.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[0]:
+            del _RESULTS[key]
+            return None
+        _RESULTS.move_to_end(key)
+        return entry[1]
+
+
+def _cache_results(key: str, scored: List[Tuple[float, tuple]]) -> None:
+    if SEARCH_PAGE_CACHE_SEC <= 0 or SEARCH_PAGE_CACHE_MAX <= 0:
+        return
+    with _RESULTS_LOCK:
+        _RESULTS[key] = (time.monotonic() + SEARCH_PAGE_CACHE_SEC, scored)
+        _RESULTS.move_to_end(key)
+        while len(_RESULTS) > SEARCH_PAGE_CACHE_MAX:
+            _RESULTS.popitem(last=False)
+
+
+def _embed(q: str) -> Tuple[List[float], str]:
+    with admit("embed"), stage("embed"):
+        return get_embedding(q)
+
+
+def _retrieve(q: str, q_vec: Optional[List[float]]) -> List[Tuple[float, tuple]]:
+    """Same hybrid retrieval as /ask (no LLM), on the shared pool."""
+    pool = get_pool()
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+
+    fetch_k = int(os.getenv("SEARCH_FETCH_K", "50"))
+    min_sim = float(os.getenv("MIN_SIMILARITY", "0.35")) if q_vec is not None else 0.0
+    rrf_k = int(os.getenv("RRF_K", "60"))
+    kws = derive_keywords(q)
+
+    try:
+        with admit("db"), pool_connection(pool) as conn, conn.cursor() as cur:
+            vec_rows, bm25_rows, kw_rows, _ = fetch_candidates(cur, q, q_vec, kws, fetch_k)
+    except CircuitOpenError as e:
+        logger.error("Database unavailable in /search: %s", e)
+        raise HTTPException(status_code=503, detail="Database unavailable.")
+    except DatabaseError as e:
+        logger.error("Database error in /search: %s", e)
+        raise HTTPException(status_code=500, detail="Database query failed.")
+
+    scored = rank_candidates(q, kws, vec_rows, bm25_rows, kw_rows, rrf_k)
+    return [(s, r) for s, r in scored if float(r[10]) >= min_sim]
+
+
+# ---------------------------------------------------------------------------
+# Handler
+# ---------------------------------------------------------------------------
 @router.get("/")
-def search(
+async def search(
     query: str = Query(..., description="Search across startup decisions"),
-    top_k: int = 5
+    top_k: int = Query(5, ge=1, le=50, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque `next` token from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields to return"),
 ):
-    """Return top matching startup decisions from Postgres using pgvector similarity"""
-
-    # 1. Generate embedding for query
-    q_vec, _ = get_embedding(query)
-
-    # 2. Connect to Postgres
-    conn = connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # 3. Execute vector similarity search
-    cur.execute(
-        """
-        SELECT title, decision, tags, stage,
-               1 - (embedding <#> %s::vector) AS score
-        FROM decisions
-        ORDER BY embedding <-> %s::vector
-        LIMIT %s;
-        """,
-        (q_vec, q_vec, top_k)
-    )
-
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    # 4. Format results
-    results = [
-        {
-            "title": r[0],
-            "decision": r[1],
-            "tags": r[2],
-            "stage": r[3],
-            "score": float(r[4])
-        }
-        for r in rows
-    ]
-
-    return {"query": query, "results": results}
+    """
+    Hybrid search over startup decisions with keyset pagination.
+
+    The first page runs the full search (embed, fetch, rank) and keeps the
+    scored candidate set for SEARCH_PAGE_CACHE_SEC; pages requested within
+    that window are slices of the same set, so they neither repeat the search
+    nor shift when the index changes. After it expires a page is a fresh
+    search and may overlap or skip rows relative to earlier pages.
+    """
+    q = " ".join((query or "").split())[:1000]
+    if not q:
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+    wanted = _parse_fields(fields)
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    key = q.lower()
+    scored = _cached_results(key)
+    if scored is None:
+        q_vec, model = await run_in_threadpool(_embed, q)
+        degraded = is_degraded(model)
+        scored = await run_in_threadpool(_retrieve, q, None if degraded else q_vec)
+        if not degraded:  # don't pin lexical-only results for the whole window
+            _cache_results(key, scored)
+    page, next_token = _page(scored, after, top_k)
+
+    return {
+        "query": q,
+        "results": [_project(s, r, wanted) for s, r in page],
+        "next": next_token,
+    }
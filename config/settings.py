@@ -1,30 +1,22 @@
 import os
 from dotenv import load_dotenv
 
-# Explicitly load .env.dev if exists
-if os.path.exists(".env.dev"):
-    load_dotenv(".env.dev")
-else:
-    load_dotenv()
-
-print("Loading .env from:", os.getcwd())
-load_dotenv()
-print("Reddit vars:", os.getenv("REDDIT_CLIENT_ID"), os.getenv("REDDIT_USER_AGENT"))
-
 # -----------------------
 # Environment selection
 # -----------------------
+# One pass over the .env files (load_dotenv never overrides, so the first file
+# to set a variable wins): .env.dev if present, then .env, then .env.{ENV}.
+if os.path.exists(".env.dev"):
+    load_dotenv(".env.dev")
+load_dotenv()
 
 # default to 'dev' if ENV not set
 ENV = os.getenv("ENV", "dev")
 
-# load the corresponding .env file (e.g., .env.dev or .env.prod)
+# in cloud prod, env vars often come directly from the platform
 env_file = f".env.{ENV}"
-if os.path.exists(env_file):
+if env_file != ".env.dev" and os.path.exists(env_file):
     load_dotenv(dotenv_path=env_file)
-else:
-    # in cloud prod, env vars often come directly from platform
-    load_dotenv()
 
 # -----------------------
 # Path configuration
@@ -107,6 +99,14 @@ else:
 ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "changeme")
 REDIS_URL = os.getenv("REDIS_URL")
 
+# -----------------------
+# Password hashing (PBKDF2-SHA256, see utils/auth.py)
+# -----------------------
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "29000"))                  # passlib default
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(2, os.cpu_count() or 1))))  # 0 = threads
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))  # in flight beyond this -> 503
+PASSWORD_HASH_TIMEOUT_SEC = float(os.getenv("PASSWORD_HASH_TIMEOUT_SEC", "5"))
+
 # LangFuse configuration
 LANGFUSE_ENABLED = os.getenv("LANGFUSE_ENABLED", "false").lower() in ("1", "true", "yes")
 LANGFUSE_HOST = os.getenv("LANGFUSE_HOST", "").strip()
@@ -0,0 +1,142 @@
+# data_processing/chunk_to_db.py
+from __future__ import annotations
+
+import os
+import time
+import psycopg
+from typing import List, Tuple
+
+from config.settings import DB_CONFIG, EMBEDDING_BACKEND
+from utils.embeddings import get_embedding
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.chunk_to_db")
+
+CHUNK_CHARS = int(os.getenv("CHUNK_CHARS", "1200"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+CHUNK_FIELDS = ("decision", "content")
+
+
+def chunk_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int, str]]:
+    """
+    Split text into overlapping passages of roughly `size` chars.
+    Cuts prefer a sentence end (then whitespace) in the back half of the window.
+    Returns (start_char, end_char, passage) with offsets into the original text.
+    """
+    text = text or ""
+    n = len(text)
+    if not text.strip():
+        return []
+    size = max(100, size)
+    overlap = max(0, min(overlap, size // 2 - 1))
+
+    chunks: List[Tuple[int, int, str]] = []
+    start = 0
+    while start < n:
+        end = min(n, start + size)
+        if end < n:
+            floor = start + size // 2
+            cut = max(text.rfind(". ", floor, end), text.rfind("\n", floor, end))
+            if cut != -1:
+                end = cut + 1
+            else:
+                ws = text.rfind(" ", floor, end)
+                if ws != -1:
+                    end = ws
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append((start, end, piece))
+        if end >= n:
+            break
+        nxt = end - overlap
+        ws = text.find(" ", nxt, end)
+        if ws != -1:
+            nxt = ws + 1
+        start = max(nxt, start + 1)
+    return chunks
+
+
+def _fetch_batch(cur, after_id: int, batch_size: int) -> List[Tuple[int, str, str]]:
+    cur.execute(
+        """
+        SELECT d.id, d.decision, d.content
+        FROM decisions d
+        WHERE d.id > %s
+          AND NOT EXISTS (SELECT 1 FROM decision_chunks c WHERE c.decision_id = d.id)
+        ORDER BY d.id
+        LIMIT %s
+        """,
+        (after_id, batch_size),
+    )
+    return cur.fetchall()
+
+
+def process_chunks(batch_size: int = 50, sleep_between_calls: float = 0.0) -> None:
+    """
+    Chunk 'decision' and 'content' of rows that have no passages yet, embed
+    each passage and insert it into 'decision_chunks'. Safe to resume.
+    """
+    logger.info(
+        "Chunking job start (backend=%s, chunk=%d, overlap=%d, batch=%d)",
+        EMBEDDING_BACKEND, CHUNK_CHARS, CHUNK_OVERLAP, batch_size,
+    )
+
+    processed_total = 0
+    chunks_total = 0
+    failures_total = 0
+    last_id = 0
+
+    with psycopg.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            while True:
+                batch = _fetch_batch(cur, last_id, batch_size)
+                if not batch:
+                    break
+
+                for row_id, decision, content in batch:
+                    last_id = row_id
+                    seen = set()
+                    for field, value in zip(CHUNK_FIELDS, (decision, content)):
+                        for idx, (start, end, passage) in enumerate(chunk_text(value or "")):
+                            if passage in seen:  # decision often repeats the head of content
+                                continue
+                            seen.add(passage)
+                            try:
+                                embedding, model_name = get_embedding(passage)
+                            except Exception as e:
+                                failures_total += 1
+                                logger.warning("Chunk embedding failed for id=%s: %s", row_id, e)
+                                continue
+                            cur.execute(
+                                """
+                                INSERT INTO decision_chunks
+                                    (decision_id, field, chunk_index, start_char, end_char,
+                                     text, embedding, embedding_model)
+                                VALUES (%s, %s, %s, %s, %s, %s, %s::vector, %s)
+                                ON CONFLICT (decision_id, field, chunk_index) DO NOTHING
+                                """,
+                                (row_id, field, idx, start, end, passage, embedding, model_name),
+                            )
+                            chunks_total += 1
+                            if sleep_between_calls > 0:
+                                time.sleep(sleep_between_calls)
+
+                conn.commit()
+                processed_total += len(batch)
+                logger.info(
+                    "Committed batch: docs=%d, total_docs=%d, total_chunks=%d, failures=%d",
+                    len(batch), processed_total, chunks_total, failures_total,
+                )
+
+    logger.info(
+        "Chunking job complete. docs=%d chunks=%d failures=%d",
+        processed_total, chunks_total, failures_total,
+    )
+
+
+if __name__ == "__main__":
+    sleep = 0.0
+    if EMBEDDING_BACKEND == "openai":
+        sleep = float(os.getenv("EMBED_CALL_SLEEP", "0.0"))
+    batch = int(os.getenv("EMBED_BATCH_SIZE", "50"))
+    process_chunks(batch_size=batch, sleep_between_calls=sleep)
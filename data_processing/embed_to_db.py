@@ -7,7 +7,12 @@ import psycopg
 from typing import List, Tuple
 
 from config.settings import DB_CONFIG, EMBEDDING_BACKEND
-from utils.embeddings import get_embedding, get_embedding_dim
+from utils.embeddings import (
+    get_embedding,
+    get_embedding_dim,
+    get_short_embedding_dim,
+    shorten_embedding,
+)
 from utils.logger import setup_logger
 
 logger = setup_logger("startupscout.embed_to_db")
@@ -27,14 +32,37 @@ def _fetch_batch(cur, batch_size: int) -> List[Tuple[int, str]]:
     return cur.fetchall()
 
 
+def _update_embedding(cur, row_id: int, embedding: List[float], model_name: str) -> None:
+    short_dim = get_short_embedding_dim()
+    if short_dim:
+        cur.execute(
+            """
+            UPDATE decisions
+            SET embedding = %s::vector, embedding_short = %s::vector, embedding_model = %s
+            WHERE id = %s
+            """,
+            (embedding, shorten_embedding(embedding, short_dim), model_name, row_id),
+        )
+        return
+    cur.execute(
+        """
+        UPDATE decisions
+        SET embedding = %s::vector, embedding_model = %s
+        WHERE id = %s
+        """,
+        (embedding, model_name, row_id),
+    )
+
+
 def process_embeddings(batch_size: int = 50, sleep_between_calls: float = 0.0) -> None:
     """
     Populate 'embedding' and 'embedding_model' for rows in 'decisions'
     where embedding IS NULL. Deterministic batches; safe to resume.
+    When EMBED_SHORT_DIM is set, 'embedding_short' is written alongside.
     """
     logger.info(
-        "Embedding job start (backend=%s, dim=%d, batch=%d)",
-        EMBEDDING_BACKEND, get_embedding_dim(), batch_size,
+        "Embedding job start (backend=%s, dim=%d, short_dim=%d, batch=%d)",
+        EMBEDDING_BACKEND, get_embedding_dim(), get_short_embedding_dim(), batch_size,
     )
 
     processed_total = 0
@@ -52,27 +80,13 @@ def process_embeddings(batch_size: int = 50, sleep_between_calls: float = 0.0) -
                     text = (decision or "").strip()
                     if not text:
                         empty_vec = [0.0] * get_embedding_dim()
-                        cur.execute(
-                            """
-                            UPDATE decisions
-                            SET embedding = %s::vector, embedding_model = %s
-                            WHERE id = %s
-                            """,
-                            (empty_vec, f"{EMBEDDING_BACKEND}-empty", row_id),
-                        )
+                        _update_embedding(cur, row_id, empty_vec, f"{EMBEDDING_BACKEND}-empty")
                         updated += 1
                         continue
 
                     try:
                         embedding, model_name = get_embedding(text)
-                        cur.execute(
-                            """
-                            UPDATE decisions
-                            SET embedding = %s::vector, embedding_model = %s
-                            WHERE id = %s
-                            """,
-                            (embedding, model_name, row_id),
-                        )
+                        _update_embedding(cur, row_id, embedding, model_name)
                         updated += 1
                         if sleep_between_calls > 0:
                             time.sleep(sleep_between_calls)
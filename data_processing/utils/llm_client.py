@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 from typing import List, Optional
+from utils.completion_cache import cached_completion
 from utils.env_loader import load_environment
 from utils.logger import setup_logger
 
@@ -56,14 +57,23 @@ def call_llm(
     local_model: str = "llama3:8b",
     temperature: float = 0.3,
 ) -> str:
-    """Attempt providers in order, fallback gracefully."""
+    """Attempt providers in order, fallback gracefully. Identical prompts are served from the completion cache."""
+    messages = [{"role": "user", "content": prompt}]
     last_err = None
     for provider in provider_priority:
         try:
             if provider == "openai":
-                return _call_openai(prompt, model=openai_model, temperature=temperature)
+                content, _ = cached_completion(
+                    lambda: _call_openai(prompt, model=openai_model, temperature=temperature),
+                    provider=provider, model=openai_model, messages=messages, temperature=temperature,
+                )
+                return content
             if provider == "local":
-                return _call_ollama(prompt, model=local_model, temperature=temperature)
+                content, _ = cached_completion(
+                    lambda: _call_ollama(prompt, model=local_model, temperature=temperature),
+                    provider=provider, model=local_model, messages=messages, temperature=temperature,
+                )
+                return content
             raise ValueError(f"Unknown provider: {provider}")
         except Exception as e:
             last_err = e
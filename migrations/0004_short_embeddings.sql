@@ -0,0 +1,15 @@
+-- Two-stage vector retrieval: a shortened (Matryoshka) copy of `embedding`
+-- is used for ANN candidate generation, then candidates are re-scored with
+-- the full 1536-dim vector. The width is fixed at 256: EMBED_SHORT_DIM must be
+-- 256 (or 0 to disable), and the app refuses to start with any other value.
+-- Requires pgvector >= 0.7 for subvector()/l2_normalize().
+
+ALTER TABLE decisions ADD COLUMN IF NOT EXISTS embedding_short vector(256);
+
+-- Backfill from the stored full-size vectors (no re-embedding needed).
+UPDATE decisions
+SET embedding_short = l2_normalize(subvector(embedding, 1, 256))::vector(256)
+WHERE embedding IS NOT NULL AND embedding_short IS NULL;
+
+CREATE INDEX IF NOT EXISTS decisions_embedding_short_hnsw
+  ON decisions USING hnsw (embedding_short vector_cosine_ops);
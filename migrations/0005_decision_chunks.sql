@@ -0,0 +1,21 @@
+-- Passage-level index: overlapping chunks of decisions.decision / decisions.content
+-- with their own embeddings. Populated by data_processing/chunk_to_db.py and
+-- searched when RETRIEVAL_MODE=chunk (max-sim aggregated back to decisions).
+
+CREATE TABLE IF NOT EXISTS decision_chunks (
+  id               BIGSERIAL PRIMARY KEY,
+  decision_id      INTEGER NOT NULL REFERENCES decisions(id) ON DELETE CASCADE,
+  field            TEXT NOT NULL CHECK (field IN ('decision','content')),
+  chunk_index      INTEGER NOT NULL,
+  start_char       INTEGER NOT NULL,
+  end_char         INTEGER NOT NULL,
+  text             TEXT NOT NULL,
+  embedding        vector(1536),
+  embedding_model  TEXT,
+  created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  UNIQUE (decision_id, field, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS decision_chunks_decision_idx ON decision_chunks(decision_id);
+CREATE INDEX IF NOT EXISTS decision_chunks_embedding_hnsw
+  ON decision_chunks USING hnsw (embedding vector_cosine_ops);
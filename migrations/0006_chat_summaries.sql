@@ -0,0 +1,11 @@
+-- Rolling per-session conversation summary for conversational /ask.
+-- `through_id` is the last chat_messages.id folded into `summary`; turns after
+-- it are still sent verbatim, so each update only summarizes new turns.
+
+CREATE TABLE IF NOT EXISTS chat_summaries (
+  session_id      TEXT PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE,
+  summary         TEXT NOT NULL,
+  through_id      BIGINT NOT NULL,
+  summary_tokens  INTEGER NOT NULL DEFAULT 0,
+  updated_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
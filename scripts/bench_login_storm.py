@@ -0,0 +1,104 @@
+# scripts/bench_login_storm.py
+"""
+Measure /ask latency while a storm of concurrent logins hits the same server.
+
+Runs a baseline (probes only), then the same probes during the storm, and
+prints p50/p95/max for both. Compare PASSWORD_HASH_WORKERS=0 (threads) with
+the process pool, or different PBKDF2_ROUNDS, by restarting the server.
+
+  uvicorn app.main:app --workers 1 &
+  python scripts/bench_login_storm.py --base-url http://127.0.0.1:8000 --logins 400 --concurrency 50
+"""
+from __future__ import annotations
+
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+
+def _summary(name: str, latencies: list) -> str:
+    if not latencies:
+        return f"{name}: no samples"
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"{name}: n={len(ms)} p50={statistics.median(ms):.1f}ms p95={p95:.1f}ms max={ms[-1]:.1f}ms"
+
+
+async def _probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, interval: float) -> list:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(path)
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def _storm(client: httpx.AsyncClient, email: str, password: str, logins: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    codes: dict = {}
+
+    async def _one():
+        async with sem:
+            try:
+                r = await client.post("/auth/login", json={"email": email, "password": password})
+                codes[r.status_code] = codes.get(r.status_code, 0) + 1
+            except httpx.HTTPError:
+                codes["error"] = codes.get("error", 0) + 1
+
+    await asyncio.gather(*(_one() for _ in range(logins)))
+    return codes
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="/ask latency under a login storm.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--ask-path", default="/ask?question=How+should+we+price+an+early+SaaS+product%3F")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--baseline-sec", type=float, default=5.0)
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "bench-password-123"
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        r = await client.post("/auth/register", json={"email": email, "password": password})
+        if r.status_code != 200:
+            print(f"register failed: {r.status_code} {r.text}")
+            return
+        await client.get(args.ask_path)  # warm caches so probes measure the server, not the LLM
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, args.ask_path, stop, args.probe_interval))
+        await asyncio.sleep(args.baseline_sec)
+        stop.set()
+        baseline = await probe
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, args.ask_path, stop, args.probe_interval))
+        start = time.perf_counter()
+        codes = await _storm(client, email, password, args.logins, args.concurrency)
+        storm_sec = time.perf_counter() - start
+        stop.set()
+        during = await probe
+
+        stats = (await client.get("/stats")).json().get("auth", {}).get("password_hashing")
+
+    print(_summary("ask baseline   ", baseline))
+    print(_summary("ask during storm", during))
+    print(f"logins: {args.logins} in {storm_sec:.1f}s ({args.logins / storm_sec:.1f}/s) status={codes}")
+    if stats:
+        print(f"hashing pool: {stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+# scripts/bench_prepared.py
+"""
+Planning time saved by preparing the hot retrieval statements.
+
+For each registered statement: EXPLAIN ANALYZE planning time (what every
+unprepared execution pays), then mean/p95 latency of N unprepared vs N
+prepared executions on one pooled connection, and the top node of the
+vector query's generic plan (it should stay an index scan).
+
+  python scripts/bench_prepared.py --iterations 200 --query "pricing an early SaaS product"
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from psycopg import sql  # noqa: E402
+
+from utils.db import get_pool  # noqa: E402
+from utils.queries import KEYWORD, LEXICAL, VECTOR_DOC, sql_for  # noqa: E402
+
+
+def _summary(latencies: list) -> str:
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"mean={statistics.mean(ms):.2f}ms p95={p95:.2f}ms"
+
+
+def _planning_ms(cur, text: str, params) -> float:
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + text, params, prepare=False)
+    return float(cur.fetchone()[0][0]["Planning Time"])
+
+
+def _timed(cur, text: str, params, iterations: int, prepare: bool) -> list:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        cur.execute(text, params, prepare=prepare)
+        cur.fetchall()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepared vs unprepared retrieval statements.")
+    parser.add_argument("--query", default="how should we price an early SaaS product")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--lang", default=os.getenv("TS_LANG", "english"))
+    args = parser.parse_args()
+
+    pool = get_pool()
+    if pool is None:
+        raise SystemExit("database pool unavailable")
+
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT embedding::text FROM decisions WHERE embedding IS NOT NULL LIMIT 1")
+        row = cur.fetchone()
+        if not row:
+            raise SystemExit("no embedded decisions to query with")
+        q_vec = [float(x) for x in row[0].strip("[]").split(",")]
+        kw = [f"%{w}%" for w in args.query.split()[:8]]
+
+        cases = [
+            (VECTOR_DOC, sql_for(VECTOR_DOC, limit=args.fetch_k), (q_vec, q_vec)),
+            (LEXICAL, sql_for(LEXICAL, rank_fn="ts_rank", lang=args.lang, limit=args.fetch_k), (args.query, args.query)),
+            (KEYWORD, sql_for(KEYWORD, limit=args.fetch_k), (kw, kw, kw)),
+        ]
+        for name, text, params in cases:
+            planning = statistics.median(_planning_ms(cur, text, params) for _ in range(5))
+            _timed(cur, text, params, 3, prepare=False)  # warm the buffer cache
+            unprepared = _timed(cur, text, params, args.iterations, prepare=False)
+            prepared = _timed(cur, text, params, args.iterations, prepare=True)
+            saved = statistics.mean(unprepared) - statistics.mean(prepared)
+            print(f"{name:<12} planning={planning:.2f}ms")
+            print(f"{'':<12} unprepared {_summary(unprepared)}")
+            print(f"{'':<12} prepared   {_summary(prepared)}  saved/exec={saved * 1000:.2f}ms")
+
+        # The plan a prepared vector statement settles on once it goes generic
+        cur.execute("PREPARE bench_vec(vector) AS " + cases[0][1].replace("%s::vector", "$1"))
+        cur.execute("SET plan_cache_mode = force_generic_plan")
+        cur.execute(sql.SQL("EXPLAIN (FORMAT JSON) EXECUTE bench_vec({})").format(sql.Literal(row[0])))
+        plan = cur.fetchone()[0][0]["Plan"]
+        child = (plan.get("Plans") or [{}])[0]
+        print(f"\n{VECTOR_DOC} generic plan: {plan['Node Type']} -> {child.get('Node Type', '-')} "
+              f"{child.get('Index Name', '')}".rstrip())
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# scripts/bench_rate_limiter.py
+"""
+Benchmark rate limiter checks/sec for the memory and Redis GCRA backends.
+
+  python scripts/bench_rate_limiter.py --checks 200000 --keys 10000
+  python scripts/bench_rate_limiter.py --backend redis --redis-url redis://localhost:6379/0
+"""
+from __future__ import annotations
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.rate_limiter import MemoryBackend, RateLimiter, RedisBackend  # noqa: E402
+
+
+def _run(limiter: RateLimiter, checks: int, keys: int, threads: int) -> float:
+    per_thread = checks // threads
+    names = [f"ip:10.0.{i // 256}.{i % 256}" for i in range(keys)]
+
+    def _worker(seed: int) -> None:
+        rnd = random.Random(seed)
+        for _ in range(per_thread):
+            limiter.check_key(rnd.choice(names), "default")
+
+    workers = [threading.Thread(target=_worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rate limiter backends.")
+    parser.add_argument("--backend", choices=("memory", "redis", "both"), default="both")
+    parser.add_argument("--checks", type=int, default=100_000, help="total checks per backend")
+    parser.add_argument("--keys", type=int, default=10_000, help="distinct client keys")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    args = parser.parse_args()
+
+    if args.backend in ("memory", "both"):
+        backend = MemoryBackend()
+        rate = _run(RateLimiter(backend), args.checks, args.keys, args.threads)
+        print(f"memory: {rate:,.0f} checks/sec ({args.threads} threads, {len(backend)} live keys)")
+
+    if args.backend in ("redis", "both"):
+        try:
+            import redis
+            client = redis.from_url(args.redis_url, decode_responses=True)
+            client.ping()
+        except Exception as e:
+            print(f"redis: skipped ({e})")
+            return
+        prefix = f"bench:rl:{int(time.time())}:"
+        rate = _run(RateLimiter(RedisBackend(client, prefix=prefix)), args.checks, args.keys, args.threads)
+        print(f"redis:  {rate:,.0f} checks/sec ({args.threads} threads)")
+        for key in client.scan_iter(match=f"{prefix}*", count=1000):
+            client.delete(key)
+
+
+if __name__ == "__main__":
+    main()
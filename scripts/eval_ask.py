@@ -1,4 +1,4 @@
-import requests, sys, json, time
+import requests, sys, json
 
 QUESTIONS = [
  "What are the biggest mistakes in early pricing?",
@@ -16,12 +16,14 @@ def score(ans):
     ok += 1 if "Takeaway" in ans or "takeaway" in ans else 0
     return ok
 
+# One batched call instead of one /ask per question
+r = requests.post(f"{base}/ask/batch", json={"questions": QUESTIONS, "top_k": 5}, timeout=120)
+results = r.json().get("results", [])
+
 report = []
-for q in QUESTIONS:
-    r = requests.get(f"{base}/ask", params={"question": q, "top_k": 5}, timeout=30)
-    j = r.json()
-    s = score(j.get("answer",""))
-    report.append({"q": q, "score": s, "len": len(j.get("answer","")), "refs": len(j.get("references",[]))})
-    time.sleep(0.3)
+for j in results:
+    ans = j.get("answer", "")
+    report.append({"q": j.get("question"), "score": score(ans), "len": len(ans),
+                   "refs": len(j.get("references", [])), "error": j.get("error")})
 
 print(json.dumps(report, indent=2))
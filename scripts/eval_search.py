@@ -36,7 +36,7 @@ def main():
     json_dump = []
     for q in queries:
         try:
-            payload = _call(args.api, "/search", {"q": q, "k": args.k})
+            payload = _call(args.api, "/search/", {"query": q, "top_k": args.k})
             results = payload.get("results", [])
             for rank, item in enumerate(results, start=1):
                 rows.append({
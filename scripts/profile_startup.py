@@ -0,0 +1,104 @@
+# scripts/profile_startup.py
+"""
+Cold-start profile: per-module import time of app.main, then time-to-ready
+(spawn uvicorn until the first 200 from /health).
+
+  python scripts/profile_startup.py              # imports + time-to-ready
+  python scripts/profile_startup.py --top 40 --imports-only
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import urllib.request
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module: str = "app.main"):
+    """[(module, self_us, cumulative_us, depth)] from `python -X importtime`, plus wall seconds."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows, wall
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready(path: str = "/health", timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn to the first 200 from `path`."""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"uvicorn exited with {proc.returncode}")
+            try:
+                remaining = max(0.1, timeout - (time.perf_counter() - start))
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=remaining) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        raise SystemExit(f"{path} not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app import time and time-to-ready.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25, help="slowest modules to list")
+    parser.add_argument("--imports-only", action="store_true", help="skip the uvicorn time-to-ready run")
+    parser.add_argument("--ready-path", default="/health", help="endpoint polled for time-to-ready")
+    args = parser.parse_args()
+
+    rows, wall = profile_imports(args.module)
+    total = next((cum for name, _, cum, _ in rows if name == args.module), 0)
+
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total / 1000:.0f} ms (process wall {wall * 1000:.0f} ms)\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cum, _ in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cum / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    print(f"\n{'self ms':>14}  top-level package")
+    for pkg, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{us / 1000:>14.1f}  {pkg}")
+
+    if not args.imports_only:
+        ready = time_to_ready(args.ready_path)
+        print(f"\ntime-to-ready (spawn -> first 200 {args.ready_path}): {ready * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
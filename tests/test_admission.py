@@ -0,0 +1,100 @@
+# tests/test_admission.py
+import time
+import threading
+
+import pytest
+
+from utils.admission import (
+    AdmissionRejected,
+    PRIORITY_ANONYMOUS,
+    PRIORITY_AUTHENTICATED,
+    StageLimiter,
+)
+
+
+def _hold(limiter, release: threading.Event, priority=PRIORITY_ANONYMOUS, order=None, tag=None):
+    with limiter.slot(priority):
+        if order is not None:
+            order.append(tag)
+        release.wait(5)
+
+
+class TestAdmission:
+    """Test per-stage concurrency, priority queueing and rejection."""
+
+    def test_admits_up_to_concurrency(self):
+        limiter = StageLimiter("t", concurrency=2, max_queue=0)
+        release = threading.Event()
+        threads = [threading.Thread(target=_hold, args=(limiter, release)) for _ in range(2)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+
+        assert limiter.snapshot()["active"] == 2
+        with pytest.raises(AdmissionRejected) as exc:
+            with limiter.slot():
+                pass
+        assert exc.value.status_code == 503
+        assert int(exc.value.headers["Retry-After"]) >= 1
+
+        release.set()
+        for t in threads:
+            t.join()
+        assert limiter.snapshot()["active"] == 0
+
+    def test_authenticated_served_first(self):
+        limiter = StageLimiter("t", concurrency=1, max_queue=4)
+        release = threading.Event()
+        order = []
+        done = threading.Event()
+        done.set()
+        holder = threading.Thread(target=_hold, args=(limiter, release))
+        holder.start()
+        time.sleep(0.05)
+
+        anon = threading.Thread(target=_hold, args=(limiter, done, PRIORITY_ANONYMOUS, order, "anon"))
+        anon.start()
+        time.sleep(0.05)
+        auth = threading.Thread(target=_hold, args=(limiter, done, PRIORITY_AUTHENTICATED, order, "auth"))
+        auth.start()
+        time.sleep(0.05)
+        assert limiter.snapshot()["queue_depth"] == 2
+
+        release.set()
+        for t in (holder, anon, auth):
+            t.join()
+        assert order == ["auth", "anon"]
+
+    def test_rejects_when_expected_wait_exceeds_deadline(self):
+        limiter = StageLimiter("t", concurrency=1, max_queue=4, max_wait_sec=0.5)
+        limiter._avg_hold = 2.0  # recent calls held the slot for ~2s
+        release = threading.Event()
+        holder = threading.Thread(target=_hold, args=(limiter, release))
+        holder.start()
+        time.sleep(0.05)
+
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected) as exc:
+            with limiter.slot():
+                pass
+        assert exc.value.reason == "deadline"
+        assert time.monotonic() - start < 0.1
+
+        release.set()
+        holder.join()
+
+    def test_waiter_times_out(self):
+        limiter = StageLimiter("t", concurrency=1, max_queue=4, max_wait_sec=0.2)
+        release = threading.Event()
+        holder = threading.Thread(target=_hold, args=(limiter, release))
+        holder.start()
+        time.sleep(0.05)
+
+        with pytest.raises(AdmissionRejected) as exc:
+            with limiter.slot():
+                pass
+        assert exc.value.reason == "timeout"
+        assert limiter.snapshot()["queue_depth"] == 0
+
+        release.set()
+        holder.join()
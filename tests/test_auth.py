@@ -0,0 +1,131 @@
+# tests/test_auth.py
+import time
+import asyncio
+
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+import utils.auth as auth
+import utils.user_store as user_store
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    auth.clear_token_cache()
+    user_store._USERS.clear()
+    yield
+
+
+class TestTokenCache:
+    """Test the verified-token LRU."""
+
+    def test_second_verify_is_a_cache_hit(self):
+        token = auth.create_jwt({"sub": 5})
+        with patch.object(auth, "_decode_jwt", wraps=auth._decode_jwt) as decode:
+            assert auth.verify_jwt(token)["sub"] == 5
+            assert auth.verify_jwt(token)["sub"] == 5
+        assert decode.call_count == 1
+
+    def test_cached_token_expires(self):
+        token = auth.create_jwt({"sub": 5}, ttl=10)
+        assert auth.verify_jwt(token)
+        with patch("utils.auth.time.time", return_value=auth.time.time() + 11):
+            assert auth.verify_jwt(token) is None
+        assert auth.auth_get_stats()["cached_tokens"] == 0
+
+    def test_invalid_tokens_are_not_cached(self):
+        token = auth.create_jwt({"sub": 5})
+        tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+        assert auth.verify_jwt(tampered) is None
+        assert auth.auth_get_stats()["cached_tokens"] == 0
+
+    def test_cache_is_bounded(self):
+        with patch.object(auth, "AUTH_TOKEN_CACHE_MAX", 3):
+            for n in range(5):
+                auth.verify_jwt(auth.create_jwt({"sub": n}))
+        assert auth.auth_get_stats()["cached_tokens"] == 3
+
+    def test_decode_user_id(self):
+        assert auth.decode_user_id({"sub": "42"}) == 42
+        assert auth.decode_user_id({"user_id": "123e4567"}) == "123e4567"
+        assert auth.decode_user_id({"email": "x@y.z"}) is None
+        assert auth.decode_user_id(None) is None
+
+
+class TestCurrentUser:
+    """Test /auth/me on the cached user store."""
+
+    @pytest.fixture
+    def client(self):
+        return TestClient(app)
+
+    def test_user_lookup_is_cached(self, client):
+        token = auth.create_jwt({"sub": 9, "email": "a@b.co"})
+        with patch.object(user_store, "_fetchone", return_value=(9, "a@b.co")) as fetch:
+            for _ in range(3):
+                response = client.get("/auth/me", headers={"x-auth-token": token})
+                assert response.status_code == 200
+                assert response.json() == {"user_id": 9, "email": "a@b.co"}
+        assert fetch.call_count == 1
+
+    def test_deleted_user_is_rejected(self, client):
+        token = auth.create_jwt({"sub": 10, "email": "gone@b.co"})
+        with patch.object(user_store, "_fetchone", return_value=None):
+            assert client.get("/auth/me", headers={"x-auth-token": token}).status_code == 401
+
+    def test_register_duplicate_email(self, client):
+        with patch.object(user_store, "_fetchone", return_value=None):
+            response = client.post("/auth/register", json={"email": "dup@b.co", "password": "pw123456"})
+        assert response.status_code == 400
+
+
+class TestPasswordPool:
+    """Test PBKDF2 offloaded to the bounded hashing pool."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_pool(self):
+        auth.shutdown_password_pool()
+        yield
+        auth.shutdown_password_pool()
+
+    def test_hash_and_verify_in_worker_process(self):
+        async def _roundtrip():
+            h = await auth.hash_password_async("s3cret!")
+            return h, await auth.verify_password_async("s3cret!", h), await auth.verify_password_async("nope", h)
+
+        with patch.object(auth, "PBKDF2_ROUNDS", 1000):
+            h, ok, bad = asyncio.run(_roundtrip())
+        assert h.startswith("$pbkdf2-sha256$1000$")
+        assert ok and not bad
+        assert auth.verify_password("s3cret!", h)  # same format as the sync path
+
+    def test_workers_are_not_forked(self):
+        with patch.object(auth, "PASSWORD_HASH_WORKERS", 1):
+            auth.start_password_pool()
+            executor = auth._hash_executor()
+        assert executor._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert len(executor._processes) == 1
+
+    def test_queue_full_is_rejected(self):
+        with patch.object(auth, "PASSWORD_HASH_MAX_PENDING", 0), \
+             patch.object(auth, "_HASH_INFLIGHT", 99):
+            with pytest.raises(auth.PasswordHashBusy) as exc:
+                asyncio.run(auth.hash_password_async("pw"))
+        assert exc.value.status_code == 503
+        assert exc.value.headers["Retry-After"] == "1"
+
+    def test_queue_timeout(self):
+        def _slow(*args):
+            time.sleep(0.3)
+            return "late"
+
+        with patch.object(auth, "PASSWORD_HASH_WORKERS", 0), \
+             patch.object(auth, "PASSWORD_HASH_TIMEOUT_SEC", 0.05), \
+             patch.object(auth, "_pbkdf2", _slow):
+            with pytest.raises(auth.PasswordHashBusy):
+                asyncio.run(auth.hash_password_async("pw"))
+            time.sleep(0.35)
+        stats = auth.password_pool_get_stats()
+        assert stats["timeouts"] >= 1 and stats["in_flight"] == 0
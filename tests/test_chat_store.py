@@ -0,0 +1,200 @@
+# tests/test_chat_store.py
+import time
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+import utils.chat_store as chat_store
+
+
+@pytest.fixture
+def cursor():
+    cur = MagicMock()
+    pool = MagicMock()
+    pool.connection.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = cur
+    chat_store._KNOWN.clear()
+    chat_store._PENDING.clear()
+    with patch.object(chat_store, "get_pool", return_value=pool), \
+         patch.object(chat_store, "pool_connection", side_effect=lambda p: p.connection()):
+        chat_store.stop_chat_writer()  # drain writes queued by other tests
+        cur.reset_mock()
+        yield cur
+        chat_store.stop_chat_writer()
+
+
+def _statements(cur, prefix):
+    return [c for c in cur.execute.call_args_list if c.args[0].lstrip().startswith(prefix)]
+
+
+class TestChatWriteBehind:
+    """Test batched, off-request-path chat persistence."""
+
+    def test_writes_are_batched(self, cursor):
+        for n in range(3):
+            chat_store.ensure_session("s1", user_id=7)
+            chat_store.add_message("s1", "user", f"q{n}", 1000 + n, None, user_id=7)
+            chat_store.add_message("s1", "assistant", f"a{n}", 1001 + n, {"references": []}, user_id=7)
+        assert chat_store.flush_chat_writes()
+
+        sessions = _statements(cursor, "INSERT INTO chat_sessions")
+        messages = _statements(cursor, "INSERT INTO chat_messages")
+        assert len(sessions) == 1 and len(messages) == 1
+        assert sessions[0].args[1] == ["s1", 7]          # deduped upsert
+        assert len(messages[0].args[1]) == 6 * 6          # six rows, six columns
+
+    def test_enqueue_does_not_touch_db(self, cursor):
+        with patch.object(chat_store, "CHAT_FLUSH_INTERVAL_MS", 10_000):
+            chat_store.stop_chat_writer()  # restart writer with the long interval
+            start = time.perf_counter()
+            chat_store.add_message("s2", "user", "hello", 1, None)
+            assert time.perf_counter() - start < 0.05
+            time.sleep(0.05)
+            assert not _statements(cursor, "INSERT INTO chat_messages")
+
+            chat_store.stop_chat_writer()  # flushes on shutdown
+        assert len(_statements(cursor, "INSERT INTO chat_messages")) == 1
+
+    def test_history_reads_own_writes(self, cursor):
+        cursor.fetchall.return_value = [(1, "user", "hello", {}, 5)]
+        chat_store.add_message("s3", "user", "hello", 5, None)
+
+        history = chat_store.get_history("s3")
+
+        calls = [c.args[0].lstrip() for c in cursor.execute.call_args_list]
+        assert calls[-1].startswith("SELECT")
+        assert any(c.startswith("INSERT INTO chat_messages") for c in calls[:-1])
+        assert history == [{"id": 1, "role": "user", "content": "hello", "refs": {}, "ts": 5}]
+
+    def test_read_of_settled_session_does_not_flush(self, cursor):
+        chat_store.add_message("s5", "user", "hello", 5, None)
+        assert chat_store.flush_chat_writes()
+        cursor.fetchall.return_value = [(7, "user", "hello", {}, 5)]
+
+        with patch.object(chat_store, "flush_chat_writes") as flush:
+            chat_store.add_message("other", "user", "busy", 6, None)  # another session's backlog
+            assert chat_store.latest_message_id("s5") == 7
+            chat_store.get_history("s5")
+        flush.assert_not_called()
+
+    def test_one_flush_per_request(self, cursor):
+        cursor.fetchall.return_value = [(1, "user", "hello", {}, 5)]
+        chat_store.add_message("s6", "user", "hello", 5, None)
+        before = chat_store.chat_store_get_stats()["read_flushes"]
+
+        chat_store.latest_message_id("s6")
+        chat_store.get_history("s6")  # second read of the same request
+
+        assert chat_store.chat_store_get_stats()["read_flushes"] == before + 1
+
+    def test_queue_full_drops_instead_of_blocking(self, cursor):
+        with patch.object(chat_store, "_QUEUE", chat_store.queue.Queue(maxsize=1)), \
+             patch.object(chat_store, "_ensure_writer"):
+            chat_store._remember("s4", None)  # session row already written
+            before = chat_store.chat_store_get_stats()["dropped"]
+            chat_store.add_message("s4", "user", "a", 1, None)
+            chat_store.add_message("s4", "user", "b", 2, None)
+            assert chat_store.chat_store_get_stats()["dropped"] == before + 1
+
+
+class TestSessionDebounce:
+    """Test known-session skipping and bulk last_seen_at updates."""
+
+    def test_known_session_is_not_upserted_again(self, cursor):
+        chat_store.ensure_session("k1", user_id=3)
+        assert chat_store.flush_chat_writes()
+        for _ in range(5):
+            chat_store.ensure_session("k1", user_id=3)
+            chat_store.ensure_session("k1")
+        assert chat_store.flush_chat_writes()
+
+        assert len(_statements(cursor, "INSERT INTO chat_sessions")) == 1
+        assert chat_store.chat_store_get_stats()["sessions_skipped"] >= 10
+
+    def test_new_user_for_known_session_upserts(self, cursor):
+        chat_store.ensure_session("k2")
+        chat_store.ensure_session("k2", user_id=9)
+        assert chat_store.flush_chat_writes()
+
+        sessions = _statements(cursor, "INSERT INTO chat_sessions")
+        assert sessions[-1].args[1] == ["k2", 9]
+
+    def test_touches_are_aggregated_into_one_update(self, cursor):
+        for sid in ("k3", "k4"):
+            chat_store.ensure_session(sid)
+        assert chat_store.flush_chat_writes()
+        for _ in range(3):
+            for sid in ("k3", "k4"):
+                chat_store.ensure_session(sid)
+        assert chat_store.flush_chat_writes()
+        assert not _statements(cursor, "UPDATE chat_sessions")  # waits for the touch interval
+
+        chat_store.stop_chat_writer()
+        updates = _statements(cursor, "UPDATE chat_sessions")
+        assert len(updates) == 1
+        assert updates[0].args[1][0::2] == ["k3", "k4"]  # one row per session
+
+    def test_failed_batch_forgets_sessions(self, cursor):
+        cursor.execute.side_effect = RuntimeError("db down")
+        chat_store.ensure_session("k5")
+        assert chat_store.flush_chat_writes()
+        cursor.execute.side_effect = None
+
+        chat_store.ensure_session("k5")
+        assert chat_store.flush_chat_writes()
+        assert _statements(cursor, "INSERT INTO chat_sessions")[-1].args[1] == ["k5", None]
+
+    def test_bad_row_drops_only_itself(self, cursor):
+        def _execute(sql, params=None):
+            if sql.startswith("INSERT INTO chat_messages") and "bad" in params:
+                raise RuntimeError("fk violation")
+        cursor.execute.side_effect = _execute
+        with patch.object(chat_store, "CHAT_WRITE_BACKOFF_MS", 0):
+            before = chat_store.chat_store_get_stats()
+            chat_store.add_message("r1", "user", "bad", 1, None)
+            chat_store.add_message("r1", "user", "ok1", 2, None)
+            chat_store.add_message("r2", "user", "ok2", 3, None)
+            assert chat_store.flush_chat_writes()
+        after = chat_store.chat_store_get_stats()
+        assert after["dropped"] == before["dropped"] + 1
+        assert after["retries"] == before["retries"] + chat_store.CHAT_WRITE_RETRIES
+        written = [c.args[1] for c in _statements(cursor, "INSERT INTO chat_messages")]
+        assert any("ok1" in p and "bad" not in p for p in written)
+        assert any("ok2" in p and "bad" not in p for p in written)
+
+    def test_clear_history_is_one_transaction(self, cursor):
+        pool = chat_store.get_pool()
+        pool.connection.reset_mock()
+        chat_store.clear_history("c1")
+        assert pool.connection.call_count == 1
+        assert len(_statements(cursor, "DELETE FROM")) == 2
+
+
+class TestHistoryPaging:
+    """Test keyset-paginated history reads."""
+
+    def test_default_page_is_newest_first_then_reversed(self, cursor):
+        cursor.fetchall.return_value = [(9, "assistant", "a", {}, 2), (8, "user", "q", {}, 1)]
+
+        turns = chat_store.get_history("p1", limit=2)
+
+        sql, params = cursor.execute.call_args.args
+        assert "ORDER BY id DESC" in sql and params == ("p1", 2)
+        assert [t["id"] for t in turns] == [8, 9]
+
+    def test_before_and_after_cursors(self, cursor):
+        cursor.fetchall.return_value = []
+        chat_store.get_history("p1", limit=5, before_id=40)
+        sql, params = cursor.execute.call_args.args
+        assert "id < %s" in sql and "DESC" in sql and params == ("p1", 40, 5)
+
+        chat_store.get_history("p1", limit=5, after_id=40)
+        sql, params = cursor.execute.call_args.args
+        assert "id > %s" in sql and "ASC" in sql and params == ("p1", 40, 5)
+
+    def test_refs_can_be_excluded(self, cursor):
+        cursor.fetchall.return_value = [(1, "user", "q", None, 1)]
+
+        turns = chat_store.get_history("p1", include_refs=False)
+
+        assert "refs" not in cursor.execute.call_args.args[0]
+        assert "refs" not in turns[0]
@@ -0,0 +1,132 @@
+# tests/test_circuit_breaker.py
+import pytest
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+
+import utils.cache as cache
+import utils.embeddings as embeddings
+from utils.cache import cache_result
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from utils.db import pool_connection
+
+
+def _fail():
+    raise ConnectionError("down")
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions."""
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker("t-open", failure_threshold=2, recovery_sec=60)
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(_fail)
+
+        assert breaker.state == OPEN
+        fn = MagicMock()
+        with pytest.raises(CircuitOpenError):
+            breaker.call(fn)
+        fn.assert_not_called()
+
+    def test_half_open_probe_success_closes(self):
+        breaker = CircuitBreaker("t-probe", failure_threshold=1, recovery_sec=0.0)
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_failure_reopens(self):
+        breaker = CircuitBreaker("t-reopen", failure_threshold=1, recovery_sec=0.0)
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+        assert breaker.state == HALF_OPEN
+        breaker.recovery_sec = 60
+        assert breaker.allow()          # the single probe
+        assert not breaker.allow()      # further calls rejected while probing
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+
+class TestDependencyBreakers:
+    """Test the wrapped dependencies degrade instead of waiting."""
+
+    def test_embeddings_skip_retries_when_open(self):
+        breaker = CircuitBreaker("t-embed", failure_threshold=1, recovery_sec=60)
+        client = MagicMock()
+        client.embeddings.create.side_effect = ConnectionError("down")
+        with patch.object(embeddings, "_BREAKER", breaker), \
+             patch.object(embeddings, "EMBEDDING_BACKEND", "openai"), \
+             patch.object(embeddings, "_init_openai", return_value=client), \
+             patch("time.sleep") as sleep:
+            embeddings._embed_openai_cached.cache_clear()
+            vec, model = embeddings.get_embedding("breaker test question")
+
+        assert embeddings.is_degraded(model)
+        assert client.embeddings.create.call_count == 1
+        sleep.assert_not_called()
+
+    def test_pool_connection_fails_fast_when_open(self):
+        breaker = CircuitBreaker("t-db", failure_threshold=1, recovery_sec=60)
+        pool = MagicMock()
+        pool.connection.side_effect = ConnectionError("timeout")
+        with patch("utils.db._BREAKER", breaker):
+            with pytest.raises(ConnectionError):
+                with pool_connection(pool):
+                    pass
+            with pytest.raises(CircuitOpenError):
+                with pool_connection(pool):
+                    pass
+
+        assert pool.connection.call_count == 1
+
+    def test_cache_serves_stale_on_server_error(self):
+        calls = {"n": 0}
+
+        @cache_result(ttl=0)
+        def answer(question=None):
+            calls["n"] += 1
+            if calls["n"] > 1:
+                raise HTTPException(status_code=502, detail="LLM down")
+            return {"answer": "fresh"}
+
+        with patch.object(cache, "_USE_REDIS", False):
+            assert answer(question="stale breaker test") == {"answer": "fresh"}
+            assert answer(question="stale breaker test") == {"answer": "fresh"}
+
+        assert calls["n"] == 2
+
+    def test_cache_serves_stale_on_server_error_with_redis(self):
+        calls = {"n": 0}
+        store = {}
+        redis_client = MagicMock()
+        redis_client.get.side_effect = lambda key: None  # live entry expired
+        redis_client.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+
+        @cache_result(ttl=60)
+        def answer(question=None):
+            calls["n"] += 1
+            if calls["n"] > 1:
+                raise HTTPException(status_code=502, detail="LLM down")
+            return {"answer": "fresh"}
+
+        breaker = CircuitBreaker("t-redis-cache", failure_threshold=5, recovery_sec=60)
+        with patch.object(cache, "_USE_REDIS", True), patch.object(cache, "_REDIS_INIT", True), \
+             patch.object(cache, "_REDIS", redis_client), patch.object(cache, "_REDIS_BREAKER", breaker):
+            assert answer(question="stale redis test") == {"answer": "fresh"}
+            assert answer(question="stale redis test") == {"answer": "fresh"}
+
+        assert calls["n"] == 2 and len(store) == 1  # written to Redis, stale copy served from memory
+
+    def test_cache_does_not_mask_client_errors(self):
+        @cache_result(ttl=0)
+        def answer(question=None):
+            raise HTTPException(status_code=400, detail="bad")
+
+        with patch.object(cache, "_USE_REDIS", False):
+            with pytest.raises(HTTPException):
+                answer(question="client error breaker test")
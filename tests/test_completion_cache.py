@@ -0,0 +1,82 @@
+# tests/test_completion_cache.py
+import pytest
+from unittest.mock import Mock, patch
+
+import utils.completion_cache as cc
+
+
+MESSAGES = [
+    {"role": "system", "content": "Be brief."},
+    {"role": "user", "content": "Context: pricing. Question: should we raise prices?"},
+]
+
+
+@pytest.fixture(autouse=True)
+def memory_cache():
+    with patch.object(cc, "_REDIS", None), patch.object(cc, "_REDIS_INIT", True), \
+         patch.object(cc, "LLM_CACHE_ENABLED", True):
+        cc.completion_cache_clear()
+        yield
+        cc.completion_cache_clear()
+
+
+def _call(create, **overrides):
+    kwargs = dict(provider="openai", model="gpt-4o-mini", messages=MESSAGES, temperature=0.2, max_tokens=600)
+    kwargs.update(overrides)
+    return cc.cached_completion(create, **kwargs)
+
+
+class TestCompletionCache:
+    """Test the prompt-fingerprint completion cache."""
+
+    def test_identical_prompt_hits(self):
+        create = Mock(return_value="answer")
+
+        assert _call(create) == ("answer", False)
+        assert _call(create) == ("answer", True)
+        assert create.call_count == 1
+        assert cc.completion_cache_get_stats()["hits"] == 1
+
+    def test_key_includes_generation_params(self):
+        create = Mock(return_value="answer")
+
+        _call(create)
+        _call(create, temperature=0.7)
+        _call(create, max_tokens=100)
+        _call(create, provider="local")
+        _call(create, messages=[{"role": "system", "content": "Be verbose."}] + MESSAGES[1:])
+
+        assert create.call_count == 5
+
+    def test_empty_completion_not_stored(self):
+        create = Mock(return_value="")
+
+        _call(create)
+        _call(create)
+
+        assert create.call_count == 2
+
+    def test_store_hook_can_skip_writes(self):
+        create = Mock(return_value="fallback answer")
+
+        _call(create, store=lambda: False)
+        _call(create, store=lambda: False)
+
+        assert create.call_count == 2
+        assert cc.completion_cache_get_stats()["writes"] == 0
+
+    def test_ttl_expiry(self):
+        create = Mock(return_value="answer")
+
+        with patch("utils.completion_cache.time.time", return_value=1000.0):
+            _call(create, ttl=10)
+        with patch("utils.completion_cache.time.time", return_value=1011.0):
+            assert _call(create, ttl=10) == ("answer", False)
+
+    def test_memory_lru_bound(self):
+        with patch.object(cc, "LLM_CACHE_MAX_ENTRIES", 2):
+            for n in range(3):
+                _call(Mock(return_value=f"a{n}"), temperature=float(n))
+
+            assert cc.completion_cache_get_stats()["entries"] == 2
+            assert _call(Mock(return_value="fresh"), temperature=0.0) == ("fresh", False)
@@ -0,0 +1,45 @@
+# tests/test_context_builder.py
+from utils.context_builder import build_context, count_tokens
+
+
+def _row(i, decision, content="", sim=0.8):
+    return (i, f"Title {i}", decision, None, content, [], "tag", "seed", "reddit",
+            f"https://example.com/{i}", sim, None)
+
+
+LONG = " ".join(f"Sentence number {n} explains a pricing tradeoff in detail." for n in range(60))
+
+
+class TestContextBuilder:
+    """Test token-budgeted context assembly."""
+
+    def test_respects_budget(self):
+        rows = [_row(1, LONG), _row(2, LONG.replace("pricing", "hiring"))]
+        context, stats = build_context(rows, [1.0, 0.5], budget=200)
+
+        assert stats["context_tokens"] <= 200 + 10  # separators between blocks
+        assert count_tokens(context) == stats["context_tokens"]
+        assert stats["references"] == 2
+
+    def test_higher_score_gets_more_tokens(self):
+        rows = [_row(1, LONG), _row(2, LONG.replace("pricing", "hiring"))]
+        context, _ = build_context(rows, [0.9, 0.1], budget=300)
+
+        first, second = context.split("\n\n")
+        assert count_tokens(first) > count_tokens(second)
+
+    def test_duplicate_sentences_dropped(self):
+        text = "We raised prices by 20 percent. Churn stayed flat."
+        rows = [_row(1, text), _row(2, text + " Hiring slowed down.")]
+        context, stats = build_context(rows, [1.0, 0.9], budget=500)
+
+        assert context.count("We raised prices by 20 percent.") == 1
+        assert "Hiring slowed down." in context
+        assert stats["dropped_sentences"] == 2
+
+    def test_passages_replace_fields(self):
+        rows = [_row(1, "Full decision text.", content="Long content body.")]
+        context, _ = build_context(rows, [1.0], passages={1: ["Matched passage only."]})
+
+        assert "Matched passage only." in context
+        assert "Long content body." not in context
@@ -0,0 +1,158 @@
+# tests/test_conversation.py
+import threading
+import time
+
+import pytest
+from unittest.mock import patch
+
+import utils.conversation as conversation
+from utils.cache import cache_result
+
+
+def _turns(n, start=1):
+    return [
+        {"id": i, "role": "user" if i % 2 else "assistant", "content": f"turn {i} " + "word " * 20, "ts": i}
+        for i in range(start, start + n)
+    ]
+
+
+def _paged(turns):
+    """get_history stand-in: keyset pages after `after_id`, like chat_store."""
+    def get_history(session_id, limit=100, after_id=None, **kwargs):
+        return [t for t in turns if after_id is None or t["id"] > after_id][:limit]
+    return get_history
+
+
+@pytest.fixture
+def store():
+    with patch.object(conversation, "get_summary", return_value=("", 0)) as get_summary, \
+         patch.object(conversation, "get_history") as get_history, \
+         patch.object(conversation, "save_summary") as save_summary, \
+         patch.object(conversation, "llm_complete", return_value=("They compare pricing models.", "openai")) as llm:
+        yield {"get_summary": get_summary, "get_history": get_history, "save_summary": save_summary, "llm": llm}
+
+
+@pytest.fixture
+def inline():
+    with patch.object(conversation, "HISTORY_FOLD_INLINE", True):
+        yield
+
+
+class TestBuildHistory:
+    """Test bounded conversation history with a rolling summary."""
+
+    def test_short_history_is_verbatim(self, store):
+        store["get_history"].side_effect = _paged(_turns(2))
+
+        text, stats = conversation.build_history("s1", budget=600)
+
+        assert "User: turn 1" in text and "Assistant: turn 2" in text
+        assert stats["history_turns"] == 2 and stats["history_summarized_turns"] == 0
+        store["llm"].assert_not_called()
+
+    def test_overflow_is_folded_into_summary(self, store, inline):
+        store["get_history"].side_effect = _paged(_turns(10))
+
+        text, stats = conversation.build_history("s1", budget=120)
+
+        assert stats["history_tokens"] <= 120 + 20  # headers on top of the budget
+        folded = stats["history_summarized_turns"]
+        assert folded > 0 and folded + stats["history_turns"] == 10
+        session, summary, through_id, _ = store["save_summary"].call_args.args
+        assert (session, through_id) == ("s1", folded)
+        assert "They compare pricing models." in text
+        assert "turn 10" in text  # newest turn kept verbatim
+
+    def test_only_turns_after_summary_are_used(self, store):
+        store["get_summary"].return_value = ("Earlier: seed round.", 8)
+        store["get_history"].side_effect = _paged(_turns(10))
+
+        text, stats = conversation.build_history("s1", budget=600)
+
+        assert "Earlier: seed round." in text
+        assert "turn 8 " not in text and "turn 9" in text
+        assert stats["history_turns"] == 2
+
+    def test_backlog_beyond_one_page_is_folded_in_order(self, store, inline):
+        store["get_summary"].return_value = ("", 0)
+        store["get_history"].side_effect = _paged(_turns(100))
+
+        with patch.object(conversation, "HISTORY_FETCH_LIMIT", 40):
+            text, stats = conversation.build_history("s1", budget=120)
+
+        folded = stats["history_summarized_turns"]
+        assert folded + stats["history_turns"] == 100
+        through_ids = [c.args[2] for c in store["save_summary"].call_args_list]
+        assert through_ids == [40, 80, folded]  # oldest page first, nothing skipped
+        first_prompt = store["llm"].call_args_list[0].args[0][1]["content"]
+        assert "turn 1 " in first_prompt and "turn 41 " not in first_prompt
+
+    def test_summary_failure_degrades(self, store, inline):
+        store["get_history"].side_effect = _paged(_turns(10))
+        store["llm"].side_effect = RuntimeError("all providers failed")
+
+        text, stats = conversation.build_history("s1", budget=120)
+
+        store["save_summary"].assert_not_called()
+        assert stats["history_summarized_turns"] == 0 and "turn 10" in text
+
+
+class TestBackgroundFold:
+    """Test that overflow is folded off the request thread by default."""
+
+    @pytest.fixture(autouse=True)
+    def drain(self):
+        yield
+        conversation.stop_history_folds()
+
+    def test_request_does_not_wait_for_the_fold(self, store):
+        store["get_history"].side_effect = _paged(_turns(10))
+        threads = []
+
+        def _slow_llm(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            time.sleep(0.3)
+            return "They compare pricing models.", "openai"
+
+        store["llm"].side_effect = _slow_llm
+        start = time.perf_counter()
+        text, stats = conversation.build_history("s1", budget=120)
+        assert time.perf_counter() - start < 0.2
+        assert stats["history_summarized_turns"] == 0 and stats["history_pending_turns"] > 0
+        assert "turn 10" in text and "They compare" not in text
+
+        conversation.stop_history_folds()
+        assert threads and threads[0].startswith("history-fold")
+        assert store["save_summary"].call_args.args[2] == stats["history_pending_turns"]
+
+    def test_one_fold_per_session_in_flight(self, store):
+        store["get_history"].side_effect = _paged(_turns(10))
+        release = threading.Event()
+        store["llm"].side_effect = lambda *a, **k: (release.wait(2), ("summary", "openai"))[1]
+        before = conversation.history_get_stats()
+
+        conversation.build_history("s1", budget=120)
+        conversation.build_history("s1", budget=120)
+        release.set()
+
+        after = conversation.history_get_stats()
+        assert after["scheduled"] == before["scheduled"] + 1
+        assert after["skipped_in_flight"] == before["skipped_in_flight"] + 1
+
+
+class TestCacheBypass:
+    """Test that conversational calls skip the response cache."""
+
+    def test_bypass_kwarg(self):
+        calls = []
+
+        @cache_result(ttl=60, bypass="conversational")
+        def answer(question: str, conversational: bool = False):
+            calls.append(question)
+            return {"n": len(calls)}
+
+        answer(question="bypass test?")
+        answer(question="bypass test?")
+        answer(question="bypass test?", conversational=True)
+        answer(question="bypass test?", conversational=True)
+        assert len(calls) == 3
@@ -0,0 +1,80 @@
+# tests/test_db.py
+import pytest
+from unittest.mock import MagicMock, patch
+
+import utils.db as db
+from utils.retrieval import bm25_available, prepare_session
+
+
+@pytest.fixture(autouse=True)
+def caps():
+    with patch.object(db, "_CAPS", None):
+        yield
+
+
+def _caps_cursor(bm25=True):
+    cur = MagicMock()
+    cur.fetchone.return_value = (bm25, False, "0.7.0", [{"table": "decisions", "index": "decisions_hnsw", "method": "hnsw"}])
+    return cur
+
+
+class TestPoolerMode:
+    """Test pooler mode detection and per-connection session settings."""
+
+    def test_auto_detects_neon_pooler(self):
+        with patch.dict("os.environ", {"DB_POOLER_MODE": "auto"}):
+            assert db._pooler_mode({"host": "ep-cool-1-pooler.us-east-2.aws.neon.tech"}) == "transaction"
+            assert db._pooler_mode({"host": "ep-cool-1.us-east-2.aws.neon.tech"}) == "session"
+
+    def test_explicit_mode_wins(self):
+        with patch.dict("os.environ", {"DB_POOLER_MODE": "session"}):
+            assert db._pooler_mode({"host": "ep-cool-1-pooler.neon.tech"}) == "session"
+
+    def test_configure_sets_timeout_once_per_connection(self):
+        conn = MagicMock()
+        with patch.object(db, "DB_POOLER_MODE", "session"):
+            db._configure_connection(conn)
+        assert "statement_timeout" in conn.execute.call_args[0][0]
+        conn.commit.assert_called_once()
+
+        cur = MagicMock()
+        with patch.object(db, "DB_POOLER_MODE", "session"):
+            prepare_session(cur)
+        cur.execute.assert_not_called()
+
+    def test_transaction_pooler_uses_set_local(self):
+        conn, cur = MagicMock(), MagicMock()
+        with patch.object(db, "DB_POOLER_MODE", "transaction"):
+            db._configure_connection(conn)
+            prepare_session(cur)
+        conn.execute.assert_not_called()
+        assert "SET LOCAL statement_timeout" in cur.execute.call_args[0][0]
+
+
+class TestCapabilities:
+    """Test the cached extension/index probe."""
+
+    def test_probe_is_cached(self):
+        cur = _caps_cursor(bm25=True)
+        assert bm25_available(cur) is True
+        assert bm25_available(cur) is True
+        assert cur.execute.call_count == 1
+
+        caps = db.db_capabilities()
+        assert caps["vector_version"] == "0.7.0"
+        assert caps["vector_indexes"][0]["method"] == "hnsw"
+
+    def test_startup_probe_avoids_request_query(self):
+        pool = MagicMock()
+        pool.connection.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value = _caps_cursor(bm25=False)
+        db.refresh_capabilities(pool)
+
+        cur = MagicMock()
+        assert bm25_available(cur) is False
+        cur.execute.assert_not_called()
+
+    def test_probe_failure_falls_back(self):
+        cur = MagicMock()
+        cur.execute.side_effect = RuntimeError("permission denied")
+        assert bm25_available(cur) is False
+        assert db.db_capabilities() is None
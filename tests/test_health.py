@@ -1,4 +1,5 @@
-import sys, os
+import sys, os, threading
+from unittest.mock import patch
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import pytest
 from fastapi.testclient import TestClient
@@ -15,3 +16,71 @@ def test_health_check():
     assert "status" in data
     assert "db" in data
     assert data["status"] == "ok"
+
+
+@pytest.fixture
+def probes():
+    import utils.health as health
+    with patch.dict(health._PROBES, clear=True), patch.dict(health._STATUS, clear=True), \
+         patch.dict(health._RUNNING, clear=True):
+        yield health
+
+
+def test_health_does_not_touch_db(probes):
+    """/health is served from the prober cache; no pool connection per call."""
+    with patch("app.main.POOL") as pool:
+        for _ in range(5):
+            assert client.get("/health").status_code == 200
+    pool.connection.assert_not_called()
+
+
+def test_ready_follows_critical_probes(probes):
+    state = {"db_up": True}
+
+    def _db():
+        if not state["db_up"]:
+            raise RuntimeError("connection refused")
+
+    def _llm():
+        raise RuntimeError("no key")
+
+    probes.register_probe("postgres", _db, critical=True)
+    probes.register_probe("llm", _llm)
+    assert client.get("/ready").status_code == 503  # nothing probed yet
+
+    probes.run_probes()
+    ready = client.get("/ready")
+    assert ready.status_code == 200  # non-critical llm down does not gate readiness
+    assert ready.json()["dependencies"]["llm"]["status"] == "down"
+    assert client.get("/health").json()["db"] == "connected"
+
+    state["db_up"] = False
+    probes.run_probes()
+    assert client.get("/ready").status_code == 503
+    assert client.get("/health").json()["db"] == "unreachable"
+
+
+def test_stale_probe_is_unknown(probes):
+    probes.register_probe("postgres", lambda: None, critical=True)
+    probes.run_probes()
+    with patch.object(probes, "HEALTH_STALE_SEC", -1):
+        status = probes.dependency_status()
+    assert status["postgres"]["status"] == "unknown"
+    assert not probes.is_ready(status)
+
+
+def test_hanging_probe_is_not_stacked(probes):
+    release = threading.Event()
+    calls = []
+
+    def _hang():
+        calls.append(1)
+        release.wait(5)
+
+    probes.register_probe("postgres", _hang, critical=True)
+    with patch.object(probes, "HEALTH_PROBE_TIMEOUT_SEC", 0.05):
+        probes.run_probes()
+        probes.run_probes()
+    release.set()
+    assert len(calls) == 1
+    assert probes.dependency_status()["postgres"]["error"] == "probe still running"
@@ -0,0 +1,130 @@
+# tests/test_langfuse.py
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pytest
+
+import utils.observability.langfuse as lf
+from utils.stage_timing import stage
+
+
+class _Collector(BaseHTTPRequestHandler):
+    """Local stand-in for the Langfuse ingestion endpoint."""
+    batches = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        _Collector.batches.append((self.path, self.headers.get("Authorization"), json.loads(body)["batch"]))
+        self.send_response(207)
+        self.end_headers()
+        self.wfile.write(b'{"successes": [], "errors": []}')
+
+    def log_message(self, *args):
+        pass
+
+
+class _ListSink:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.events, self.delay, self.fail = [], delay, fail
+
+    def export(self, events):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("collector down")
+        self.events.extend(events)
+
+
+@pytest.fixture
+def sampled():
+    with patch.object(lf, "LANGFUSE_SAMPLING_RATE", 1.0):
+        yield
+    lf.flush_tracing(2)
+    lf.set_sink(None)
+
+
+class TestTraceExport:
+    """Test background export of traces, spans and events."""
+
+    def test_exports_to_stand_in_collector(self, sampled):
+        server = HTTPServer(("127.0.0.1", 0), _Collector)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        _Collector.batches.clear()
+        try:
+            lf.set_sink(lf.IngestionSink(f"http://127.0.0.1:{server.server_port}", "pk", "sk"))
+            with lf.lf_trace("ask", user_id=7, input_text="pricing?") as (trace, enabled):
+                assert enabled
+                with lf.lf_span(trace, "retrieval"):
+                    with stage("vector"):
+                        pass
+                lf.lf_log_event(trace, "ask.usage", {"prompt_tokens": 10})
+            assert lf.flush_tracing(5)
+        finally:
+            server.shutdown()
+
+        path, auth, events = _Collector.batches[-1]
+        assert path == "/api/public/ingestion" and auth.startswith("Basic ")
+        kinds = {e["type"] for e in events}
+        assert kinds == {"trace-create", "span-create", "event-create"}
+        trace_body = next(e["body"] for e in events if e["type"] == "trace-create")
+        assert trace_body["userId"] == "7" and isinstance(trace_body["timestamp"], str)
+        spans = {e["body"]["name"]: e["body"] for e in events if e["type"] == "span-create"}
+        assert spans["vector"]["parentObservationId"] == spans["retrieval"]["id"]
+        assert all(e["body"].get("traceId", trace_body["id"]) == trace_body["id"] for e in events)
+
+    def test_slow_collector_adds_no_latency(self, sampled):
+        lf.set_sink(_ListSink(delay=0.5))
+        start = time.perf_counter()
+        for _ in range(3):
+            with lf.lf_trace("ask") as (trace, _):
+                lf.lf_log_llm_usage(trace, "gpt-4o-mini", 100, 50, 150, 800)
+        assert time.perf_counter() - start < 0.1
+
+    def test_export_errors_are_counted(self, sampled):
+        lf.set_sink(_ListSink(fail=True))
+        before = lf.tracing_get_stats()["export_errors"]
+        with lf.lf_trace("ask"):
+            pass
+        assert lf.flush_tracing(5)
+        assert lf.tracing_get_stats()["export_errors"] == before + 1
+
+
+class TestSampling:
+    """Test head-based sampling and the drop counter."""
+
+    def test_decided_once_per_request(self, sampled):
+        sink = _ListSink()
+        lf.set_sink(sink)
+        with patch("utils.observability.langfuse.random.random", return_value=0.0) as rnd:
+            with lf.lf_trace("ask") as (outer, _):
+                with lf.lf_trace("nested") as (inner, enabled):
+                    assert inner is outer and enabled
+        assert rnd.call_count == 1
+
+    def test_unsampled_request_records_nothing(self):
+        sink = _ListSink()
+        lf.set_sink(sink)
+        try:
+            with patch.object(lf, "LANGFUSE_SAMPLING_RATE", 0.0):
+                before = lf.tracing_get_stats()["enqueued"]
+                with lf.lf_trace("ask") as (trace, enabled):
+                    assert trace is None and not enabled
+                    with lf.lf_span(trace, "retrieval") as span:
+                        assert span is None
+                    with stage("vector"):
+                        pass
+                assert lf.tracing_get_stats()["enqueued"] == before
+        finally:
+            lf.set_sink(None)
+
+    def test_full_queue_drops_and_counts(self, sampled):
+        lf.set_sink(_ListSink())
+        with patch.object(lf, "_QUEUE", queue.Queue(maxsize=1)), patch.object(lf, "_ensure_exporter"):
+            before = lf.tracing_get_stats()["dropped"]
+            with lf.lf_trace("ask") as (trace, _):
+                lf.lf_log_event(trace, "a", {})
+                lf.lf_log_event(trace, "b", {})
+            assert lf.tracing_get_stats()["dropped"] == before + 2
@@ -0,0 +1,137 @@
+# tests/test_llm_gateway.py
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from unittest.mock import patch
+
+import utils.llm_gateway as gw
+
+
+class FakeLLM:
+    """OpenAI-compatible /v1/chat/completions stand-in with scripted latency/status."""
+
+    def __init__(self, reply="fake answer"):
+        self.reply = reply
+        self.script = []  # [(delay_sec, status)] consumed per request, then (0, 200)
+        self.requests = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with fake._lock:
+                    fake.requests += 1
+                    delay, status = fake.script.pop(0) if fake.script else (0, 200)
+                time.sleep(delay)
+                body = {
+                    "id": "cmpl-1", "object": "chat.completion", "created": 0, "model": "fake",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": fake.reply}}],
+                } if status == 200 else {"error": {"message": "boom", "type": "server_error"}}
+                payload = json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client cancelled the losing attempt
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def fake_llm():
+    servers = []
+
+    def make(name, reply="fake answer"):
+        server = FakeLLM(reply)
+        servers.append(server)
+        gw.register_provider(name, server.base_url)
+        return server
+
+    with patch.object(gw, "_STATS", {}), patch.object(gw, "_LATENCY", {}), \
+         patch.object(gw, "LLM_HEDGE_ENABLED", True), \
+         patch.object(gw, "LLM_HEDGE_DEFAULT_DELAY_MS", 200), \
+         patch.object(gw, "LLM_HEDGE_MIN_DELAY_MS", 50):
+        yield make
+    for server in servers:
+        server.close()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestLLMGateway:
+    """Test hedging, fallback and latency tracking against a fake LLM server."""
+
+    def test_basic_completion(self, fake_llm):
+        fake_llm("fake-a", reply="hello")
+
+        content, provider = gw.complete(MESSAGES, providers=["fake-a"])
+
+        assert (content, provider) == ("hello", "fake-a")
+        assert gw.gateway_get_stats()["fake-a"]["samples"] == 1
+
+    def test_hedge_beats_stalled_attempt(self, fake_llm):
+        server = fake_llm("fake-a")
+        server.script = [(3.0, 200)]  # first attempt stalls
+
+        start = time.perf_counter()
+        content, _ = gw.complete(MESSAGES, providers=["fake-a"])
+        elapsed = time.perf_counter() - start
+
+        assert content == "fake answer"
+        assert elapsed < 2.0
+        stats = gw.gateway_get_stats()["fake-a"]
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+        assert server.requests == 2
+
+    def test_no_hedge_when_fast(self, fake_llm):
+        server = fake_llm("fake-a")
+
+        gw.complete(MESSAGES, providers=["fake-a"])
+
+        assert gw.gateway_get_stats()["fake-a"]["hedges"] == 0
+        assert server.requests == 1
+
+    def test_fallback_to_next_provider(self, fake_llm):
+        bad = fake_llm("fake-bad")
+        bad.script = [(0, 500)]
+        fake_llm("fake-good", reply="from fallback")
+
+        content, provider = gw.complete(MESSAGES, providers=["fake-bad", "fake-good"])
+
+        assert (content, provider) == ("from fallback", "fake-good")
+        stats = gw.gateway_get_stats()
+        assert stats["fake-bad"]["errors"] == 1
+        assert stats["fake-bad"]["fallbacks"] == 1
+
+    def test_all_providers_fail(self, fake_llm):
+        bad = fake_llm("fake-bad")
+        bad.script = [(0, 500)]
+
+        with pytest.raises(RuntimeError):
+            gw.complete(MESSAGES, providers=["fake-bad"])
+
+    def test_hedge_delay_tracks_p95(self, fake_llm):
+        with patch.object(gw, "LLM_HEDGE_MIN_SAMPLES", 5):
+            for ms in (100, 110, 120, 130, 900):
+                gw._observe("p", ms / 1000)
+
+            assert gw.hedge_delay("p") == pytest.approx(0.9)
@@ -0,0 +1,98 @@
+# tests/test_logger.py
+import logging
+import queue
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import utils.logger as log_utils
+from utils.logger import SamplingFilter, set_log_sampling, setup_logger
+from utils.stage_timing import ServerTimingMiddleware, request_summary, stage
+
+
+def _record(msg, args, level=logging.INFO):
+    return logging.LogRecord("startupscout.test", level, __file__, 1, msg, args, None)
+
+
+class TestAsyncPipeline:
+    """Test the queue handler feeding the log-writer thread."""
+
+    def test_loggers_share_one_queue_handler(self):
+        logger = setup_logger("startupscout.test.async")
+        if log_utils.LOG_ASYNC:
+            assert isinstance(logger.handlers[0], log_utils.QueueHandler)
+            assert log_utils._LISTENER._thread.name == "log-writer"
+
+    def test_formatting_is_deferred_for_simple_args(self):
+        handler = log_utils._NonBlockingQueueHandler(queue.Queue())
+        record = handler.prepare(_record("n=%d model=%s", (3, "m")))
+        assert record.msg == "n=%d model=%s" and record.args == (3, "m")
+
+    def test_mutable_args_are_resolved_at_call_time(self):
+        handler = log_utils._NonBlockingQueueHandler(queue.Queue())
+        scores = [0.5]
+        record = handler.prepare(_record("scores=%s", (scores,)))
+        scores.append(0.1)
+        assert record.getMessage() == "scores=[0.5]"
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = log_utils._NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        before = log_utils._STATS["dropped"]
+        handler.handle(_record("a", None))
+        handler.handle(_record("b", None))
+        assert log_utils._STATS["dropped"] == before + 1
+
+
+class TestSampling:
+    """Test per-logger sampling of INFO records."""
+
+    def test_keeps_one_in_n_info(self):
+        f = SamplingFilter(every=3)
+        kept = [f.filter(_record("x", None)) for _ in range(9)]
+        assert kept.count(True) == 3
+        assert f.filter(_record("boom", None, level=logging.WARNING))
+
+    def test_set_log_sampling_replaces_filter(self):
+        logger = logging.getLogger("startupscout.test.sampled")
+        set_log_sampling("startupscout.test.sampled", 5)
+        set_log_sampling("startupscout.test.sampled", 10)
+        filters = [f for f in logger.filters if isinstance(f, SamplingFilter)]
+        assert len(filters) == 1 and filters[0].every == 10
+        set_log_sampling("startupscout.test.sampled", 1)
+        assert not logger.filters
+
+    def test_env_rates(self):
+        with patch.dict("os.environ", {"LOG_SAMPLE": "startupscout.retrieval=10, bad, x=y"}):
+            assert log_utils._sample_rates() == {"startupscout.retrieval": 10}
+
+
+class TestRequestSummary:
+    """Test the one-line-per-request summary."""
+
+    def test_format(self):
+        line = request_summary("GET", "/ask", 200, {"embed": 0.012, "total": 0.3})
+        assert line == "request method=GET path=/ask status=200 embed_ms=12.0 total_ms=300.0"
+
+    def test_logged_once_for_timed_requests(self):
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware, enabled=False, summary=True)
+
+        @app.get("/timed")
+        def timed_route():
+            with stage("vector"):
+                pass
+            return {}
+
+        @app.get("/plain")
+        def plain_route():
+            return {}
+
+        with patch("utils.stage_timing.logger") as logger:
+            client = TestClient(app)
+            client.get("/timed")
+            client.get("/plain")
+        assert logger.info.call_count == 1
+        line = logger.info.call_args.args[0]
+        assert line.startswith("request method=GET path=/timed status=200 vector_ms=")
+        assert "total_ms=" in line
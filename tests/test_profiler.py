@@ -0,0 +1,115 @@
+# tests/test_profiler.py
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import utils.profiler as profiler
+from app.main import app
+from utils.stage_timing import stage, stage_get_stats
+
+
+def _spin_for(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(200))
+
+
+@pytest.fixture(autouse=True)
+def clean_profiler():
+    yield
+    session = profiler.stop_profile()
+    if session is not None:
+        session.done.wait(2)
+
+
+class TestSamplingProfiler:
+    """Test sampling sessions and collapsed-stack output."""
+
+    def test_busy_thread_shows_up(self):
+        worker = threading.Thread(target=_spin_for, args=(0.4,), name="busy worker")
+        worker.start()
+        session = profiler.start_profile(seconds=0.2, interval_ms=2)
+        assert session.done.wait(2)
+        worker.join()
+
+        text = profiler.collapsed_stacks(session)
+        hot = [line for line in text.splitlines() if "_spin_for" in line]
+        assert hot and hot[0].startswith("busy_worker;")
+        assert int(hot[0].rsplit(" ", 1)[1]) > 0
+        assert session.status()["active"] is False
+
+    def test_request_budget(self):
+        session = profiler.start_profile(requests=2, seconds=5)
+        profiler.request_finished("/health")
+        profiler.request_finished("/ask")
+        assert not session.done.is_set()
+        profiler.request_finished("/ask")
+        assert session.done.wait(1)
+        assert session.requests_left == 0
+
+    def test_one_session_at_a_time(self):
+        profiler.start_profile(seconds=5)
+        with pytest.raises(profiler.ProfilerBusy):
+            profiler.start_profile(seconds=5)
+
+    def test_stage_cpu_time(self):
+        with stage("profile-test") as t:
+            _spin_for(0.02)
+        assert t.cpu > 0
+        stats = stage_get_stats()["profile-test"]
+        assert stats["count"] >= 1 and stats["cpu_sec"] > 0
+
+
+class TestProfileEndpoints:
+    """Test the admin-gated trigger endpoints and header."""
+
+    @pytest.fixture
+    def client(self):
+        with patch("app.main.ADMIN_API_KEY", "test_admin_key"):
+            yield TestClient(app)
+
+    def test_requires_admin_key(self, client):
+        assert client.post("/admin/profile", headers={"x-api-key": "nope"}).status_code == 401
+        assert client.get("/admin/profile", headers={"x-api-key": "nope"}).status_code == 401
+
+    def test_post_and_wait_returns_collapsed(self, client):
+        response = client.post(
+            "/admin/profile", params={"seconds": 0.1, "interval_ms": 2, "wait": True},
+            headers={"x-api-key": "test_admin_key"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+
+        data = client.get("/admin/profile", headers={"x-api-key": "test_admin_key"}).json()
+        assert data["active"] is False and "top_stacks" in data
+
+    def test_header_profiles_one_request(self, client):
+        client.get("/stats", headers={"x-profile": "test_admin_key"})
+        session = profiler.last_profile()
+        assert session is not None and session.requests_left is None
+        assert session.done.wait(1)
+
+    def test_header_session_ends_with_its_own_request(self):
+        from fastapi import FastAPI
+
+        app_ = FastAPI()
+        app_.add_middleware(profiler.ProfilerMiddleware, admin_key=lambda: "k")
+        seen = {}
+
+        @app_.get("/slow")
+        def slow():
+            profiler.request_finished("/ask")  # another request completing meanwhile
+            seen["active"] = not profiler.last_profile().done.is_set()
+            return {}
+
+        TestClient(app_).get("/slow", headers={"x-profile": "k"})
+        assert seen["active"] is True
+        assert profiler.last_profile().done.wait(1)
+
+    def test_wrong_header_key_is_ignored(self, client):
+        before = profiler.last_profile()
+        client.get("/stats", headers={"x-profile": "guess"})
+        assert profiler.last_profile() is before
@@ -0,0 +1,46 @@
+# tests/test_queries.py
+from unittest.mock import MagicMock, patch
+
+import utils.db as db
+from utils.queries import KEYWORD, LEXICAL, VECTOR_DOC, queries_get_stats, run, sql_for
+from utils.retrieval import lexical_search
+
+
+class TestQueryRegistry:
+    """Test hot statement rendering and prepare mode."""
+
+    def test_variants_are_built_once(self):
+        sql_for.cache_clear()
+        first = sql_for(VECTOR_DOC, limit=50)
+        assert sql_for(VECTOR_DOC, limit=50) is first
+        assert "LIMIT 50;" in first
+        assert sql_for.cache_info().hits == 1
+
+    def test_lexical_variant(self):
+        text = sql_for(LEXICAL, rank_fn="bm25", lang="simple", limit=5)
+        assert "bm25(to_tsvector('simple'" in text
+        assert text.count("%s") == 2
+
+    def test_prepared_on_direct_connections(self):
+        cur = MagicMock()
+        with patch.object(db, "DB_POOLER_MODE", "session"):
+            run(cur, KEYWORD, (["%a%"],) * 3, limit=10)
+        assert cur.execute.call_args.kwargs["prepare"] is True
+        assert queries_get_stats()["mode"] == "prepared"
+
+    def test_unnamed_behind_transaction_pooler(self):
+        cur = MagicMock()
+        with patch.object(db, "DB_POOLER_MODE", "transaction"):
+            run(cur, KEYWORD, (["%a%"],) * 3, limit=10)
+            assert queries_get_stats()["mode"] == "unnamed"
+        assert cur.execute.call_args.kwargs["prepare"] is False
+
+    def test_lexical_search_uses_cached_capability(self):
+        cur = MagicMock()
+        cur.fetchall.return_value = []
+        with patch("utils.retrieval.db_capabilities", return_value={"bm25": False}):
+            lexical_search(cur, "pricing", 7)
+        sql, params = cur.execute.call_args.args
+        assert cur.execute.call_count == 1
+        assert "ts_rank(" in sql and "LIMIT 7;" in sql
+        assert params == ("pricing", "pricing")
@@ -1,8 +1,12 @@
 # tests/test_rag_pipeline.py
+import os
+import subprocess
+import sys
+
 import pytest
 from unittest.mock import patch, Mock
 
-from utils.embeddings import get_embedding
+from utils.embeddings import get_embedding, shorten_embedding
 from utils.rerank import derive_keywords, keyword_score, evidence_bonus
 from utils.cross_rerank import rerank as cross_rerank
 
@@ -24,6 +28,50 @@ class TestEmbeddings:
             assert all(isinstance(x, float) for x in result)
             assert model == "all-mpnet-base-v2"
 
+    def test_shorten_embedding(self):
+        """Test Matryoshka truncation keeps the prefix and re-normalizes."""
+        vec = [3.0, 4.0] + [0.5] * 1534
+
+        short = shorten_embedding(vec, 2)
+
+        assert len(short) == 2
+        assert short == pytest.approx([0.6, 0.8])
+
+    def test_shorten_embedding_zero_vector(self):
+        """Test zero vectors are returned unchanged instead of dividing by zero."""
+        assert shorten_embedding([0.0] * 8, 4) == [0.0] * 4
+
+    def test_short_dim_must_match_migration(self):
+        """Test a short dimension other than the vector(256) column is refused at import."""
+        code = "import utils.embeddings"
+        for dim, ok in (("256", True), ("512", False)):
+            env = {**os.environ, "EMBED_SHORT_DIM": dim}
+            proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60)
+            assert (proc.returncode == 0) is ok, proc.stderr
+
+    def test_batch_skips_cached_texts(self):
+        """Test batched embedding only sends texts the per-text cache doesn't hold."""
+        from utils import embeddings
+
+        sent = []
+
+        def _create(input, model):
+            batch = input if isinstance(input, list) else [input]
+            sent.append(batch)
+            return Mock(data=[Mock(index=i, embedding=[float(i)]) for i in range(len(batch))])
+
+        client = Mock()
+        client.embeddings.create.side_effect = _create
+        with patch.object(embeddings, "EMBEDDING_BACKEND", "openai"), \
+             patch.object(embeddings, "_init_openai", return_value=client):
+            embeddings._embed_openai_cached.cache_clear()
+            embeddings._CACHED.clear()
+            embeddings.get_embeddings(["alpha q", "beta q"])
+            embeddings.get_embeddings(["alpha q", "beta q", "gamma q", "delta q"])
+            embeddings.get_embeddings(["alpha q", "delta q"])
+
+        assert sent == [["alpha q", "beta q"], ["gamma q", "delta q"]]
+
 
 class TestRerank:
     """Test reranking functionality."""
@@ -78,4 +126,28 @@ class TestCrossRerank:
             
             assert isinstance(scores, list)
             assert len(scores) == 4
-            assert all(isinstance(score, float) for score in scores)
\ No newline at end of file
+            assert all(isinstance(score, float) for score in scores)
+
+class TestChunking:
+    """Test passage chunking for the chunk-level index."""
+
+    def test_chunk_text_overlaps_and_offsets(self):
+        """Test chunks cover the text, overlap, and carry correct offsets."""
+        from data_processing.chunk_to_db import chunk_text
+
+        text = " ".join(f"Sentence number {i} talks about pricing." for i in range(120))
+        chunks = chunk_text(text, size=400, overlap=80)
+
+        assert len(chunks) > 1
+        for start, end, passage in chunks:
+            assert passage == text[start:end].strip()
+            assert len(passage) <= 400
+        # consecutive chunks overlap
+        assert all(chunks[i + 1][0] < chunks[i][1] for i in range(len(chunks) - 1))
+        assert chunks[-1][1] == len(text)
+
+    def test_chunk_text_empty(self):
+        """Test blank input yields no chunks."""
+        from data_processing.chunk_to_db import chunk_text
+
+        assert chunk_text("   ") == []
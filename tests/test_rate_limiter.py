@@ -0,0 +1,122 @@
+# tests/test_rate_limiter.py
+import pytest
+from unittest.mock import MagicMock, patch
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from utils.circuit_breaker import CircuitBreaker
+from utils.rate_limiter import (
+    MemoryBackend,
+    RATE_LIMITS,
+    RateLimiter,
+    RateLimitMiddleware,
+    RedisBackend,
+    charge_request,
+    limit_type_for_path,
+)
+
+
+@pytest.fixture
+def small_limits():
+    with patch.dict(RATE_LIMITS, {"ask": {"requests": 3, "window": 30}}):
+        yield
+
+
+class TestGCRA:
+    """Test the GCRA limiter on the memory backend."""
+
+    def test_burst_then_deny(self, small_limits):
+        limiter = RateLimiter(MemoryBackend())
+        with patch("utils.rate_limiter.time.time", return_value=1000.0):
+            infos = [limiter.check_key("ip:1", "ask") for _ in range(4)]
+
+        assert [i.allowed for i in infos] == [True, True, True, False]
+        assert [i.remaining for i in infos[:3]] == [2, 1, 0]
+        assert infos[3].retry_after == 10  # one emission interval (30s / 3)
+
+    def test_recovers_one_request_per_interval(self, small_limits):
+        limiter = RateLimiter(MemoryBackend())
+        with patch("utils.rate_limiter.time.time", return_value=1000.0):
+            for _ in range(3):
+                limiter.check_key("ip:1", "ask")
+        with patch("utils.rate_limiter.time.time", return_value=1010.0):
+            assert limiter.check_key("ip:1", "ask").allowed
+            assert not limiter.check_key("ip:1", "ask").allowed
+
+    def test_peek_does_not_consume(self, small_limits):
+        limiter = RateLimiter(MemoryBackend())
+        with patch("utils.rate_limiter.time.time", return_value=1000.0):
+            for _ in range(5):
+                assert limiter.check_key("ip:1", "ask", cost=0).remaining == 3
+            assert limiter.check_key("ip:1", "ask").remaining == 2
+
+    def test_idle_keys_are_swept(self, small_limits):
+        backend = MemoryBackend(sweep_every=1)
+        limiter = RateLimiter(backend)
+        with patch("utils.rate_limiter.time.time", return_value=1000.0):
+            for n in range(50):
+                limiter.check_key(f"ip:{n}", "ask")
+        assert len(backend) == 50
+        with patch("utils.rate_limiter.time.time", return_value=2000.0):
+            limiter.check_key("ip:new", "ask")
+        assert len(backend) == 1
+
+    def test_redis_failure_falls_back_to_memory(self, small_limits):
+        client = MagicMock()
+        client.register_script.return_value = MagicMock(side_effect=ConnectionError("down"))
+        backend = RedisBackend(client)
+        backend._breaker = CircuitBreaker("t-rl-redis", failure_threshold=1)
+
+        limiter = RateLimiter(backend)
+        assert limiter.check_key("ip:1", "ask").allowed
+        assert limiter.check_key("ip:1", "ask").remaining == 1
+        assert client.register_script.return_value.call_count == 1  # breaker open after first failure
+
+
+class TestRateLimitMiddleware:
+    """Test the ASGI middleware wiring."""
+
+    @pytest.fixture
+    def client(self, small_limits):
+        app = FastAPI()
+        app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(MemoryBackend()), enabled=True)
+
+        @app.get("/ask")
+        def ask():
+            return {"ok": True}
+
+        @app.get("/health")
+        def health():
+            return {"status": "ok"}
+
+        @app.post("/ask/batch")
+        def ask_batch(request: Request, n: int):
+            charge_request(request, n - 1)
+            return {"ok": True}
+
+        return TestClient(app)
+
+    def test_limits_by_path_class(self, client):
+        responses = [client.get("/ask") for _ in range(4)]
+
+        assert [r.status_code for r in responses] == [200, 200, 200, 429]
+        assert responses[0].headers["x-ratelimit-remaining"] == "2"
+        assert int(responses[3].headers["retry-after"]) >= 1
+
+    def test_batch_is_charged_per_question(self, client):
+        first = client.post("/ask/batch", params={"n": 2})
+        assert first.status_code == 200
+        assert first.headers["x-ratelimit-remaining"] == "1"
+        rejected = client.post("/ask/batch", params={"n": 3})
+        assert rejected.status_code == 429
+        assert int(rejected.headers["retry-after"]) >= 1
+
+    def test_exempt_paths(self, client):
+        assert all(client.get("/health").status_code == 200 for _ in range(10))
+
+    def test_path_mapping(self):
+        assert limit_type_for_path("/ask") == "ask"
+        assert limit_type_for_path("/ask/batch") == "ask"
+        assert limit_type_for_path("/admin/cache/clear") == "admin"
+        assert limit_type_for_path("/search/") == "default"
@@ -0,0 +1,83 @@
+# tests/test_search.py
+import pytest
+from unittest.mock import MagicMock, patch
+from fastapi.testclient import TestClient
+
+from app.main import app
+import app.search as search
+from app.search import encode_cursor, decode_cursor
+
+
+def _row(i, sim=0.8):
+    return (i, f"Title {i}", f"Decision {i}", None, None, None, "tag", "seed", "reddit",
+            f"https://example.com/{i}", sim, None)
+
+
+class TestSearchCursor:
+    """Test opaque keyset cursor encoding."""
+
+    def test_roundtrip(self):
+        token = encode_cursor(0.123456789, 42)
+        assert decode_cursor(token) == (0.123456789, 42)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class TestSearchEndpoint:
+    """Test /search pagination and projection with mocked retrieval."""
+
+    @pytest.fixture
+    def client(self):
+        return TestClient(app)
+
+    @pytest.fixture
+    def mock_retrieval(self):
+        scored = [(0.9, _row(3)), (0.9, _row(1)), (0.7, _row(2)), (0.5, _row(4)), (0.4, _row(5))]
+        search._RESULTS.clear()
+        with patch("app.search.get_embedding", return_value=([0.1] * 1536, "test")) as embed, \
+             patch("app.search.get_pool", return_value=MagicMock()), \
+             patch("app.search.fetch_candidates", return_value=([], [], [], {})) as fetch, \
+             patch("app.search.rank_candidates", return_value=scored):
+            yield {"scored": scored, "embed": embed, "fetch": fetch}
+        search._RESULTS.clear()
+
+    def test_pages_follow_cursor(self, client, mock_retrieval):
+        first = client.get("/search/", params={"query": "pricing", "top_k": 2}).json()
+        assert [r["id"] for r in first["results"]] == [1, 3]
+        assert first["next"]
+
+        second = client.get("/search/", params={"query": "pricing", "top_k": 2, "cursor": first["next"]}).json()
+        assert [r["id"] for r in second["results"]] == [2, 4]
+
+        third = client.get("/search/", params={"query": "pricing", "top_k": 2, "cursor": second["next"]}).json()
+        assert [r["id"] for r in third["results"]] == [5]
+        assert third["next"] is None
+
+    def test_later_pages_reuse_the_first_search(self, client, mock_retrieval):
+        first = client.get("/search/", params={"query": "Pricing ", "top_k": 2}).json()
+        mock_retrieval["scored"].insert(0, (0.99, _row(9)))  # index changes between pages
+        second = client.get("/search/", params={"query": "pricing", "top_k": 2, "cursor": first["next"]}).json()
+
+        assert [r["id"] for r in second["results"]] == [2, 4]
+        assert mock_retrieval["embed"].call_count == 1
+        assert mock_retrieval["fetch"].call_count == 1
+
+    def test_expired_pool_is_searched_again(self, client, mock_retrieval):
+        with patch.object(search, "SEARCH_PAGE_CACHE_SEC", 0):
+            client.get("/search/", params={"query": "pricing", "top_k": 2})
+            client.get("/search/", params={"query": "pricing", "top_k": 2})
+        assert mock_retrieval["fetch"].call_count == 2
+
+    def test_field_projection(self, client, mock_retrieval):
+        data = client.get("/search/", params={"query": "pricing", "fields": "id,url"}).json()
+        assert set(data["results"][0].keys()) == {"id", "url"}
+
+    def test_unknown_field_rejected(self, client, mock_retrieval):
+        response = client.get("/search/", params={"query": "pricing", "fields": "id,password"})
+        assert response.status_code == 400
+
+    def test_bad_cursor_rejected(self, client, mock_retrieval):
+        response = client.get("/search/", params={"query": "pricing", "cursor": "zzz"})
+        assert response.status_code == 400
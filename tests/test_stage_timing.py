@@ -0,0 +1,68 @@
+# tests/test_stage_timing.py
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.main import app as main_app
+from utils.stage_timing import ServerTimingMiddleware, request_timings, server_timing_header, stage, timed
+
+
+def _app(enabled: bool = True) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware, enabled=enabled)
+
+    @timed("rerank")
+    def _rank():
+        time.sleep(0.002)
+
+    @app.get("/work")
+    def work():  # sync: runs in the threadpool like /ask
+        with stage("vector"):
+            time.sleep(0.002)
+        with stage("vector"):
+            pass
+        _rank()
+        return {"stages": sorted(request_timings())}
+
+    return app
+
+
+class TestStageTiming:
+    """Test stage timers, the Server-Timing header and /metrics."""
+
+    def test_server_timing_header(self):
+        response = TestClient(_app()).get("/work")
+        assert response.json() == {"stages": ["rerank", "vector"]}
+        header = response.headers["server-timing"]
+        names = [part.split(";")[0].strip() for part in header.split(",")]
+        assert names == ["vector", "rerank", "total"]
+        assert float(header.split("vector;dur=")[1].split(",")[0]) >= 2.0
+
+    def test_disabled(self):
+        response = TestClient(_app(enabled=False)).get("/work")
+        assert "server-timing" not in response.headers
+
+    def test_stage_outside_request_still_observed(self):
+        before = REGISTRY.get_sample_value("startupscout_stage_duration_seconds_count", {"stage": "context"}) or 0
+        with stage("context") as t:
+            pass
+        assert t.elapsed >= 0
+        assert request_timings() == {}
+        after = REGISTRY.get_sample_value("startupscout_stage_duration_seconds_count", {"stage": "context"})
+        assert after == before + 1
+
+    def test_header_format(self):
+        assert server_timing_header({"embed": 0.0123, "total": 0.5}) == "embed;dur=12.3, total;dur=500.0"
+
+    def test_server_timing_is_innermost(self):
+        # user_middleware is outermost-first
+        assert main_app.user_middleware[-1].cls is ServerTimingMiddleware
+
+    def test_metrics_endpoint(self):
+        with stage("embed"):
+            pass
+        response = TestClient(main_app).get("/metrics")
+        assert response.status_code == 200
+        assert 'startupscout_stage_duration_seconds_count{stage="embed"}' in response.text
@@ -0,0 +1,39 @@
+# tests/test_startup.py
+import sys
+import subprocess
+from unittest.mock import patch
+
+
+def test_import_defers_heavy_clients():
+    """Importing the app must not pull in the OpenAI SDK or Redis."""
+    code = (
+        "import sys, app.main; "
+        "print(sorted(m for m in ('openai', 'redis') if m in sys.modules))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    # log lines are written by the async log-writer and may follow the print
+    assert "[]" in proc.stdout.strip().splitlines()
+
+
+def test_import_does_not_open_the_pool():
+    """get_pool() must not run at import time."""
+    code = (
+        "import utils.db as db; calls = []; "
+        "db.get_pool = lambda *a, **k: calls.append(1); "
+        "import app.main; print('get_pool calls', len(calls))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=60)
+    assert proc.returncode == 0, proc.stderr
+    assert "get_pool calls 0" in proc.stdout
+
+
+def test_pool_is_created_on_first_use():
+    import app.main as main
+
+    assert main.app.router.lifespan_context is not None
+    pool = object()
+    with patch.object(main, "POOL", None), patch.object(main, "get_pool", return_value=pool) as get_pool:
+        assert main._db_pool() is pool
+        assert main._db_pool() is pool
+        assert get_pool.call_count == 1
@@ -16,3 +16,10 @@ def test_stats_endpoint():
     assert "uptime_sec" in data
     assert "cache" in data
     assert isinstance(data["cache"], dict)
+
+
+def test_stats_reports_warmup():
+    """Warm-up progress is exposed alongside cache stats."""
+    data = client.get("/stats").json()
+    assert "warmup" in data
+    assert {"runs", "embedded", "answers_cached"} <= set(data["warmup"].keys())
@@ -0,0 +1,43 @@
+# tests/test_warmup.py
+from unittest.mock import MagicMock, patch
+
+import utils.warmup as warmup
+
+
+def _pool_returning(rows):
+    pool = MagicMock()
+    cursor = pool.connection.return_value.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = rows
+    return pool
+
+
+class TestWarmup:
+    """Test a single warm-up pass against a mocked query log."""
+
+    def test_embeds_top_questions_in_batches(self):
+        pool = _pool_returning([("How to price  SaaS?", 5), ("Hiring first PM?", 2)])
+        before = warmup.warmup_get_stats()
+
+        with patch.object(warmup, "get_embeddings") as embed, \
+             patch.object(warmup, "WARMUP_EMBED_BATCH", 1):
+            stats = warmup.run_warmup(pool)
+
+        assert embed.call_count == 2
+        embed.assert_any_call(["How to price SaaS?"])
+        assert stats["source"] == "chat_messages"
+        assert stats["questions"] == 2
+        assert stats["embedded"] - before["embedded"] == 2
+        assert stats["running"] is False
+
+    def test_precomputes_answers_when_enabled(self):
+        pool = _pool_returning([("Pricing?", 3)])
+        answer_fn = MagicMock(return_value={"question": "Pricing?", "answer": "a", "references": []})
+
+        with patch.object(warmup, "get_embeddings"), \
+             patch.object(warmup, "WARMUP_PRECOMPUTE_ANSWERS", True), \
+             patch.object(warmup, "cache_put_question") as put:
+            warmup.run_warmup(pool, answer_fn=answer_fn)
+
+        answer_fn.assert_called_once_with("Pricing?")
+        put.assert_called_once()
+        assert put.call_args[0][:2] == ("ask", "Pricing?")
@@ -49,7 +49,13 @@ export const api = {
     jsonFetch("/auth/login", { method: "POST", body: { email, password } }),
 
   // optional server chat history endpoints (your backend has /chat/history & /chat/clear)
-  getHistory: async () => jsonFetch("/chat/history"),
+  // params: { limit, before_id, after_id, include_refs }
+  getHistory: async (params = {}) => {
+    const qs = new URLSearchParams(
+      Object.entries(params).filter(([, v]) => v !== undefined && v !== null)
+    ).toString();
+    return jsonFetch("/chat/history" + (qs ? `?${qs}` : ""));
+  },
   clearHistory: async () => jsonFetch("/chat/clear", { method: "POST" }),
 };
 
@@ -45,7 +45,7 @@ export default function Chat() {
     let cancelled = false;
     (async () => {
       try {
-        const data = await api.getHistory?.().catch(() => null);
+        const data = await api.getHistory?.({ limit: MAX_TURNS }).catch(() => null);
         if (cancelled || !data?.turns) return;
         if (Array.isArray(data.turns) && data.turns.length > 0) {
           setTurns(data.turns.slice(-MAX_TURNS));
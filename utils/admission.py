@@ -0,0 +1,186 @@
+# utils/admission.py
+"""
+Admission control for the /ask pipeline.
+
+Each stage (db, embed, llm) has a concurrency limit and a bounded priority
+wait queue. Authenticated requests are served before anonymous ones. A request
+is rejected up front (503 + Retry-After) when the queue is full or when the
+expected wait, estimated from recent hold times, would overrun its deadline,
+instead of queueing work that will time out anyway.
+
+Usage:
+    with admit("llm"):
+        ...call the model...
+"""
+from __future__ import annotations
+
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from fastapi import HTTPException
+
+from utils.logger import setup_logger
+from utils.prometheus_metrics import record_admission_wait, record_admission_rejected, set_admission_queue_depth
+
+logger = setup_logger("startupscout.admission")
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMIT_QUEUE_MAX = int(os.getenv("ADMIT_QUEUE_MAX", "32"))
+ADMIT_MAX_WAIT_SEC = float(os.getenv("ADMIT_MAX_WAIT_SEC", "5"))
+
+STAGE_CONCURRENCY = {
+    "db": int(os.getenv("ADMIT_DB_CONCURRENCY", "8")),        # keep below DB_POOL_MAX
+    "embed": int(os.getenv("ADMIT_EMBED_CONCURRENCY", "8")),
+    "llm": int(os.getenv("ADMIT_LLM_CONCURRENCY", "8")),
+}
+
+PRIORITY_AUTHENTICATED = 0
+PRIORITY_ANONYMOUS = 1
+
+_PRIORITY: ContextVar[int] = ContextVar("admission_priority", default=PRIORITY_ANONYMOUS)
+
+
+def set_request_priority(authenticated: bool) -> None:
+    """Mark the current request (context) as authenticated or anonymous."""
+    _PRIORITY.set(PRIORITY_AUTHENTICATED if authenticated else PRIORITY_ANONYMOUS)
+
+
+class AdmissionRejected(HTTPException):
+    def __init__(self, stage: str, reason: str, retry_after: float):
+        seconds = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503,
+            detail=f"Server busy ({stage}); retry later.",
+            headers={"Retry-After": str(seconds)},
+        )
+        self.stage = stage
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("granted",)
+
+    def __init__(self) -> None:
+        self.granted = False
+
+
+class StageLimiter:
+    """Concurrency limit + priority queue for one pipeline stage."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int = ADMIT_QUEUE_MAX,
+                 max_wait_sec: float = ADMIT_MAX_WAIT_SEC):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_sec = max_wait_sec
+        self._active = 0
+        self._heap: List[tuple] = []  # (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._avg_hold = 0.0           # EWMA of slot hold time, seconds
+        self._cond = threading.Condition()
+        self._stats = {"admitted": 0, "rejected": 0, "queued": 0}
+
+    def _expected_wait(self, priority: int) -> float:
+        ahead = sum(1 for p, _, _ in self._heap if p <= priority) + 1
+        return math.ceil(ahead / self.concurrency) * self._avg_hold
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self._stats["rejected"] += 1
+        record_admission_rejected(self.name, reason)
+        logger.warning(f"Admission rejected stage={self.name} reason={reason} queued={len(self._heap)}")
+        return AdmissionRejected(self.name, reason, retry_after)
+
+    def _acquire(self, priority: int, deadline: float) -> float:
+        """Block until a slot is granted; returns seconds waited."""
+        start = time.monotonic()
+        with self._cond:
+            if self._active < self.concurrency and not self._heap:
+                self._active += 1
+                self._stats["admitted"] += 1
+                return 0.0
+
+            if len(self._heap) >= self.max_queue:
+                raise self._reject("queue_full", self._expected_wait(priority) or 1.0)
+            expected = self._expected_wait(priority)
+            if start + expected > deadline:
+                raise self._reject("deadline", expected)
+
+            waiter = _Waiter()
+            entry = (priority, next(self._seq), waiter)
+            heapq.heappush(self._heap, entry)
+            self._stats["queued"] += 1
+            set_admission_queue_depth(self.name, len(self._heap))
+            try:
+                while not waiter.granted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(timeout=remaining)
+                if not waiter.granted:
+                    self._heap.remove(entry)
+                    heapq.heapify(self._heap)
+                    raise self._reject("timeout", self._expected_wait(priority) or 1.0)
+            finally:
+                set_admission_queue_depth(self.name, len(self._heap))
+            self._stats["admitted"] += 1
+            return time.monotonic() - start
+
+    def _release(self, held: float) -> None:
+        with self._cond:
+            self._avg_hold = held if self._avg_hold == 0.0 else 0.8 * self._avg_hold + 0.2 * held
+            if self._heap:
+                # Hand the slot straight to the best waiter
+                _, _, waiter = heapq.heappop(self._heap)
+                waiter.granted = True
+                set_admission_queue_depth(self.name, len(self._heap))
+                self._cond.notify_all()
+            else:
+                self._active -= 1
+
+    @contextmanager
+    def slot(self, priority: Optional[int] = None, deadline: Optional[float] = None) -> Iterator[None]:
+        prio = _PRIORITY.get() if priority is None else priority
+        waited = self._acquire(prio, deadline or time.monotonic() + self.max_wait_sec)
+        record_admission_wait(self.name, waited)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                **self._stats,
+                "active": self._active,
+                "queue_depth": len(self._heap),
+                "concurrency": self.concurrency,
+                "avg_hold_ms": round(self._avg_hold * 1000, 1),
+            }
+
+
+_LIMITERS: Dict[str, StageLimiter] = {
+    name: StageLimiter(name, concurrency) for name, concurrency in STAGE_CONCURRENCY.items()
+}
+
+
+@contextmanager
+def admit(stage: str, priority: Optional[int] = None) -> Iterator[None]:
+    """Hold a slot for `stage` for the duration of the block (no-op when disabled)."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    with _LIMITERS[stage].slot(priority):
+        yield
+
+
+def admission_get_stats() -> Dict[str, Dict[str, float]]:
+    """Return per-stage admission stats for /stats endpoint."""
+    return {name: limiter.snapshot() for name, limiter in _LIMITERS.items()}
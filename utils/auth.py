@@ -6,11 +6,25 @@ import time
 import hmac
 import json
 import base64
+import asyncio
 import hashlib
-from typing import Optional, Dict, Any
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, Tuple, Union
 
+from fastapi import HTTPException
 from passlib.hash import pbkdf2_sha256
 
+from config.settings import (
+    PBKDF2_ROUNDS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_TIMEOUT_SEC,
+    PASSWORD_HASH_WORKERS,
+)
+
 # ---------------------------------------------------------------------------
 # Config (load from environment; never hard-code secrets)
 # ---------------------------------------------------------------------------
@@ -18,6 +32,7 @@ JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALGO = "HS256"
 JWT_TTL_SEC = int(os.getenv("JWT_TTL_SEC", "86400"))  # 24h default
 PASSWORD_PEPPER = os.getenv("PASSWORD_PEPPER", "")    # short server-side secret
+AUTH_TOKEN_CACHE_MAX = int(os.getenv("AUTH_TOKEN_CACHE_MAX", "10000"))  # verified tokens kept
 
 # ---------------------------------------------------------------------------
 # Password hashing (PBKDF2-SHA256; no 72-byte limit)
@@ -25,12 +40,123 @@ PASSWORD_PEPPER = os.getenv("PASSWORD_PEPPER", "")    # short server-side secret
 def _prehash(password: str) -> str:
     return f"{password}{PASSWORD_PEPPER}"
 
+def _pbkdf2(secret: str, password_hash: Optional[str], rounds: int) -> Union[str, bool]:
+    # Runs in a worker process: hash when password_hash is None, else verify
+    if password_hash is None:
+        return pbkdf2_sha256.using(rounds=rounds).hash(secret)
+    return pbkdf2_sha256.verify(secret, password_hash)
+
 def hash_password(password: str) -> str:
-    # You can tune cost via .using(rounds=...) later if needed.
-    return pbkdf2_sha256.hash(_prehash(password))
+    return _pbkdf2(_prehash(password), None, PBKDF2_ROUNDS)
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return pbkdf2_sha256.verify(_prehash(password), password_hash)
+    return _pbkdf2(_prehash(password), password_hash, PBKDF2_ROUNDS)
+
+# ---------------------------------------------------------------------------
+# Async hashing on a dedicated worker pool, so a burst of logins cannot take
+# the request threads (or the GIL) from /ask. At most PASSWORD_HASH_WORKERS
+# hashes run at once; up to PASSWORD_HASH_MAX_PENDING more wait, and anything
+# beyond that, or waiting past PASSWORD_HASH_TIMEOUT_SEC, gets a 503.
+# ---------------------------------------------------------------------------
+class PasswordHashBusy(HTTPException):
+    def __init__(self, reason: str):
+        super().__init__(
+            status_code=503,
+            detail=f"Authentication is busy ({reason}); retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+        self.reason = reason
+
+_HASH_EXECUTOR: Optional[Executor] = None
+_HASH_LOCK = threading.Lock()
+_HASH_INFLIGHT = 0
+_HASH_STATS = {"completed": 0, "rejected": 0, "timeouts": 0}
+
+def _mp_context():
+    # Never fork: by the time a hash runs the server has several threads
+    # (gateway loop, chat writer, log writer, ...) and a forked child can
+    # inherit a lock one of them held. forkserver/spawn start clean interpreters.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def _hash_executor() -> Executor:
+    global _HASH_EXECUTOR
+    with _HASH_LOCK:
+        if _HASH_EXECUTOR is None:
+            if PASSWORD_HASH_WORKERS > 0:
+                _HASH_EXECUTOR = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS, mp_context=_mp_context()
+                )
+            else:
+                _HASH_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pwhash")
+        return _HASH_EXECUTOR
+
+def start_password_pool() -> None:
+    """Create the hashing pool and start its workers now instead of on the first hash (startup thread)."""
+    executor = _hash_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        # Workers are otherwise started on first submit; one no-op each brings them all up now
+        for fut in [executor.submit(int) for _ in range(PASSWORD_HASH_WORKERS)]:
+            fut.result()
+
+def _release(_fut) -> None:
+    global _HASH_INFLIGHT
+    with _HASH_LOCK:
+        _HASH_INFLIGHT -= 1
+        _HASH_STATS["completed"] += 1
+
+async def _run_pbkdf2(secret: str, password_hash: Optional[str]) -> Union[str, bool]:
+    global _HASH_INFLIGHT, _HASH_EXECUTOR
+    executor = _hash_executor()
+    with _HASH_LOCK:
+        if _HASH_INFLIGHT >= max(1, PASSWORD_HASH_WORKERS) + PASSWORD_HASH_MAX_PENDING:
+            _HASH_STATS["rejected"] += 1
+            raise PasswordHashBusy("queue full")
+        _HASH_INFLIGHT += 1
+    try:
+        fut = executor.submit(_pbkdf2, secret, password_hash, PBKDF2_ROUNDS)
+    except BrokenProcessPool:
+        with _HASH_LOCK:
+            _HASH_INFLIGHT -= 1
+            if _HASH_EXECUTOR is executor:
+                _HASH_EXECUTOR = None  # rebuilt on next call
+        raise PasswordHashBusy("worker pool restarting")
+    except BaseException:
+        with _HASH_LOCK:
+            _HASH_INFLIGHT -= 1
+        raise
+    # In-flight count drops when the worker finishes, not when we stop waiting
+    fut.add_done_callback(_release)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(fut), PASSWORD_HASH_TIMEOUT_SEC)
+    except asyncio.TimeoutError:
+        fut.cancel()  # drops it if still queued
+        with _HASH_LOCK:
+            _HASH_STATS["timeouts"] += 1
+        raise PasswordHashBusy("timed out")
+
+async def hash_password_async(password: str) -> str:
+    return await _run_pbkdf2(_prehash(password), None)
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_pbkdf2(_prehash(password), password_hash)
+
+def shutdown_password_pool() -> None:
+    global _HASH_EXECUTOR
+    with _HASH_LOCK:
+        executor, _HASH_EXECUTOR = _HASH_EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def password_pool_get_stats() -> Dict[str, Any]:
+    """Return password hashing pool stats for /stats endpoint."""
+    with _HASH_LOCK:
+        return {
+            **_HASH_STATS,
+            "in_flight": _HASH_INFLIGHT,
+            "workers": PASSWORD_HASH_WORKERS,
+            "rounds": PBKDF2_ROUNDS,
+        }
 
 # ---------------------------------------------------------------------------
 # Minimal JWT (HS256)
@@ -53,7 +179,7 @@ def create_jwt(payload: Dict[str, Any], ttl: int = JWT_TTL_SEC) -> str:
     s = _b64url_encode(sig)
     return f"{h}.{p}.{s}"
 
-def verify_jwt(token: str) -> Optional[Dict[str, Any]]:
+def _decode_jwt(token: str) -> Optional[Dict[str, Any]]:
     try:
         h, p, s = token.split(".")
         expected = hmac.new(JWT_SECRET.encode(), f"{h}.{p}".encode(), hashlib.sha256).digest()
@@ -65,3 +191,58 @@ def verify_jwt(token: str) -> Optional[Dict[str, Any]]:
         return payload
     except Exception:
         return None
+
+# ---------------------------------------------------------------------------
+# Verified-token cache: token -> (payload, exp). Only valid tokens are cached,
+# and only until their own exp, so a hit is exactly what a re-verify returns.
+# ---------------------------------------------------------------------------
+_TOKENS: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+_TOKENS_LOCK = threading.Lock()
+_TOKEN_STATS = {"hits": 0, "misses": 0}
+
+def verify_jwt(token: str) -> Optional[Dict[str, Any]]:
+    if not token:
+        return None
+    with _TOKENS_LOCK:
+        entry = _TOKENS.get(token)
+        if entry is not None:
+            if int(time.time()) <= entry[1]:
+                _TOKENS.move_to_end(token)
+                _TOKEN_STATS["hits"] += 1
+                return dict(entry[0])
+            del _TOKENS[token]
+        _TOKEN_STATS["misses"] += 1
+
+    payload = _decode_jwt(token)
+    if payload is None or AUTH_TOKEN_CACHE_MAX <= 0:
+        return payload
+    with _TOKENS_LOCK:
+        _TOKENS[token] = (payload, int(payload.get("exp", 0)))
+        while len(_TOKENS) > AUTH_TOKEN_CACHE_MAX:
+            _TOKENS.popitem(last=False)
+    return dict(payload)
+
+def clear_token_cache() -> None:
+    with _TOKENS_LOCK:
+        _TOKENS.clear()
+
+def auth_get_stats() -> Dict[str, Any]:
+    """Return verified-token cache stats for /stats endpoint."""
+    with _TOKENS_LOCK:
+        return {**_TOKEN_STATS, "cached_tokens": len(_TOKENS)}
+
+def decode_user_id(payload: Optional[Dict[str, Any]]) -> Optional[Union[int, str]]:
+    """
+    User id from a verified payload. /auth tokens carry an integer `sub`;
+    UserManager tokens carry a UUID string `user_id`.
+    """
+    if not payload:
+        return None
+    sub = payload.get("sub")
+    if sub is not None:
+        try:
+            return int(sub)
+        except (TypeError, ValueError):
+            return None
+    user_id = payload.get("user_id")
+    return str(user_id) if user_id else None
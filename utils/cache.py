@@ -4,7 +4,9 @@ import json
 import hashlib
 import functools
 import threading
-import redis
+from collections import OrderedDict
+from typing import Any, Optional
+from utils.circuit_breaker import get_breaker
 from utils.logger import setup_logger
 
 ENV = os.getenv("ENV", "dev")
@@ -12,23 +14,39 @@ _KEY_PREFIX = f"startupscout:{ENV}:"
 
 _CACHE_HITS = 0
 _CACHE_MISSES = 0
+_STALE_SERVED = 0
 
 logger = setup_logger("startupscout.cache")
 
 # ------------------------------------------------------------
 # Redis initialization
 # ------------------------------------------------------------
+# Connected on first use, not at import, so cold starts don't wait on Redis.
 REDIS_URL = os.getenv("REDIS_URL")
 _USE_REDIS = bool(REDIS_URL)
 _REDIS = None
-if _USE_REDIS:
-    try:
-        _REDIS = redis.from_url(REDIS_URL, decode_responses=True)
-        _REDIS.ping()
-        logger.info("Connected to Redis cache.")
-    except Exception as e:
-        logger.warning(f"Redis unavailable, falling back to in-memory cache: {e}")
-        _USE_REDIS = False
+_REDIS_INIT = False
+_REDIS_INIT_LOCK = threading.Lock()
+
+
+def _connect_redis() -> None:
+    global _REDIS, _USE_REDIS, _REDIS_INIT
+    with _REDIS_INIT_LOCK:
+        if _REDIS_INIT:
+            return
+        try:
+            import redis  # deferred: ~75ms of imports
+            client = redis.from_url(REDIS_URL, decode_responses=True)
+            client.ping()
+            _REDIS = client
+            logger.info("Connected to Redis cache.")
+        except Exception as e:
+            logger.warning(f"Redis unavailable, falling back to in-memory cache: {e}")
+            _USE_REDIS = False
+        _REDIS_INIT = True
+
+# Shared with utils.completion_cache: while open, skip Redis and use memory
+_REDIS_BREAKER = get_breaker("redis")
 
 # ------------------------------------------------------------
 # Local in-memory fallback cache
@@ -36,6 +54,13 @@ if _USE_REDIS:
 _CACHE = {}
 _LOCK = threading.Lock()
 
+# Last good value per key, kept in memory whichever backend holds the live
+# entry, so a 5xx can be answered with it while Redis is healthy too.
+# Bounded (LRU) and only served up to CACHE_STALE_SEC after it was stored.
+CACHE_STALE_MAX = int(os.getenv("CACHE_STALE_MAX", "1000"))
+CACHE_STALE_SEC = int(os.getenv("CACHE_STALE_SEC", "3600"))
+_STALE: "OrderedDict[str, tuple]" = OrderedDict()
+
 
 # ------------------------------------------------------------
 # Helpers
@@ -47,6 +72,12 @@ def _normalize_question(val: str) -> str:
     return " ".join(val.strip().split()).lower()
 
 
+def _redis_ok() -> bool:
+    if _USE_REDIS and not _REDIS_INIT:
+        _connect_redis()
+    return bool(_USE_REDIS and _REDIS) and _REDIS_BREAKER.allow()
+
+
 def _stable_key(func_name: str, args: tuple, kwargs: dict) -> str:
     """Deterministic cache key generation."""
     # Special-case ask(question=...)
@@ -60,62 +91,122 @@ def _stable_key(func_name: str, args: tuple, kwargs: dict) -> str:
     return f"{_KEY_PREFIX}{func_name}:h:{digest}"
 
 
+def _remember_stale(key: str, value: Any) -> None:
+    if CACHE_STALE_MAX <= 0:
+        return
+    with _LOCK:
+        _STALE[key] = (value, time.time())
+        _STALE.move_to_end(key)
+        while len(_STALE) > CACHE_STALE_MAX:
+            _STALE.popitem(last=False)
+
+
+def _stale_value(key: str):
+    """(value,) if a last good value within CACHE_STALE_SEC exists, else None."""
+    with _LOCK:
+        entry = _STALE.get(key)
+    if entry is None or time.time() - entry[1] > CACHE_STALE_SEC:
+        return None
+    return (entry[0],)
+
+
 # ------------------------------------------------------------
 # Core decorator
 # ------------------------------------------------------------
-def cache_result(ttl: int = 300):
+def cache_result(ttl: int = 300, bypass: Optional[str] = None):
     """
     Decorator for caching results.
     Uses Redis if available; otherwise an in-memory dict with TTL.
     Tracks cache hits/misses for /stats endpoint.
+    `bypass` names a keyword argument that, when truthy, skips the cache
+    (e.g. answers that depend on per-session state).
     """
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            global _CACHE_HITS, _CACHE_MISSES
+            global _CACHE_HITS, _CACHE_MISSES, _STALE_SERVED
+            if bypass and kwargs.get(bypass):
+                return func(*args, **kwargs)
             key = _stable_key(func.__name__, args, kwargs)
 
             # --- Redis path ---
-            if _USE_REDIS and _REDIS:
+            redis_ok = _redis_ok()
+            if redis_ok:
                 try:
                     cached = _REDIS.get(key)
+                    _REDIS_BREAKER.record_success()
                     if cached is not None:
                         _CACHE_HITS += 1
-                        logger.debug(f"Redis cache hit for {key}")
+                        logger.debug("Redis cache hit for %s", key)
                         return json.loads(cached)
                 except Exception as e:
+                    _REDIS_BREAKER.record_failure()
+                    redis_ok = False
                     logger.warning(f"Redis read failed: {e}")
 
             # --- In-memory fallback ---
             now = time.time()
             with _LOCK:
                 if key in _CACHE:
-                    value, ts = _CACHE[key]
-                    if now - ts < ttl:
+                    value, expires_at = _CACHE[key]
+                    if now < expires_at:
                         _CACHE_HITS += 1
-                        logger.debug(f"Memory cache hit for {key}")
+                        logger.debug("Memory cache hit for %s", key)
                         return value
 
             _CACHE_MISSES += 1  # only increment once if both misses
 
             # --- Compute result ---
-            result = func(*args, **kwargs)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                # Degrade to the last good value rather than fail on server errors
+                if getattr(e, "status_code", 500) < 500:
+                    raise
+                stale = _stale_value(key)
+                if stale is None:
+                    raise
+                _STALE_SERVED += 1
+                logger.warning(f"Serving stale cache entry for {key}: {e}")
+                return stale[0]
 
             # --- Store result ---
-            if _USE_REDIS and _REDIS:
+            _remember_stale(key, result)
+            if redis_ok:
                 try:
                     _REDIS.setex(key, ttl, json.dumps(result, ensure_ascii=False))
+                    _REDIS_BREAKER.record_success()
+                    return result
                 except Exception as e:
+                    _REDIS_BREAKER.record_failure()
                     logger.warning(f"Redis write failed: {e}")
-            else:
-                with _LOCK:
-                    _CACHE[key] = (result, time.time())
+            with _LOCK:
+                _CACHE[key] = (result, time.time() + ttl)
 
             return result
         return wrapper
     return decorator
 
 
+def cache_put_question(func_name: str, question: str, value, ttl: int) -> None:
+    """
+    Store a precomputed result under the same key cache_result() uses for
+    func_name(question=...). Used by the warm-up job.
+    """
+    key = _stable_key(func_name, (), {"question": question})
+    _remember_stale(key, value)
+    if _redis_ok():
+        try:
+            _REDIS.setex(key, ttl, json.dumps(value, ensure_ascii=False))
+            _REDIS_BREAKER.record_success()
+            return
+        except Exception as e:
+            _REDIS_BREAKER.record_failure()
+            logger.warning(f"Redis write failed: {e}")
+    with _LOCK:
+        _CACHE[key] = (value, time.time() + ttl)
+
+
 # ------------------------------------------------------------
 # Stats and Clear
 # ------------------------------------------------------------
@@ -126,9 +217,12 @@ def cache_get_stats():
         "redis_used": _USE_REDIS,
         "hits": _CACHE_HITS,
         "misses": _CACHE_MISSES,
+        "stale_served": _STALE_SERVED,
     }
+    with _LOCK:
+        stats["stale_entries"] = len(_STALE)
 
-    if _USE_REDIS and _REDIS:
+    if _redis_ok():
         try:
             info = _REDIS.info()
             stats["keys"] = info.get("db0", {}).get("keys", 0)
@@ -142,8 +236,8 @@ def cache_get_stats():
 
 def cache_clear():
     """Clear all cache entries and reset counters."""
-    global _CACHE_HITS, _CACHE_MISSES
-    if _USE_REDIS and _REDIS:
+    global _CACHE_HITS, _CACHE_MISSES, _STALE_SERVED
+    if _redis_ok():
         try:
             cursor = 0
             while True:
@@ -155,10 +249,12 @@ def cache_clear():
             logger.info("Redis cache cleared (prefix only).")
         except Exception as e:
             logger.warning(f"Redis flush failed: {e}")
-    else:
-        with _LOCK:
-            _CACHE.clear()
-            logger.info("In-memory cache cleared.")
+    # Memory also holds writes made while Redis was unavailable
+    with _LOCK:
+        _CACHE.clear()
+        _STALE.clear()
+        logger.info("In-memory cache cleared.")
 
     _CACHE_HITS = 0
     _CACHE_MISSES = 0
+    _STALE_SERVED = 0
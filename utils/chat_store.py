@@ -1,57 +1,476 @@
 # utils/chat_store.py
+"""
+Chat persistence on the shared pool.
+
+Writes (session upserts, message inserts) go through a write-behind queue and
+are never done on the request path: a background thread batches them into one
+multi-row session upsert plus one multi-row message insert per flush. A flush
+happens when CHAT_FLUSH_BATCH writes are pending, CHAT_FLUSH_INTERVAL_MS after
+the first pending write, and on shutdown. A read flushes first only if its
+own session has queued writes (read-your-writes), waiting at most
+CHAT_READ_FLUSH_TIMEOUT_MS; reads of settled sessions never touch the queue.
+A failed batch is retried with backoff, then split per session and per row,
+so one bad row (e.g. an FK violation) costs only that row.
+
+Sessions seen recently are kept in an in-process LRU: ensure_session() for a
+known session does not upsert; its last_seen_at is aggregated and written every
+SESSION_TOUCH_INTERVAL_SEC with one bulk UPDATE ... FROM (VALUES ...).
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import queue
+import threading
+from collections import OrderedDict
 from typing import Any, Dict, List, Optional, Tuple
-from psycopg import connect
-from config.settings import DB_CONFIG
 
-def ensure_session(session_id: str, user_id: int | None = None):
-    with connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
+from utils.db import get_pool, pool_connection
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.chat_store")
+
+CHAT_FLUSH_BATCH = int(os.getenv("CHAT_FLUSH_BATCH", "200"))
+CHAT_FLUSH_INTERVAL_MS = int(os.getenv("CHAT_FLUSH_INTERVAL_MS", "250"))
+CHAT_WRITE_QUEUE_MAX = int(os.getenv("CHAT_WRITE_QUEUE_MAX", "10000"))
+SESSION_CACHE_MAX = int(os.getenv("SESSION_CACHE_MAX", "50000"))
+SESSION_KNOWN_TTL_SEC = int(os.getenv("SESSION_KNOWN_TTL_SEC", "3600"))
+SESSION_TOUCH_INTERVAL_SEC = int(os.getenv("SESSION_TOUCH_INTERVAL_SEC", "60"))
+CHAT_WRITE_RETRIES = int(os.getenv("CHAT_WRITE_RETRIES", "2"))
+CHAT_WRITE_BACKOFF_MS = int(os.getenv("CHAT_WRITE_BACKOFF_MS", "100"))
+CHAT_READ_FLUSH_TIMEOUT_MS = int(os.getenv("CHAT_READ_FLUSH_TIMEOUT_MS", "500"))
+_INSERT_CHUNK = 500  # rows per multi-row INSERT statement
+
+# session_id -> (user_id, upserted_at monotonic)
+_KNOWN: "OrderedDict[str, Tuple[Optional[int], float]]" = OrderedDict()
+_KNOWN_LOCK = threading.Lock()
+
+_QUEUE: "queue.Queue[Any]" = queue.Queue(maxsize=CHAT_WRITE_QUEUE_MAX)
+_STOP = object()
+_WRITER: Optional[threading.Thread] = None
+_WRITER_LOCK = threading.Lock()
+
+# session_id -> session/message writes queued but not yet written or dropped
+_PENDING: Dict[str, int] = {}
+_PENDING_LOCK = threading.Lock()
+
+_STATS = {
+    "sessions_written": 0, "sessions_skipped": 0, "touches_written": 0,
+    "messages_written": 0, "batches": 0, "dropped": 0, "failures": 0, "retries": 0, "splits": 0,
+    "read_flushes": 0, "read_flush_timeouts": 0,
+}
+_STATS_LOCK = threading.Lock()
+
+
+def _bump(**counts: int) -> None:
+    with _STATS_LOCK:
+        for k, v in counts.items():
+            _STATS[k] += v
+
+
+# ------------------------------------------------------------------------------
+# Writer thread
+# ------------------------------------------------------------------------------
+def _known(session_id: str, user_id: Optional[int]) -> bool:
+    """True if the session row is known to exist (with this user, if given)."""
+    now = time.monotonic()
+    with _KNOWN_LOCK:
+        entry = _KNOWN.get(session_id)
+        if entry is None or now - entry[1] >= SESSION_KNOWN_TTL_SEC:
+            return False
+        if user_id is not None and entry[0] != user_id:
+            return False
+        _KNOWN.move_to_end(session_id)
+        return True
+
+
+def _remember(session_id: str, user_id: Optional[int]) -> None:
+    with _KNOWN_LOCK:
+        prev = _KNOWN.get(session_id)
+        _KNOWN[session_id] = (user_id if user_id is not None else (prev[0] if prev else None), time.monotonic())
+        _KNOWN.move_to_end(session_id)
+        while len(_KNOWN) > SESSION_CACHE_MAX:
+            _KNOWN.popitem(last=False)
+
+
+def _forget(session_ids) -> None:
+    with _KNOWN_LOCK:
+        for sid in session_ids:
+            _KNOWN.pop(sid, None)
+
+
+def _write_touches(touches: Dict[str, float]) -> None:
+    pool = get_pool()
+    if pool is None:
+        raise RuntimeError("Database pool unavailable")
+    items = list(touches.items())
+    with pool_connection(pool) as conn, conn.cursor() as cur:
+        for i in range(0, len(items), _INSERT_CHUNK):
+            chunk = items[i:i + _INSERT_CHUNK]
             cur.execute(
                 """
-                INSERT INTO chat_sessions (id) VALUES (%s)
-                ON CONFLICT (id) DO UPDATE
-                SET last_seen_at = NOW()
+                UPDATE chat_sessions s
+                SET last_seen_at = GREATEST(s.last_seen_at, v.seen)
+                FROM (VALUES """
+                + ", ".join(["(%s, to_timestamp(%s))"] * len(chunk))
+                + """) AS v(id, seen)
+                WHERE s.id = v.id
                 """,
-                (session_id,)
+                [v for row in chunk for v in row],
             )
-            return
+    _bump(touches_written=len(items))
+
+
+def _write_batch(sessions: Dict[str, Optional[int]], messages: List[tuple]) -> None:
+    pool = get_pool()
+    if pool is None:
+        raise RuntimeError("Database pool unavailable")
 
-def add_message(session_id: str, role: str, content: str, ts_ms: int, refs: Optional[Dict]=None) -> None:
-    with connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
+    with pool_connection(pool) as conn, conn.cursor() as cur:
+        sids = list(sessions.items())
+        for i in range(0, len(sids), _INSERT_CHUNK):
+            chunk = sids[i:i + _INSERT_CHUNK]
             cur.execute(
-                """
-                INSERT INTO chat_messages (session_id, role, content, refs, ts_ms)
-                VALUES (%s, %s, %s, %s::jsonb, %s)
+                "INSERT INTO chat_sessions (id, user_id) VALUES "
+                + ", ".join(["(%s, %s)"] * len(chunk))
+                + """
+                ON CONFLICT (id) DO UPDATE
+                SET last_seen_at = NOW(),
+                    user_id = COALESCE(EXCLUDED.user_id, chat_sessions.user_id)
                 """,
-                (session_id, role, content, (None if refs is None else json_dumps(refs)), ts_ms)
+                [v for row in chunk for v in row],
             )
-
-def get_history(session_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-    with connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
+        for i in range(0, len(messages), _INSERT_CHUNK):
+            chunk = messages[i:i + _INSERT_CHUNK]
             cur.execute(
-                """
-                SELECT role, content, COALESCE(refs, '{}'::jsonb), ts_ms
-                FROM chat_messages
-                WHERE session_id = %s
-                ORDER BY id ASC
-                LIMIT %s
-                """,
-                (session_id, limit)
+                "INSERT INTO chat_messages (session_id, user_id, role, content, refs, ts_ms) VALUES "
+                + ", ".join(["(%s, %s, %s, %s, %s::jsonb, %s)"] * len(chunk)),
+                [v for row in chunk for v in row],
             )
-            rows = cur.fetchall()
-    return [
-        {"role": r[0], "content": r[1], "refs": r[2], "ts": int(r[3])}
-        for r in rows
-    ]
+    _bump(sessions_written=len(sessions), messages_written=len(messages), batches=1)
+
+
+def _write_rows(sid: str, sessions: Dict[str, Optional[int]], rows: List[tuple]) -> int:
+    """Write one session's upsert, then its messages one per transaction; return rows dropped."""
+    if sid in sessions:
+        try:
+            _write_batch({sid: sessions[sid]}, [])
+        except Exception as e:
+            _forget([sid])
+            logger.warning(f"Chat session {sid} upsert failed ({len(rows)} messages dropped): {e}")
+            return len(rows)
+    dropped = 0
+    for row in rows:
+        try:
+            _write_batch({}, [row])
+        except Exception as e:
+            dropped += 1
+            logger.warning(f"Chat message for session {sid} dropped: {e}")
+    return dropped
+
+
+def _write_with_retry(sessions: Dict[str, Optional[int]], messages: List[tuple]) -> None:
+    """Write one batch; retry with backoff, then isolate failing sessions/rows and drop only those."""
+    for attempt in range(CHAT_WRITE_RETRIES + 1):
+        try:
+            _write_batch(sessions, messages)
+            return
+        except Exception as e:
+            error = e
+        if attempt < CHAT_WRITE_RETRIES:
+            _bump(retries=1)
+            time.sleep(CHAT_WRITE_BACKOFF_MS / 1000 * 2 ** attempt)
+
+    _bump(failures=1, splits=1)
+    groups: Dict[str, List[tuple]] = {sid: [] for sid in sessions}
+    for m in messages:
+        groups.setdefault(m[0], []).append(m)
+    failed = list(groups)
+    if len(groups) > 1:
+        # One transaction per session first; only the sessions that still fail go row by row
+        failed = []
+        for sid, rows in groups.items():
+            try:
+                _write_batch({sid: sessions[sid]} if sid in sessions else {}, rows)
+            except Exception:
+                failed.append(sid)
+        if len(failed) == len(groups):
+            # Nothing went through: the database, not a row, is the problem
+            _forget(sessions)
+            _bump(dropped=len(messages))
+            logger.warning(f"Chat write batch failed ({len(messages)} messages dropped): {error}")
+            return
+    dropped = sum(_write_rows(sid, sessions, groups[sid]) for sid in failed)
+    _bump(dropped=dropped)
+
+
+def _settle(counts: Dict[str, int]) -> None:
+    """Mark queued writes as no longer pending (written or dropped)."""
+    with _PENDING_LOCK:
+        for sid, n in counts.items():
+            left = _PENDING.get(sid, 0) - n
+            if left > 0:
+                _PENDING[sid] = left
+            else:
+                _PENDING.pop(sid, None)
+
+
+def _writer_loop() -> None:
+    sessions: Dict[str, Optional[int]] = {}
+    messages: List[tuple] = []
+    counts: Dict[str, int] = {}
+    touches: Dict[str, float] = {}
+    waiters: List[threading.Event] = []
+    first_pending = 0.0
+    first_touch = 0.0
+    interval = CHAT_FLUSH_INTERVAL_MS / 1000
+    touch_interval = SESSION_TOUCH_INTERVAL_SEC
+
+    while True:
+        deadlines = []
+        if sessions or messages:
+            deadlines.append(first_pending + interval)
+        if touches:
+            deadlines.append(first_touch + touch_interval)
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        try:
+            item = _QUEUE.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+
+        stop = item is _STOP
+        if isinstance(item, threading.Event):
+            waiters.append(item)
+        elif isinstance(item, tuple) and item[0] == "touch":
+            if not touches:
+                first_touch = time.monotonic()
+            touches[item[1]] = item[2]
+        elif isinstance(item, tuple):
+            if not (sessions or messages):
+                first_pending = time.monotonic()
+            counts[item[1]] = counts.get(item[1], 0) + 1
+            if item[0] == "session":
+                _, sid, user_id = item
+                if user_id is not None or sid not in sessions:
+                    sessions[sid] = user_id
+            else:
+                messages.append(item[1:])
+
+        due = (
+            stop or waiters
+            or len(sessions) + len(messages) >= CHAT_FLUSH_BATCH
+            or ((sessions or messages) and time.monotonic() - first_pending >= interval)
+        )
+        if due:
+            if sessions or messages:
+                _write_with_retry(sessions, messages)
+                for sid in sessions:
+                    touches.pop(sid, None)  # the upsert already set last_seen_at
+                sessions, messages = {}, []
+                _settle(counts)
+                counts = {}
+            for w in waiters:
+                w.set()
+            waiters = []
+
+        if touches and (stop or time.monotonic() - first_touch >= touch_interval):
+            try:
+                _write_touches(touches)
+            except Exception as e:
+                _bump(failures=1)
+                logger.warning(f"Session last_seen_at update failed: {e}")
+            touches = {}
+        if stop:
+            return
+
+
+def _ensure_writer() -> None:
+    global _WRITER
+    if _WRITER is not None and _WRITER.is_alive():
+        return
+    with _WRITER_LOCK:
+        if _WRITER is None or not _WRITER.is_alive():
+            _WRITER = threading.Thread(target=_writer_loop, name="chat-writer", daemon=True)
+            _WRITER.start()
+
+
+def _enqueue(item: tuple) -> None:
+    _ensure_writer()
+    tracked = item[0] != "touch"
+    if tracked:
+        with _PENDING_LOCK:
+            _PENDING[item[1]] = _PENDING.get(item[1], 0) + 1
+    try:
+        _QUEUE.put_nowait(item)
+    except queue.Full:
+        if tracked:
+            _settle({item[1]: 1})
+        _bump(dropped=1)
+        logger.warning("Chat write queue full; dropping write")
+
+
+def flush_chat_writes(timeout: float = 5.0) -> bool:
+    """Block until everything queued so far is written. False on timeout."""
+    if _WRITER is None or not _WRITER.is_alive():
+        return True
+    done = threading.Event()
+    try:
+        _QUEUE.put(done, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+
+def _flush_session(session_id: str) -> None:
+    """Read-your-writes: flush only if this session has writes still queued."""
+    with _PENDING_LOCK:
+        pending = session_id in _PENDING
+    if not pending:
+        return
+    _bump(read_flushes=1)
+    if not flush_chat_writes(CHAT_READ_FLUSH_TIMEOUT_MS / 1000):
+        _bump(read_flush_timeouts=1)
+        logger.warning(f"Chat flush before read timed out; session {session_id} may miss its newest turns")
+
+
+def stop_chat_writer(timeout: float = 10.0) -> None:
+    """Flush pending writes and stop the writer thread (shutdown hook)."""
+    global _WRITER
+    with _WRITER_LOCK:
+        writer, _WRITER = _WRITER, None
+    if writer is None or not writer.is_alive():
+        return
+    _QUEUE.put(_STOP)
+    writer.join(timeout)
+
+
+def chat_store_get_stats() -> Dict[str, Any]:
+    """Return write-behind stats for /stats endpoint."""
+    with _STATS_LOCK:
+        stats: Dict[str, Any] = dict(_STATS)
+    stats["queued"] = _QUEUE.qsize()
+    return stats
+
+
+# ------------------------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------------------------
+def ensure_session(session_id: str, user_id: int | None = None) -> None:
+    """Upsert the session once; later calls only record last_seen_at for the bulk update."""
+    if _known(session_id, user_id):
+        _bump(sessions_skipped=1)
+        _enqueue(("touch", session_id, time.time()))
+        return
+    _remember(session_id, user_id)
+    _enqueue(("session", session_id, user_id))
+
+
+def add_message(session_id: str, role: str, content: str, ts_ms: int, refs: Optional[Dict] = None,
+                user_id: int | None = None) -> None:
+    # chat_messages references chat_sessions; make sure the row is queued first
+    if not _known(session_id, None):
+        _remember(session_id, user_id)
+        _enqueue(("session", session_id, user_id))
+    _enqueue((
+        "message", session_id, user_id, role, content,
+        (None if refs is None else json_dumps(refs)), ts_ms,
+    ))
+
+
+def _run(sql: str, params: Tuple[Any, ...]) -> List[tuple]:
+    pool = get_pool()
+    if pool is None:
+        raise RuntimeError("Database pool unavailable")
+    with pool_connection(pool) as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall() if cur.description else []
+
+
+def get_history(
+    session_id: str,
+    limit: int = 100,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    include_refs: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    One page of a session's messages, oldest first within the page.
+
+    Keyset paging over chat_messages(session_id, id):
+    - no cursor: the newest `limit` messages
+    - before_id: the `limit` messages just before it (scrolling back)
+    - after_id: the first `limit` messages after it (polling for new turns)
+    """
+    _flush_session(session_id)
+    refs_col = "COALESCE(refs, '{}'::jsonb)" if include_refs else "NULL"
+    if after_id is not None:
+        where, order, params = "AND id > %s", "ASC", (session_id, after_id, limit)
+    elif before_id is not None:
+        where, order, params = "AND id < %s", "DESC", (session_id, before_id, limit)
+    else:
+        where, order, params = "", "DESC", (session_id, limit)
+    rows = _run(
+        f"""
+        SELECT id, role, content, {refs_col}, ts_ms
+        FROM chat_messages
+        WHERE session_id = %s {where}
+        ORDER BY id {order}
+        LIMIT %s
+        """,
+        params,
+    )
+    if order == "DESC":
+        rows = rows[::-1]
+    turns = []
+    for r in rows:
+        turn = {"id": r[0], "role": r[1], "content": r[2], "ts": int(r[4])}
+        if include_refs:
+            turn["refs"] = r[3]
+        turns.append(turn)
+    return turns
+
+
+def latest_message_id(session_id: str) -> Optional[int]:
+    """Newest message id in the session (index-only lookup); None if empty."""
+    _flush_session(session_id)
+    rows = _run("SELECT MAX(id) FROM chat_messages WHERE session_id = %s", (session_id,))
+    return rows[0][0] if rows else None
+
 
 def clear_history(session_id: str) -> None:
-    with connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute("DELETE FROM chat_messages WHERE session_id = %s", (session_id,))
+    _flush_session(session_id)
+    pool = get_pool()
+    if pool is None:
+        raise RuntimeError("Database pool unavailable")
+    # One transaction: a summary must never outlive the messages it folds
+    with pool_connection(pool) as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM chat_summaries WHERE session_id = %s", (session_id,))
+        cur.execute("DELETE FROM chat_messages WHERE session_id = %s", (session_id,))
+
+
+def get_summary(session_id: str) -> Tuple[str, int]:
+    """(rolling summary, last message id folded into it); ("", 0) if none."""
+    rows = _run("SELECT summary, through_id FROM chat_summaries WHERE session_id = %s", (session_id,))
+    return (rows[0][0], int(rows[0][1])) if rows else ("", 0)
+
+
+def save_summary(session_id: str, summary: str, through_id: int, tokens: int) -> None:
+    _run(
+        """
+        INSERT INTO chat_summaries (session_id, summary, through_id, summary_tokens)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (session_id) DO UPDATE
+        SET summary = EXCLUDED.summary,
+            through_id = EXCLUDED.through_id,
+            summary_tokens = EXCLUDED.summary_tokens,
+            updated_at = NOW()
+        WHERE chat_summaries.through_id < EXCLUDED.through_id
+        """,
+        (session_id, summary, through_id, tokens),
+    )
+
 
 # small helper (no extra deps)
-import json
 def json_dumps(obj) -> str:
     return json.dumps(obj, ensure_ascii=False)
@@ -0,0 +1,162 @@
+# utils/circuit_breaker.py
+"""
+Circuit breakers for external dependencies (OpenAI, Redis, Postgres).
+
+closed    -> calls pass; CB_FAILURE_THRESHOLD consecutive failures open it.
+open      -> calls fail fast with CircuitOpenError for CB_RECOVERY_SEC.
+half_open -> a limited number of probe calls pass; a success closes the
+             breaker, a failure re-opens it.
+
+Breakers are process-wide singletons from get_breaker(name); state is exported
+as a Prometheus gauge and on /stats.
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, TypeVar
+
+from utils.logger import setup_logger
+from utils.prometheus_metrics import set_circuit_state
+
+logger = setup_logger("startupscout.circuit_breaker")
+
+CB_FAILURE_THRESHOLD = int(os.getenv("CB_FAILURE_THRESHOLD", "5"))
+CB_RECOVERY_SEC = float(os.getenv("CB_RECOVERY_SEC", "30"))
+CB_HALF_OPEN_PROBES = int(os.getenv("CB_HALF_OPEN_PROBES", "1"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CB_FAILURE_THRESHOLD,
+                 recovery_sec: float = CB_RECOVERY_SEC, half_open_probes: int = CB_HALF_OPEN_PROBES):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_sec = recovery_sec
+        self.half_open_probes = max(1, half_open_probes)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        set_circuit_state(name, 0)
+
+    # -- state -------------------------------------------------------------
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning(f"Circuit '{self.name}' {self._state} -> {state}")
+        self._state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != CLOSED:
+            self._probes = 0
+        set_circuit_state(self.name, _STATE_VALUE[state])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_sec:
+                self._transition(HALF_OPEN)
+            return self._state
+
+    def allow(self) -> bool:
+        """True if a call may go through now (reserves a probe slot when half-open)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == OPEN and now - self._opened_at >= self.recovery_sec:
+                self._transition(HALF_OPEN)
+                self._opened_at = now  # probe window start
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN:
+                # Probes that never report back (cancelled) free their slot after a window
+                if now - self._opened_at >= self.recovery_sec:
+                    self._probes, self._opened_at = 0, now
+                if self._probes < self.half_open_probes:
+                    self._probes += 1
+                    return True
+            self._rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    # -- helpers -----------------------------------------------------------
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """`with breaker.guard():` – same as call() for a block."""
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            yield
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {"state": state, "failures": self._failures, "rejected": self._rejected}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._rejected = 0
+            self._transition(CLOSED)
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs: Any) -> CircuitBreaker:
+    """Process-wide breaker for `name` (kwargs only apply on first creation)."""
+    with _REGISTRY_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            breaker = _BREAKERS[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+def breaker_get_stats() -> Dict[str, Dict[str, Any]]:
+    """Return breaker states for /stats endpoint."""
+    with _REGISTRY_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {b.name: b.snapshot() for b in breakers}
+
@@ -0,0 +1,192 @@
+# utils/completion_cache.py
+"""
+Completion-level LLM cache.
+
+Sits in front of chat completion calls and is keyed on the exact request
+fingerprint (provider, model, temperature, max_tokens, system prompt hash,
+user prompt hash), so different questions that end up with the same retrieved
+context and prompt reuse one completion. Separate from the question-level
+cache_result() cache.
+
+Backends: "memory" (bounded LRU), "redis" (REDIS_URL), or "auto" (redis when
+reachable, else memory).
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.circuit_breaker import get_breaker
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.completion_cache")
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "auto").lower()
+LLM_CACHE_TTL_SEC = int(os.getenv("LLM_CACHE_TTL_SEC", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+
+_KEY_PREFIX = f"startupscout-llm:{os.getenv('ENV', 'dev')}:"
+
+_MEM: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "writes": 0}
+
+_REDIS = None
+_REDIS_INIT = False
+_REDIS_BREAKER = get_breaker("redis")
+
+
+def _redis():
+    """Lazily connect to Redis when the backend allows it; None otherwise."""
+    global _REDIS, _REDIS_INIT
+    if _REDIS_INIT:
+        return _REDIS
+    with _LOCK:
+        if _REDIS_INIT:
+            return _REDIS
+        _REDIS_INIT = True
+        url = os.getenv("REDIS_URL")
+        if LLM_CACHE_BACKEND == "memory" or not url:
+            if LLM_CACHE_BACKEND == "redis":
+                logger.warning("LLM_CACHE_BACKEND=redis but REDIS_URL is not set; using memory.")
+            return None
+        try:
+            import redis
+            client = redis.from_url(url, decode_responses=True)
+            client.ping()
+            _REDIS = client
+            logger.info("Completion cache using Redis.")
+        except Exception as e:
+            logger.warning(f"Redis unavailable for completion cache, using memory: {e}")
+    return _REDIS
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def completion_key(
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Deterministic key for one chat completion request."""
+    system = "\n".join(m["content"] for m in messages if m.get("role") == "system")
+    rest = json.dumps([m for m in messages if m.get("role") != "system"], sort_keys=True, ensure_ascii=False)
+    parts = [provider, model, f"{float(temperature):.3f}", str(max_tokens), _sha(system), _sha(rest)]
+    return _KEY_PREFIX + _sha("|".join(parts))
+
+
+def _get(key: str) -> Optional[str]:
+    client = _redis()
+    if client is not None and _REDIS_BREAKER.allow():
+        try:
+            content = client.get(key)
+            _REDIS_BREAKER.record_success()
+            return content
+        except Exception as e:
+            _REDIS_BREAKER.record_failure()
+            logger.warning(f"Redis read failed: {e}")
+    with _LOCK:
+        hit = _MEM.get(key)
+        if hit is None:
+            return None
+        content, expires_at = hit
+        if time.time() >= expires_at:
+            del _MEM[key]
+            return None
+        _MEM.move_to_end(key)
+        return content
+
+
+def _put(key: str, content: str, ttl: int) -> None:
+    client = _redis()
+    if client is not None and _REDIS_BREAKER.allow():
+        try:
+            client.setex(key, ttl, content)
+            _REDIS_BREAKER.record_success()
+            return
+        except Exception as e:
+            _REDIS_BREAKER.record_failure()
+            logger.warning(f"Redis write failed: {e}")
+    with _LOCK:
+        _MEM[key] = (content, time.time() + ttl)
+        _MEM.move_to_end(key)
+        while len(_MEM) > LLM_CACHE_MAX_ENTRIES:
+            _MEM.popitem(last=False)
+
+
+def cached_completion(
+    create_fn: Callable[[], str],
+    *,
+    provider: str,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: Optional[int] = None,
+    ttl: Optional[int] = None,
+    store: Optional[Callable[[], bool]] = None,
+) -> Tuple[str, bool]:
+    """
+    Return (content, cached). create_fn() performs the real call and returns
+    the completion text; empty completions are not stored, nor are ones for
+    which store() (checked after create_fn) returns False, e.g. when a
+    fallback provider answered instead of `provider`.
+    """
+    if not LLM_CACHE_ENABLED:
+        return create_fn(), False
+
+    key = completion_key(provider, model, messages, temperature, max_tokens)
+    content = _get(key)
+    if content is not None:
+        with _LOCK:
+            _STATS["hits"] += 1
+        logger.debug("Completion cache hit (%s/%s)", provider, model)
+        return content, True
+
+    with _LOCK:
+        _STATS["misses"] += 1
+    content = create_fn()
+    if content and (store is None or store()):
+        _put(key, content, ttl or LLM_CACHE_TTL_SEC)
+        with _LOCK:
+            _STATS["writes"] += 1
+    return content, False
+
+
+def completion_cache_get_stats() -> Dict[str, Any]:
+    """Return completion cache stats for /stats endpoint."""
+    with _LOCK:
+        stats: Dict[str, Any] = dict(_STATS)
+        stats["entries"] = len(_MEM)
+    stats["enabled"] = LLM_CACHE_ENABLED
+    stats["backend"] = "redis" if _redis() is not None else "memory"
+    return stats
+
+
+def completion_cache_clear() -> None:
+    """Drop all cached completions and reset counters."""
+    client = _redis()
+    if client is not None:
+        try:
+            cursor = 0
+            while True:
+                cursor, keys = client.scan(cursor=cursor, match=f"{_KEY_PREFIX}*", count=500)
+                if keys:
+                    client.delete(*keys)
+                if cursor == 0:
+                    break
+        except Exception as e:
+            logger.warning(f"Redis flush failed: {e}")
+    with _LOCK:
+        _MEM.clear()
+        for k in _STATS:
+            _STATS[k] = 0
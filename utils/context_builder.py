@@ -0,0 +1,167 @@
+# utils/context_builder.py
+"""
+Token-budgeted context assembly for the /ask prompt.
+
+Counts tokens with a local tokenizer (tiktoken when installed, else a
+chars/4 estimate), splits a total CONTEXT_TOKEN_BUDGET across references in
+proportion to their rank score, and drops sentences already used by a
+higher-ranked reference.
+"""
+from __future__ import annotations
+
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.context")
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+_MIN_SENTENCE_TOKENS = 8  # don't bother truncating into tiny fragments
+
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_NORM = re.compile(r"[^a-z0-9]+")
+
+
+# ------------------------------------------------------------------------------
+# Tokenizer
+# ------------------------------------------------------------------------------
+@lru_cache(maxsize=8)
+def _encoder(model: str):
+    try:
+        import tiktoken  # optional
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("tiktoken unavailable, estimating tokens from length: %s", e)
+        return None
+
+
+def _model() -> str:
+    return os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    if not text:
+        return 0
+    enc = _encoder(model or _model())
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    if max_tokens <= 0 or not text:
+        return ""
+    enc = _encoder(model or _model())
+    if enc is None:
+        limit = max_tokens * 4
+        return text if len(text) <= limit else text[:limit].rstrip() + "…"
+    ids = enc.encode(text)
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[:max_tokens]).rstrip() + "…"
+
+
+# ------------------------------------------------------------------------------
+# Assembly
+# ------------------------------------------------------------------------------
+def _sentences(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [" ".join(s.split()) for s in _SENT_SPLIT.split(text) if s.strip()]
+
+
+def _fields(row: tuple, passages: Optional[List[str]]) -> List[Tuple[str, List[str]]]:
+    """(label, sentences) per reference, in the order they should be spent."""
+    if passages:
+        return [("Passages", [s for p in passages for s in _sentences(p)])]
+    _id, title, decision, summary, content, comments = row[:6]
+    comment_lines = [str(c) for c in comments[:3]] if isinstance(comments, list) else []
+    return [
+        ("Decision", _sentences(decision)),
+        ("Summary", _sentences(summary)),
+        ("Content", _sentences(content)),
+        ("Comments", [" ".join(c.split()) for c in comment_lines if c.strip()]),
+    ]
+
+
+def _header(i: int, r: tuple) -> str:
+    _id, title, decision, summary, content, comments, tags, stage, source, url, sim = r[:11]
+    return (
+        f"[{i}] {title} | source: {source or '-'} | tags: {tags or '-'} | "
+        f"stage: {stage or '-'} | sim≈{float(sim):.2f}"
+    )
+
+
+def _weights(scores: List[float]) -> List[float]:
+    if not scores:
+        return []
+    floor = min(scores)
+    shifted = [s - floor + 1e-3 if floor <= 0 else s for s in scores]
+    total = sum(shifted)
+    return [s / total for s in shifted]
+
+
+def build_context(
+    rows: List[tuple],
+    scores: List[float],
+    passages: Optional[Dict[Any, List[str]]] = None,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Return (context_str, stats). Each reference gets budget * its share of the
+    rank scores; whatever a reference does not use rolls over to the next one.
+    """
+    passages = passages or {}
+    seen: set = set()
+    blocks: List[str] = []
+    dropped = 0
+    carry = 0
+
+    for i, (r, w) in enumerate(zip(rows, _weights(scores)), start=1):
+        header = _header(i, r)
+        allowance = int(budget * w) + carry
+        remaining = allowance - count_tokens(header)
+        lines = [header]
+
+        for label, sentences in _fields(r, passages.get(r[0])):
+            kept: List[str] = []
+            for sent in sentences:
+                key = _NORM.sub(" ", sent.lower()).strip()
+                if not key or key in seen:
+                    dropped += 1
+                    continue
+                cost = count_tokens(sent) + 1
+                if cost > remaining:
+                    if remaining >= _MIN_SENTENCE_TOKENS:
+                        kept.append(truncate_to_tokens(sent, remaining - 1))
+                        seen.add(key)
+                    remaining = 0
+                    break
+                kept.append(sent)
+                seen.add(key)
+                remaining -= cost
+            if kept:
+                if label in ("Passages", "Comments"):
+                    lines.append(f"{label}:\n" + "\n".join(f"- {k}" for k in kept))
+                else:
+                    lines.append(f"{label}: " + " ".join(kept))
+            if remaining <= 0:
+                break
+
+        blocks.append("\n".join(lines))
+        carry = max(remaining, 0)
+
+    context_str = "\n\n".join(blocks)
+    stats = {
+        "context_tokens": count_tokens(context_str),
+        "budget_tokens": budget,
+        "dropped_sentences": dropped,
+        "references": len(blocks),
+    }
+    return context_str, stats
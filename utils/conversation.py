@@ -0,0 +1,208 @@
+# utils/conversation.py
+"""
+Conversation history for conversational /ask.
+
+The prompt gets a bounded slice of the session: a rolling summary of older
+turns plus as many recent turns verbatim as fit in HISTORY_TOKEN_BUDGET.
+Turns that no longer fit are folded into the summary with one small LLM call
+("old summary + new turns -> new summary"), and chat_summaries.through_id
+records how far the summary reaches, so each turn is summarized once and the
+history contribution to the prompt stays constant as the session grows.
+Everything after through_id is read page by page, so a backlog of turns
+(non-conversational asks, failed folds) is folded in order, never skipped.
+
+Folding runs off the request path: the prompt is built from the stored
+summary plus the newest turns that fit, and the overflow is queued for a
+small background executor (at most one fold per session in flight), so the
+next request sees the updated summary. HISTORY_FOLD_INLINE=true folds on
+the request thread instead, before building the prompt.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from utils.admission import admit
+from utils.chat_store import get_history, get_summary, save_summary
+from utils.context_builder import count_tokens, truncate_to_tokens
+from utils.llm_gateway import complete as llm_complete
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.conversation")
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "250"))
+HISTORY_TURN_TOKENS = int(os.getenv("HISTORY_TURN_TOKENS", "150"))
+HISTORY_FETCH_LIMIT = int(os.getenv("HISTORY_FETCH_LIMIT", "40"))
+HISTORY_FOLD_MAX_CALLS = int(os.getenv("HISTORY_FOLD_MAX_CALLS", "3"))
+HISTORY_FOLD_INLINE = os.getenv("HISTORY_FOLD_INLINE", "false").lower() in ("1", "true", "yes")
+HISTORY_FOLD_WORKERS = int(os.getenv("HISTORY_FOLD_WORKERS", "2"))
+
+_FOLD_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_FOLD_PENDING: Set[str] = set()
+_FOLD_LOCK = threading.Lock()
+_FOLD_STATS = {"scheduled": 0, "skipped_in_flight": 0, "folded_turns": 0, "failures": 0}
+
+SUMMARY_SYSTEM = (
+    "You maintain a compact running summary of a conversation about startup decisions. "
+    "Keep the user's goals, constraints, companies and facts mentioned, and open questions. "
+    "Drop pleasantries and citations. Plain sentences, no lists."
+)
+
+
+def _render(turn: Dict[str, Any]) -> str:
+    role = "User" if turn["role"] == "user" else "Assistant"
+    return f"{role}: {truncate_to_tokens(' '.join(turn['content'].split()), HISTORY_TURN_TOKENS)}"
+
+
+def _summarize(summary: str, turns: List[Dict[str, Any]]) -> str:
+    prompt = (
+        f"Current summary:\n{summary or '(none)'}\n\n"
+        "New turns:\n" + "\n".join(_render(t) for t in turns) + "\n\n"
+        f"Return the updated summary in at most {HISTORY_SUMMARY_TOKENS * 3 // 4} words."
+    )
+    with admit("llm"):
+        content, _ = llm_complete(
+            [{"role": "system", "content": SUMMARY_SYSTEM}, {"role": "user", "content": prompt}],
+            model=os.getenv("LLM_SUMMARY_MODEL", os.getenv("LLM_MODEL", "gpt-4o-mini")),
+            temperature=0.0,
+            max_tokens=HISTORY_SUMMARY_TOKENS,
+        )
+    return truncate_to_tokens(content.strip(), HISTORY_SUMMARY_TOKENS)
+
+
+def _unsummarized(session_id: str, through_id: int) -> List[Dict[str, Any]]:
+    """All user/assistant turns after through_id, oldest first (keyset pages of HISTORY_FETCH_LIMIT)."""
+    turns: List[Dict[str, Any]] = []
+    after = through_id
+    while True:
+        page = get_history(session_id, limit=HISTORY_FETCH_LIMIT, after_id=after, include_refs=False)
+        turns.extend(t for t in page if t["role"] in ("user", "assistant"))
+        if len(page) < HISTORY_FETCH_LIMIT:
+            return turns
+        after = page[-1]["id"]
+
+
+def _split(summary: str, turns: List[Dict[str, Any]], budget: int) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """(newest turns rendered verbatim within what the summary leaves of the budget, older overflow)."""
+    remaining = budget - min(count_tokens(summary), HISTORY_SUMMARY_TOKENS)
+    recent: List[str] = []
+    cut = len(turns)
+    for i in range(len(turns) - 1, -1, -1):
+        line = _render(turns[i])
+        cost = count_tokens(line) + 1
+        if cost > remaining:
+            break
+        recent.append(line)
+        remaining -= cost
+        cut = i
+    recent.reverse()
+    return recent, turns[:cut]
+
+
+def _fold(session_id: str, summary: str, overflow: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """
+    Fold overflow into the summary oldest first, one page per call; through_id
+    advances after each, so whatever is left (failure, or past
+    HISTORY_FOLD_MAX_CALLS) is folded next time. Returns (summary, turns folded).
+    """
+    folded = 0
+    step = max(1, HISTORY_FETCH_LIMIT)
+    for start in range(0, min(len(overflow), step * HISTORY_FOLD_MAX_CALLS), step):
+        chunk = overflow[start:start + step]
+        try:
+            summary = _summarize(summary, chunk)
+            save_summary(session_id, summary, chunk[-1]["id"], count_tokens(summary))
+            folded += len(chunk)
+        except Exception as e:
+            # Keep the summary so far; the rest is retried on a later request
+            _FOLD_STATS["failures"] += 1
+            logger.warning(f"History summarization failed for {session_id}: {e}")
+            break
+    _FOLD_STATS["folded_turns"] += folded
+    return summary, folded
+
+
+def fold_history(session_id: str, budget: int = HISTORY_TOKEN_BUDGET) -> int:
+    """Fold whatever currently overflows the session's budget; returns turns folded."""
+    summary, through_id = get_summary(session_id)
+    _, overflow = _split(summary, _unsummarized(session_id, through_id), budget)
+    return _fold(session_id, summary, overflow)[1] if overflow else 0
+
+
+def _fold_job(session_id: str, budget: int) -> None:
+    try:
+        fold_history(session_id, budget)
+    except Exception as e:
+        _FOLD_STATS["failures"] += 1
+        logger.warning(f"Background history fold failed for {session_id}: {e}")
+    finally:
+        with _FOLD_LOCK:
+            _FOLD_PENDING.discard(session_id)
+
+
+def _schedule_fold(session_id: str, budget: int) -> bool:
+    """Queue a background fold for the session unless one is already in flight."""
+    global _FOLD_EXECUTOR
+    with _FOLD_LOCK:
+        if session_id in _FOLD_PENDING:
+            _FOLD_STATS["skipped_in_flight"] += 1
+            return False
+        if _FOLD_EXECUTOR is None:
+            _FOLD_EXECUTOR = ThreadPoolExecutor(
+                max_workers=max(1, HISTORY_FOLD_WORKERS), thread_name_prefix="history-fold"
+            )
+        _FOLD_PENDING.add(session_id)
+        _FOLD_STATS["scheduled"] += 1
+        executor = _FOLD_EXECUTOR
+    executor.submit(_fold_job, session_id, budget)
+    return True
+
+
+def stop_history_folds(wait: bool = True) -> None:
+    """Finish queued folds and stop the executor (shutdown hook)."""
+    global _FOLD_EXECUTOR
+    with _FOLD_LOCK:
+        executor, _FOLD_EXECUTOR = _FOLD_EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def history_get_stats() -> Dict[str, Any]:
+    """Return history folding stats for /stats endpoint."""
+    with _FOLD_LOCK:
+        in_flight = len(_FOLD_PENDING)
+    return {**_FOLD_STATS, "in_flight": in_flight, "inline": HISTORY_FOLD_INLINE}
+
+
+def build_history(session_id: str, budget: int = HISTORY_TOKEN_BUDGET) -> Tuple[str, Dict[str, int]]:
+    """
+    Return (history_text, stats) for the prompt: the stored summary plus the
+    newest turns that fit the budget. Older overflow is folded into the
+    summary in the background (or first, inline, with HISTORY_FOLD_INLINE).
+    """
+    summary, through_id = get_summary(session_id)
+    turns = _unsummarized(session_id, through_id)
+    recent, overflow = _split(summary, turns, budget)
+
+    folded = 0
+    if overflow:
+        if HISTORY_FOLD_INLINE:
+            summary, folded = _fold(session_id, summary, overflow)
+        else:
+            _schedule_fold(session_id, budget)
+
+    parts = []
+    if summary:
+        parts.append(f"Summary of earlier conversation:\n{summary}")
+    if recent:
+        parts.append("Recent turns:\n" + "\n".join(recent))
+    text = "\n\n".join(parts)
+    return text, {
+        "history_tokens": count_tokens(text),
+        "history_turns": len(recent),
+        "history_summarized_turns": folded,
+        "history_pending_turns": len(overflow) - folded,
+    }
@@ -0,0 +1,196 @@
+# utils/db.py
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from psycopg import Connection
+from psycopg_pool import ConnectionPool
+
+from config.settings import DB_CONFIG
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.db")
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = threading.Lock()
+_POOL_FAILED = False
+_BREAKER = get_breaker("postgres")
+
+PG_STMT_TIMEOUT_MS = int(os.getenv("PG_STMT_TIMEOUT_MS", "3000"))
+
+# Cached by probe_capabilities(); None until the first successful probe
+_CAPS: Optional[Dict[str, Any]] = None
+_CAPS_LOCK = threading.Lock()
+
+_CAPS_SQL = """
+    SELECT
+        EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_bm25'),
+        EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'),
+        (SELECT extversion FROM pg_extension WHERE extname = 'vector'),
+        COALESCE((
+            SELECT json_agg(json_build_object('table', t.relname, 'index', i.relname, 'method', am.amname))
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_class t ON t.oid = x.indrelid
+            JOIN pg_am am ON am.oid = i.relam
+            WHERE am.amname IN ('hnsw', 'ivfflat')
+        ), '[]'::json);
+"""
+
+
+def _build_conninfo(cfg: Dict[str, Any]) -> str:
+    if "dsn" in cfg and cfg["dsn"]:
+        return cfg["dsn"]
+    host = cfg.get("host", "localhost")
+    port = cfg.get("port", 5432)
+    dbname = cfg.get("dbname") or cfg.get("database") or "postgres"
+    user = cfg.get("user") or cfg.get("username") or "postgres"
+    password = cfg.get("password", "")
+    return f"host={host} port={port} dbname={dbname} user={user} password={password}"
+
+
+def _pooler_mode(cfg: Dict[str, Any]) -> str:
+    """
+    "transaction" behind a transaction pooler (PgBouncer, Neon's "-pooler"
+    endpoints), else "session". DB_POOLER_MODE=auto picks from the host.
+    """
+    mode = os.getenv("DB_POOLER_MODE", "auto").lower()
+    if mode in ("session", "transaction"):
+        return mode
+    target = f"{cfg.get('host') or ''} {cfg.get('dsn') or ''}"
+    return "transaction" if "-pooler" in target else "session"
+
+
+DB_POOLER_MODE = _pooler_mode(DB_CONFIG)
+
+
+def transaction_pooler() -> bool:
+    """
+    Session state does not survive the transaction behind a transaction
+    pooler, so per-connection settings are skipped and callers SET LOCAL.
+    """
+    return DB_POOLER_MODE == "transaction"
+
+
+def _configure_connection(conn: Connection) -> None:
+    """Pool `configure` hook: session parameters once per new connection."""
+    if transaction_pooler():
+        return
+    conn.execute(f"SET statement_timeout = '{PG_STMT_TIMEOUT_MS}ms'")
+    conn.commit()
+
+
+def get_pool() -> Optional[ConnectionPool]:
+    """
+    Return the process-wide connection pool shared by /ask, /search and the
+    chat/auth stores. Created on first call; None if it could not be built.
+    """
+    global _POOL, _POOL_FAILED
+    if _POOL is not None or _POOL_FAILED:
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is not None or _POOL_FAILED:
+            return _POOL
+        try:
+            conninfo = _build_conninfo(DB_CONFIG)
+            logger.info(
+                f"Connecting to database: {DB_CONFIG.get('host', 'unknown')}:"
+                f"{DB_CONFIG.get('port', 5432)}/{DB_CONFIG.get('dbname', 'unknown')}"
+                f" (pooler mode: {DB_POOLER_MODE})"
+            )
+            _POOL = ConnectionPool(
+                conninfo=conninfo,
+                min_size=int(os.getenv("DB_POOL_MIN", "1")),
+                max_size=int(os.getenv("DB_POOL_MAX", "10")),
+                timeout=int(os.getenv("DB_POOL_TIMEOUT_SEC", "10")),
+                max_idle=int(os.getenv("DB_POOL_MAX_IDLE", "30")),
+                configure=_configure_connection,
+                # Server-side prepared statements don't follow a pooled backend
+                kwargs={"prepare_threshold": None} if transaction_pooler() else None,
+            )
+            logger.info("Database connection pool initialized successfully.")
+        except Exception as e:
+            _POOL_FAILED = True
+            logger.exception("Failed to initialize DB pool: %s", e)
+    return _POOL
+
+
+def close_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            try:
+                _POOL.close()
+            except Exception as e:
+                logger.warning("Error closing DB pool: %s", e)
+            _POOL = None
+
+
+@contextmanager
+def pool_connection(pool: ConnectionPool) -> Iterator[Connection]:
+    """
+    pool.connection() behind the "postgres" circuit breaker. Only acquisition
+    counts: while the breaker is open this raises CircuitOpenError at once
+    instead of waiting DB_POOL_TIMEOUT_SEC per request.
+    """
+    if not _BREAKER.allow():
+        raise CircuitOpenError(_BREAKER.name)
+    with ExitStack() as stack:
+        try:
+            conn = stack.enter_context(pool.connection())
+        except Exception:
+            _BREAKER.record_failure()
+            raise
+        _BREAKER.record_success()
+        yield conn
+
+
+# ------------------------------------------------------------------------------
+# Capability probe (extensions and vector indexes, cached for the process)
+# ------------------------------------------------------------------------------
+def probe_capabilities(cur) -> Dict[str, Any]:
+    """Query extension/index availability on `cur` and cache the result."""
+    global _CAPS
+    cur.execute(_CAPS_SQL)
+    has_bm25, has_trgm, vector_version, vector_indexes = cur.fetchone()
+    caps = {
+        "bm25": bool(has_bm25),
+        "trgm": bool(has_trgm),
+        "vector_version": vector_version,
+        "vector_indexes": list(vector_indexes or []),
+    }
+    with _CAPS_LOCK:
+        _CAPS = caps
+    logger.info(f"Database capabilities: {caps}")
+    return dict(caps)
+
+
+def refresh_capabilities(pool: Optional[ConnectionPool]) -> Optional[Dict[str, Any]]:
+    """Startup probe on its own connection; failures leave the cache for a lazy retry."""
+    if pool is None:
+        return None
+    try:
+        with pool_connection(pool) as conn, conn.cursor() as cur:
+            return probe_capabilities(cur)
+    except Exception as e:
+        logger.warning(f"Capability probe failed: {e}")
+        return None
+
+
+def db_capabilities() -> Optional[Dict[str, Any]]:
+    """Cached capabilities, or None if not probed yet."""
+    with _CAPS_LOCK:
+        return dict(_CAPS) if _CAPS is not None else None
+
+
+def db_get_stats() -> Dict[str, Any]:
+    """Return pooler mode and capabilities for /stats endpoint."""
+    return {
+        "pooler_mode": DB_POOLER_MODE,
+        "statement_timeout_ms": PG_STMT_TIMEOUT_MS,
+        "capabilities": db_capabilities(),
+    }
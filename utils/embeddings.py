@@ -3,9 +3,12 @@ from __future__ import annotations
 
 import os
 import re
+import threading
+from collections import OrderedDict
 from functools import lru_cache
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
+from utils.circuit_breaker import OPEN, CircuitOpenError, get_breaker
 from utils.logger import setup_logger
 from config.settings import EMBEDDING_BACKEND, OPENAI_API_KEY
 
@@ -19,6 +22,18 @@ logger = setup_logger("startupscout.embeddings")
 _OPENAI_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")   # 1536-dim
 _OPENAI_DIM = int(os.getenv("EMBED_DIM", "1536"))
 
+# Shortened (Matryoshka) prefix used for first-pass ANN candidate generation.
+# text-embedding-3 vectors can be truncated and re-normalized without a new API
+# call; 0 disables the two-stage mode. migrations/0004 creates the column as
+# vector(256), so that is the only width accepted.
+_SHORT_DIM = int(os.getenv("EMBED_SHORT_DIM", "0"))
+_SHORT_DIM_COLUMN = 256
+if _SHORT_DIM > 0 and _SHORT_DIM != _SHORT_DIM_COLUMN:
+    raise ValueError(
+        f"EMBED_SHORT_DIM={_SHORT_DIM} does not match decisions.embedding_short "
+        f"(vector({_SHORT_DIM_COLUMN}), migrations/0004); use {_SHORT_DIM_COLUMN} or 0."
+    )
+
 # Local fallback model (upgrade from MiniLM)
 _LOCAL_MODEL = os.getenv("LOCAL_EMBED_MODEL", "all-mpnet-base-v2")   # 768-dim
 _LOCAL_DIM = int(os.getenv("LOCAL_EMBED_DIM", "768"))
@@ -26,10 +41,27 @@ _LOCAL_DIM = int(os.getenv("LOCAL_EMBED_DIM", "768"))
 # Safety cap for text length
 _MAX_EMBED_CHARS = int(os.getenv("EMBED_MAX_CHARS", "4000"))
 
+# Max inputs per batched embeddings request
+_BATCH_SIZE = int(os.getenv("EMBED_API_BATCH", "256"))
+
+# Model name returned when OpenAI is unavailable; its vectors carry no meaning
+HASH_FALLBACK_MODEL = "hash-fallback"
+
+_BREAKER = get_breaker("openai_embeddings")
+
 # Lazy singletons
 _openai_client = None
 _local_model = None
 
+# Results of batched API calls waiting to be picked up by the per-text lru_cache
+_PRIMED: Dict[str, Tuple[List[float], str]] = {}
+_PRIMED_LOCK = threading.Lock()
+
+# Texts held by _embed_openai_cached, in the same LRU order (every lookup goes
+# through get_embedding), so batches can skip them without asking the API
+_EMBED_CACHE_MAX = 2048
+_CACHED: "OrderedDict[str, None]" = OrderedDict()
+
 
 # ------------------------------------------------------------------------------
 # Helpers
@@ -78,26 +110,60 @@ def get_embedding_dim() -> int:
     return _OPENAI_DIM if EMBEDDING_BACKEND == "openai" else _LOCAL_DIM
 
 
+def get_short_embedding_dim() -> int:
+    """Dimension of the first-pass vector column (0 when two-stage retrieval is off)."""
+    if _SHORT_DIM <= 0 or _SHORT_DIM >= get_embedding_dim():
+        return 0
+    return _SHORT_DIM
+
+
+def is_degraded(model: str) -> bool:
+    """True when get_embedding() could not produce a real semantic vector."""
+    return model == HASH_FALLBACK_MODEL
+
+
+def shorten_embedding(vec: List[float], dim: int) -> List[float]:
+    """
+    Truncate a Matryoshka embedding to its first `dim` components and
+    L2-normalize the result, matching what the API returns for `dimensions=dim`.
+    """
+    head = [float(x) for x in vec[:dim]]
+    norm = sum(x * x for x in head) ** 0.5
+    if norm == 0.0:
+        return head
+    return [x / norm for x in head]
+
+
 # ------------------------------------------------------------------------------
 # Cached embedding functions
 # ------------------------------------------------------------------------------
-@lru_cache(maxsize=2048)
+@lru_cache(maxsize=_EMBED_CACHE_MAX)
 def _embed_openai_cached(text: str) -> Tuple[List[float], str]:
+    with _PRIMED_LOCK:
+        primed = _PRIMED.pop(text, None)
+    if primed is not None:
+        return primed
+
     import time
     max_retries = 3
     retry_delay = 1.0
     
     for attempt in range(max_retries):
+        # Fail fast during an outage instead of paying the full retry budget
+        if not _BREAKER.allow():
+            raise CircuitOpenError(_BREAKER.name)
         try:
             client = _init_openai()
-            logger.info(f"Making OpenAI API call for text: {text[:50]}... (attempt {attempt + 1}/{max_retries})")
+            logger.debug("Embedding API call (%d chars, attempt %d/%d)", len(text), attempt + 1, max_retries)
             resp = client.embeddings.create(input=text, model=_OPENAI_MODEL)
-            logger.info(f"OpenAI API call successful, embedding length: {len(resp.data[0].embedding)}")
+            logger.debug("Embedding API call ok, dim=%d", len(resp.data[0].embedding))
+            _BREAKER.record_success()
             return resp.data[0].embedding, _OPENAI_MODEL
         except Exception as e:
+            _BREAKER.record_failure()
             logger.error(f"OpenAI API call failed (attempt {attempt + 1}/{max_retries}): {type(e).__name__}: {str(e)}")
-            if attempt < max_retries - 1:
-                logger.info(f"Retrying in {retry_delay} seconds...")
+            if attempt < max_retries - 1 and _BREAKER.state != OPEN:
+                logger.debug("Retrying in %.1f seconds", retry_delay)
                 time.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
             else:
@@ -131,7 +197,9 @@ def get_embedding(text: str) -> Tuple[List[float], str]:
     # OpenAI as primary backend
     if EMBEDDING_BACKEND == "openai":
         try:
-            return _embed_openai_cached(norm)
+            result = _embed_openai_cached(norm)
+            _mark_cached(norm)
+            return result
         except Exception as e:
             logger.warning("OpenAI embedding failed, using cached embeddings: %s", e)
             # For production reliability, use a simple hash-based embedding
@@ -144,7 +212,7 @@ def get_embedding(text: str) -> Tuple[List[float], str]:
             for i in range(1536):
                 byte_idx = i % len(hash_bytes)
                 embedding.append((hash_bytes[byte_idx] - 128) / 128.0)
-            return embedding, "hash-fallback"
+            return embedding, HASH_FALLBACK_MODEL
 
     # Local backend only
     try:
@@ -152,3 +220,51 @@ def get_embedding(text: str) -> Tuple[List[float], str]:
     except Exception as e:
         logger.error("Local embedding failed: %s", e)
         return [0.0] * _LOCAL_DIM, f"{_LOCAL_MODEL}-failed"
+
+
+def _mark_cached(text: str) -> None:
+    with _PRIMED_LOCK:
+        _CACHED[text] = None
+        _CACHED.move_to_end(text)
+        while len(_CACHED) > _EMBED_CACHE_MAX:
+            _CACHED.popitem(last=False)
+
+
+def _embed_openai_batch(texts: List[str]) -> List[List[float]]:
+    client = _init_openai()
+    out: List[List[float]] = []
+    for i in range(0, len(texts), _BATCH_SIZE):
+        chunk = texts[i:i + _BATCH_SIZE]
+        resp = _BREAKER.call(client.embeddings.create, input=chunk, model=_OPENAI_MODEL)
+        out.extend(d.embedding for d in sorted(resp.data, key=lambda d: d.index))
+    return out
+
+
+def get_embeddings(texts: List[str]) -> List[Tuple[List[float], str]]:
+    """
+    Batched get_embedding(): unique non-empty texts not already cached go to
+    the API in one request (per EMBED_API_BATCH inputs) and land in the same
+    lru_cache, so later single-text calls for them are free. Falls back to
+    per-text calls.
+    """
+    norms = [_normalize(t) for t in texts]
+    if EMBEDDING_BACKEND == "openai":
+        with _PRIMED_LOCK:
+            unique = [t for t in dict.fromkeys(norms) if t and t not in _CACHED]
+        if len(unique) > 1:
+            try:
+                vectors = _embed_openai_batch(unique)
+                with _PRIMED_LOCK:
+                    for t, v in zip(unique, vectors):
+                        _PRIMED[t] = (v, _OPENAI_MODEL)
+                logger.debug("Batched embedding call for %d texts", len(unique))
+            except Exception as e:
+                logger.warning("Batched OpenAI embedding failed, embedding one by one: %s", e)
+        try:
+            return [get_embedding(t) for t in norms]
+        finally:
+            # Texts that were already cached never consumed their primed entry
+            with _PRIMED_LOCK:
+                for t in unique:
+                    _PRIMED.pop(t, None)
+    return [get_embedding(t) for t in norms]
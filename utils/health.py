@@ -0,0 +1,199 @@
+# utils/health.py
+"""
+Background dependency prober.
+
+A daemon thread checks Postgres, Redis and the LLM providers every
+HEALTH_PROBE_INTERVAL_SEC and caches status + latency, so /health (liveness)
+and /ready (readiness) answer from memory without borrowing a pool slot or
+waiting on a slow dependency. Probe latencies are published as metrics.
+
+Only critical dependencies (Postgres) gate readiness; a result older than
+HEALTH_STALE_SEC counts as unknown.
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.logger import setup_logger
+from utils.prometheus_metrics import record_health_probe
+
+logger = setup_logger("startupscout.health")
+
+HEALTH_PROBE_INTERVAL_SEC = float(os.getenv("HEALTH_PROBE_INTERVAL_SEC", "15"))
+HEALTH_PROBE_TIMEOUT_SEC = float(os.getenv("HEALTH_PROBE_TIMEOUT_SEC", "3"))
+HEALTH_STALE_SEC = float(os.getenv("HEALTH_STALE_SEC", str(HEALTH_PROBE_INTERVAL_SEC * 3)))
+HEALTH_PROBE_LLM = os.getenv("HEALTH_PROBE_LLM", "true").lower() in ("1", "true", "yes")
+
+UP, DOWN, UNKNOWN = "up", "down", "unknown"
+
+
+@dataclass
+class _Probe:
+    name: str
+    fn: Callable[[], Any]
+    critical: bool
+
+
+_PROBES: Dict[str, _Probe] = {}
+_STATUS: Dict[str, Dict[str, Any]] = {}
+_RUNNING: Dict[str, Future] = {}
+_LOCK = threading.Lock()
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def register_probe(name: str, fn: Callable[[], Any], critical: bool = False) -> None:
+    """fn raises on failure; its return value (if a dict) is kept as detail."""
+    with _LOCK:
+        _PROBES[name] = _Probe(name, fn, critical)
+        _STATUS.setdefault(name, {"status": UNKNOWN, "critical": critical})
+
+
+# ------------------------------------------------------------------------------
+# Built-in probes
+# ------------------------------------------------------------------------------
+def _postgres_probe(pool_fn: Callable[[], Any]) -> Callable[[], None]:
+    def _probe() -> None:
+        pool = pool_fn()
+        if pool is None:
+            raise RuntimeError("Database pool unavailable")
+        with pool.connection(timeout=HEALTH_PROBE_TIMEOUT_SEC) as conn, conn.cursor() as cur:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+    return _probe
+
+
+def _redis_probe() -> None:
+    from utils import cache
+
+    if not cache._redis_ok():
+        raise RuntimeError("Redis not connected (serving from memory)")
+    cache._REDIS.ping()
+
+
+def _llm_probe() -> Dict[str, str]:
+    from utils.llm_gateway import LLM_PROVIDERS, ping_provider
+
+    # Up if any provider in the fallback chain answers
+    detail: Dict[str, str] = {}
+    for provider in LLM_PROVIDERS:
+        try:
+            ping_provider(provider, timeout=HEALTH_PROBE_TIMEOUT_SEC)
+            detail[provider] = UP
+        except Exception as e:
+            detail[provider] = f"{DOWN}: {e}"
+    if UP not in detail.values():
+        raise RuntimeError("; ".join(f"{k} {v}" for k, v in detail.items()) or "no providers")
+    return detail
+
+
+# ------------------------------------------------------------------------------
+# Probe loop
+# ------------------------------------------------------------------------------
+def _run_one(probe: _Probe) -> None:
+    start = time.perf_counter()
+    status: Dict[str, Any] = {"critical": probe.critical}
+    try:
+        detail = probe.fn()
+        status["status"] = UP
+        if isinstance(detail, dict):
+            status["detail"] = detail
+    except Exception as e:
+        status["status"] = DOWN
+        status["error"] = str(e)[:200]
+    elapsed = time.perf_counter() - start
+    status["latency_ms"] = round(elapsed * 1000, 1)
+    status["checked_at"] = time.time()
+    record_health_probe(probe.name, status["status"] == UP, elapsed)
+    with _LOCK:
+        prev = _STATUS.get(probe.name, {}).get("status")
+        _STATUS[probe.name] = status
+    if prev != status["status"]:
+        log = logger.info if status["status"] == UP else logger.warning
+        log(f"Dependency {probe.name}: {prev} -> {status['status']} {status.get('error', '')}")
+
+
+def run_probes() -> None:
+    """Run every registered probe once (in parallel, bounded by the probe timeout)."""
+    global _EXECUTOR
+    with _LOCK:
+        probes = list(_PROBES.values())
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max(2, len(probes)), thread_name_prefix="health-probe")
+    futures: List[Future] = []
+    for probe in probes:
+        running = _RUNNING.get(probe.name)
+        if running is not None and not running.done():
+            # Previous probe is still hanging: don't pile up another one
+            with _LOCK:
+                _STATUS[probe.name] = {
+                    "status": DOWN, "critical": probe.critical, "error": "probe still running",
+                    "checked_at": time.time(),
+                }
+            record_health_probe(probe.name, False, HEALTH_PROBE_TIMEOUT_SEC)
+            continue
+        _RUNNING[probe.name] = fut = _EXECUTOR.submit(_run_one, probe)
+        futures.append(fut)
+    wait(futures, timeout=HEALTH_PROBE_TIMEOUT_SEC * 2)
+
+
+def start_health_prober(pool_fn: Callable[[], Any]) -> None:
+    """Register the default probes and start the background loop (first pass immediately)."""
+    global _THREAD
+    register_probe("postgres", _postgres_probe(pool_fn), critical=True)
+    if os.getenv("REDIS_URL"):
+        register_probe("redis", _redis_probe)
+    if HEALTH_PROBE_LLM:
+        register_probe("llm", _llm_probe)
+    if _THREAD is not None and _THREAD.is_alive():
+        return
+    _STOP.clear()
+
+    def _loop() -> None:
+        while not _STOP.is_set():
+            run_probes()
+            _STOP.wait(HEALTH_PROBE_INTERVAL_SEC)
+
+    _THREAD = threading.Thread(target=_loop, name="health-prober", daemon=True)
+    _THREAD.start()
+
+
+def stop_health_prober() -> None:
+    global _EXECUTOR
+    _STOP.set()
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------------------------------------------------------------------
+# Cached views for /health and /ready
+# ------------------------------------------------------------------------------
+def dependency_status() -> Dict[str, Dict[str, Any]]:
+    """Last probe result per dependency; stale results are reported as unknown."""
+    now = time.time()
+    with _LOCK:
+        snapshot = {name: dict(s) for name, s in _STATUS.items()}
+    for s in snapshot.values():
+        checked = s.get("checked_at")
+        if checked is not None:
+            if now - checked > HEALTH_STALE_SEC:
+                s["status"] = UNKNOWN
+                s["stale"] = True
+            s["age_sec"] = round(now - checked, 1)
+            del s["checked_at"]
+    return snapshot
+
+
+def is_ready(status: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+    """Every critical dependency was up at its last (fresh) probe."""
+    status = dependency_status() if status is None else status
+    critical = [s for s in status.values() if s.get("critical")]
+    return bool(critical) and all(s["status"] == UP for s in critical)
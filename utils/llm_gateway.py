@@ -0,0 +1,295 @@
+# utils/llm_gateway.py
+"""
+LLM gateway: hedged chat completions with provider fallback.
+
+Providers are OpenAI-compatible endpoints tried in LLM_PROVIDERS order
+("openai", then "local" = Ollama's /v1 API, same idea as the provider priority
+in data_processing/utils/llm_client.py). Within a provider, if the first
+attempt has not answered after a delay derived from that provider's rolling
+p95 latency, a second attempt is fired; the first to finish wins and the other
+is cancelled. Errors fall through to the next provider, and a provider whose
+circuit breaker is open is skipped without a call.
+
+Calls run on a private asyncio loop thread so sync request handlers can use
+complete() and losing attempts can actually be cancelled.
+"""
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from config.settings import OPENAI_API_KEY
+from utils.circuit_breaker import CircuitOpenError, get_breaker
+from utils.logger import setup_logger
+from utils.prometheus_metrics import record_llm_attempt, record_llm_hedge
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = setup_logger("startupscout.llm_gateway")
+
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", "openai,local").split(",") if p.strip()]
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_DELAY_MS = int(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "300"))
+LLM_HEDGE_DEFAULT_DELAY_MS = int(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "2500"))  # until enough samples
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+LLM_ATTEMPT_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "20"))
+LLM_TOTAL_TIMEOUT_SEC = float(os.getenv("LLM_TOTAL_TIMEOUT_SEC", "30"))
+
+_PROVIDERS: Dict[str, Dict[str, Any]] = {
+    "openai": {
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "api_key": OPENAI_API_KEY,
+        "model": None,  # use the requested model
+    },
+    "local": {
+        "base_url": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/") + "/v1",
+        "api_key": "ollama",
+        "model": os.getenv("LLM_LOCAL_MODEL", "llama3:8b"),
+    },
+}
+
+_CLIENTS: Dict[str, "AsyncOpenAI"] = {}
+_STATS: Dict[str, Dict[str, int]] = {}
+_LATENCY: Dict[str, deque] = {}
+_LOCK = threading.Lock()
+
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_LOOP_LOCK = threading.Lock()
+
+
+# ------------------------------------------------------------------------------
+# Provider registry / stats
+# ------------------------------------------------------------------------------
+def register_provider(name: str, base_url: Optional[str], api_key: Optional[str] = None,
+                      model: Optional[str] = None) -> None:
+    """Add or replace an OpenAI-compatible provider."""
+    with _LOCK:
+        _PROVIDERS[name] = {"base_url": base_url, "api_key": api_key or "none", "model": model}
+        _CLIENTS.pop(name, None)
+
+
+def _bump(provider: str, counter: str) -> None:
+    with _LOCK:
+        stats = _STATS.setdefault(
+            provider, {"calls": 0, "errors": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0}
+        )
+        stats[counter] += 1
+
+
+def _observe(provider: str, seconds: float) -> None:
+    with _LOCK:
+        _LATENCY.setdefault(provider, deque(maxlen=LLM_LATENCY_WINDOW)).append(seconds)
+
+
+def _quantile(provider: str, q: float) -> Optional[float]:
+    with _LOCK:
+        samples = sorted(_LATENCY.get(provider, ()))
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def hedge_delay(provider: str) -> Optional[float]:
+    """Seconds to wait before hedging, or None when hedging is off."""
+    if not LLM_HEDGE_ENABLED:
+        return None
+    with _LOCK:
+        n = len(_LATENCY.get(provider, ()))
+    if n < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_DEFAULT_DELAY_MS / 1000
+    return max(LLM_HEDGE_MIN_DELAY_MS / 1000, _quantile(provider, LLM_HEDGE_QUANTILE) or 0.0)
+
+
+def gateway_get_stats() -> Dict[str, Any]:
+    """Per-provider counters and latency for /stats endpoint."""
+    with _LOCK:
+        names = sorted(set(_STATS) | set(_LATENCY))
+        out = {name: dict(_STATS.get(name, {})) for name in names}
+        counts = {name: len(_LATENCY.get(name, ())) for name in names}
+    for name in names:
+        p50, p95 = _quantile(name, 0.5), _quantile(name, 0.95)
+        out[name].update(
+            samples=counts[name],
+            p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+            p95_ms=round(p95 * 1000, 1) if p95 is not None else None,
+        )
+    return out
+
+
+# ------------------------------------------------------------------------------
+# Async core (runs on the gateway loop)
+# ------------------------------------------------------------------------------
+def _client(provider: str) -> "AsyncOpenAI":
+    client = _CLIENTS.get(provider)
+    if client is None:
+        cfg = _PROVIDERS.get(provider)
+        if cfg is None:
+            raise ValueError(f"Unknown provider: {provider}")
+        from openai import AsyncOpenAI  # deferred: the SDK import is ~0.5s of cold start
+        # Retries are handled by hedging / fallback, not the SDK
+        client = AsyncOpenAI(api_key=cfg["api_key"], base_url=cfg["base_url"], max_retries=0)
+        _CLIENTS[provider] = client
+    return client
+
+
+async def _attempt(provider: str, model: str, messages: List[Dict[str, str]],
+                   temperature: float, max_tokens: Optional[int]) -> str:
+    client = _client(provider)
+    start = time.perf_counter()
+    _bump(provider, "calls")
+    try:
+        resp = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=LLM_ATTEMPT_TIMEOUT_SEC,
+        )
+    except asyncio.CancelledError:
+        record_llm_attempt(provider, "cancelled", time.perf_counter() - start)
+        raise
+    except Exception:
+        _bump(provider, "errors")
+        get_breaker(f"llm:{provider}").record_failure()
+        record_llm_attempt(provider, "error", time.perf_counter() - start)
+        raise
+    elapsed = time.perf_counter() - start
+    get_breaker(f"llm:{provider}").record_success()
+    _observe(provider, elapsed)
+    record_llm_attempt(provider, "ok", elapsed)
+    return resp.choices[0].message.content or ""
+
+
+async def _hedged(provider: str, model: str, messages: List[Dict[str, str]],
+                  temperature: float, max_tokens: Optional[int]) -> str:
+    _client(provider)  # build (and import the SDK) before the hedge timer starts
+    first = asyncio.ensure_future(_attempt(provider, model, messages, temperature, max_tokens))
+    delay = hedge_delay(provider)
+    if delay is None:
+        return await first
+
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    second = asyncio.ensure_future(_attempt(provider, model, messages, temperature, max_tokens))
+    _bump(provider, "hedges")
+    record_llm_hedge(provider, "fired")
+    logger.debug("Hedging %s after %.0fms", provider, delay * 1000)
+
+    pending = {first, second}
+    last_err: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        _bump(provider, "hedge_wins")
+                        record_llm_hedge(provider, "won")
+                    return task.result()
+                last_err = task.exception()
+        raise last_err
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _complete(messages: List[Dict[str, str]], model: str, temperature: float,
+                    max_tokens: Optional[int], providers: Sequence[str]) -> Tuple[str, str]:
+    last_err: Optional[Exception] = None
+    for i, provider in enumerate(providers):
+        cfg = _PROVIDERS.get(provider) or {}
+        try:
+            # Open breaker: skip straight to the next provider
+            if not get_breaker(f"llm:{provider}").allow():
+                raise CircuitOpenError(f"llm:{provider}")
+            content = await _hedged(provider, cfg.get("model") or model, messages, temperature, max_tokens)
+            return content, provider
+        except Exception as e:
+            last_err = e
+            logger.warning(f"Provider {provider} failed: {e}")
+            if i + 1 < len(providers):
+                _bump(provider, "fallbacks")
+    raise RuntimeError(f"All LLM providers failed. Last error: {last_err}")
+
+
+def _loop() -> asyncio.AbstractEventLoop:
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None or _LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+            _LOOP = loop
+    return _LOOP
+
+
+# ------------------------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------------------------
+def complete(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-4o-mini",
+    temperature: float = 0.2,
+    max_tokens: Optional[int] = None,
+    providers: Optional[Sequence[str]] = None,
+    timeout: float = LLM_TOTAL_TIMEOUT_SEC,
+) -> Tuple[str, str]:
+    """
+    Blocking chat completion through the gateway. Returns (content, provider).
+    Raises RuntimeError when every provider failed, TimeoutError past `timeout`.
+    """
+    fut = asyncio.run_coroutine_threadsafe(
+        _complete(messages, model, temperature, max_tokens, list(providers or LLM_PROVIDERS)),
+        _loop(),
+    )
+    try:
+        return fut.result(timeout=timeout)
+    except FutureTimeout:
+        fut.cancel()
+        raise TimeoutError(f"LLM gateway timed out after {timeout}s")
+
+
+def ping_provider(provider: str, timeout: float = 3.0) -> None:
+    """
+    Cheap reachability check (GET /models, no tokens spent) for the health
+    prober. Raises on failure.
+    """
+    import httpx
+
+    cfg = _PROVIDERS.get(provider)
+    if cfg is None:
+        raise ValueError(f"Unknown provider: {provider}")
+    base_url = (cfg["base_url"] or "https://api.openai.com/v1").rstrip("/")
+    headers = {"Authorization": f"Bearer {cfg['api_key']}"} if cfg["api_key"] else {}
+    r = httpx.get(f"{base_url}/models", headers=headers, timeout=timeout)
+    r.raise_for_status()
+
+
+def close_gateway() -> None:
+    """Close provider clients and stop the loop thread."""
+    global _LOOP
+    with _LOOP_LOCK:
+        loop, _LOOP = _LOOP, None
+    if loop is None:
+        return
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+
+    async def _close() -> None:
+        for client in clients:
+            await client.close()
+
+    try:
+        asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=5)
+    except Exception as e:
+        logger.warning("Error closing LLM clients: %s", e)
+    loop.call_soon_threadsafe(loop.stop)
@@ -1,24 +1,36 @@
+import atexit
+import itertools
 import logging
+import queue
 import sys
 import os
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
 
-def setup_logger(name: str, level=logging.INFO):
-    """Return a configured, structured logger with optional file rotation."""
-    logger = logging.getLogger(name)
-    if logger.handlers:  # avoid duplicates in reloads
-        return logger
+# Non-blocking pipeline: loggers put records on a bounded queue and one
+# listener thread formats and writes them (stdout, plus the rotating file in
+# prod), so request threads never wait on I/O. LOG_ASYNC=false writes inline.
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() in ("1", "true", "yes")
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
 
-    # --- Formatter ---
-    formatter = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+_FORMATTER = logging.Formatter(
+    "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+_SIMPLE_ARGS = (str, int, float, bool, type(None))
 
+_QUEUE: Optional[queue.Queue] = None
+_LISTENER: Optional[QueueListener] = None
+_PIPELINE_LOCK = threading.Lock()
+_STATS = {"dropped": 0, "sampled_out": 0}
+
+
+def _output_handlers():
     # --- Console handler (always on) ---
     stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    stream_handler.setFormatter(_FORMATTER)
+    handlers = [stream_handler]
 
     # --- File handler (prod mode only) ---
     if os.getenv("ENV", "dev").lower() == "prod":
@@ -26,8 +38,103 @@ def setup_logger(name: str, level=logging.INFO):
         file_handler = RotatingFileHandler(
             "logs/app.log", maxBytes=5_000_000, backupCount=3, encoding="utf-8"
         )
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        file_handler.setFormatter(_FORMATTER)
+        handlers.append(file_handler)
+    return handlers
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Enqueue without formatting; drop (and count) instead of blocking when full."""
+
+    def prepare(self, record):
+        # %-args are formatted by the listener; mutable args (lists of scores,
+        # rows) are resolved now so a later mutation can't change the line.
+        if record.args and not all(isinstance(a, _SIMPLE_ARGS) for a in record.args):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _STATS["dropped"] += 1
+
+
+def _stop_pipeline() -> None:
+    global _LISTENER
+    with _PIPELINE_LOCK:
+        listener, _LISTENER = _LISTENER, None
+    if listener is not None:
+        listener.stop()  # drains what's queued
+
+
+def _queue_handler() -> QueueHandler:
+    global _QUEUE, _LISTENER
+    with _PIPELINE_LOCK:
+        if _LISTENER is None:
+            _QUEUE = queue.Queue(maxsize=LOG_QUEUE_MAX)
+            _LISTENER = QueueListener(_QUEUE, *_output_handlers(), respect_handler_level=True)
+            _LISTENER.start()
+            _LISTENER._thread.name = "log-writer"
+            atexit.register(_stop_pipeline)
+        return _NonBlockingQueueHandler(_QUEUE)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep every Nth record at INFO and below for one logger; warnings and
+    errors always pass. Rates come from LOG_SAMPLE ("startupscout.retrieval=10,...")
+    or set_log_sampling().
+    """
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(1, every)
+        self._count = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > logging.INFO:
+            return True
+        if next(self._count) % self.every == 0:
+            return True
+        _STATS["sampled_out"] += 1
+        return False
+
+
+def _sample_rates() -> Dict[str, int]:
+    rates = {}
+    for item in os.getenv("LOG_SAMPLE", "").split(","):
+        name, _, every = item.partition("=")
+        if name.strip() and every.strip().isdigit():
+            rates[name.strip()] = int(every)
+    return rates
+
+
+def set_log_sampling(name: str, every: int) -> None:
+    """Keep 1 in `every` INFO/DEBUG records from logger `name` (1 = keep all)."""
+    logger = logging.getLogger(name)
+    for f in list(logger.filters):
+        if isinstance(f, SamplingFilter):
+            logger.removeFilter(f)
+    if every > 1:
+        logger.addFilter(SamplingFilter(every))
+
+
+def setup_logger(name: str, level=logging.INFO):
+    """Return a configured, structured logger with optional file rotation."""
+    logger = logging.getLogger(name)
+    if logger.handlers:  # avoid duplicates in reloads
+        return logger
+
+    if LOG_ASYNC:
+        logger.addHandler(_queue_handler())
+    else:
+        for handler in _output_handlers():
+            logger.addHandler(handler)
+
+    every = _sample_rates().get(name, 1)
+    if every > 1:
+        logger.addFilter(SamplingFilter(every))
 
     # --- Log level ---
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -35,6 +142,16 @@ def setup_logger(name: str, level=logging.INFO):
     logger.propagate = False
     return logger
 
+
+def logging_get_stats() -> Dict[str, int]:
+    """Return log pipeline stats for /stats endpoint."""
+    return {
+        **_STATS,
+        "queued": _QUEUE.qsize() if _QUEUE is not None else 0,
+        "async": LOG_ASYNC,
+    }
+
+
 def sampled_log(logger, level: str, message: str, every: int = 10, index: int = 0):
     """
     Log every Nth message only — useful for high-frequency loops.
@@ -1,86 +1,282 @@
 # utils/observability/langfuse.py
+"""
+Langfuse tracing off the request path.
+
+lf_trace / lf_span / lf_log_event / lf_log_llm_usage only build small dicts
+and put them on a bounded queue (put_nowait; a full queue drops the record
+and counts it). A daemon exporter thread batches records (LANGFUSE_BATCH_SIZE
+or every LANGFUSE_FLUSH_INTERVAL_MS), turns them into Langfuse ingestion
+events and hands each batch to the sink: by default a POST to
+/api/public/ingestion, or whatever set_sink() installed (tests use a local
+stand-in collector). Export errors are counted, never raised.
+
+Sampling is head-based: the first lf_trace in a request decides once
+(LANGFUSE_SAMPLING_RATE) and the decision sits in a contextvar, so every
+span, event and stage timing (utils/stage_timing.py) of that request follows
+it, including work done in threadpool workers.
+"""
 from __future__ import annotations
+
 import os
 import time
+import uuid
+import queue
+import random
+import threading
 import traceback
 from contextlib import contextmanager
-from typing import Any, Dict, Optional
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
 from config.settings import (
     LANGFUSE_ENABLED, LANGFUSE_HOST, LANGFUSE_PUBLIC_KEY, LANGFUSE_SECRET_KEY, LANGFUSE_SAMPLING_RATE
 )
+from utils.logger import setup_logger
+from utils.prometheus_metrics import record_trace_dropped
 
-_langfuse = None
-def _client():
-    global _langfuse
-    if not LANGFUSE_ENABLED:
-        return None
-    if not (LANGFUSE_HOST and LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY):
-        return None
-    if _langfuse is None:
-        try:
-            from langfuse import Langfuse
-            _langfuse = Langfuse(
-                host=LANGFUSE_HOST,
-                public_key=LANGFUSE_PUBLIC_KEY,
-                secret_key=LANGFUSE_SECRET_KEY,
-                # SDK-level sampling if supported; otherwise we'll sample in code
-            )
-        except Exception:
-            _langfuse = None
-    return _langfuse
-
-def _sampled() -> bool:
-    import random
+logger = setup_logger("startupscout.langfuse")
+
+LANGFUSE_QUEUE_MAX = int(os.getenv("LANGFUSE_QUEUE_MAX", "10000"))
+LANGFUSE_BATCH_SIZE = int(os.getenv("LANGFUSE_BATCH_SIZE", "100"))
+LANGFUSE_FLUSH_INTERVAL_MS = int(os.getenv("LANGFUSE_FLUSH_INTERVAL_MS", "1000"))
+LANGFUSE_EXPORT_TIMEOUT_SEC = float(os.getenv("LANGFUSE_EXPORT_TIMEOUT_SEC", "5"))
+
+
+class TraceHandle:
+    __slots__ = ("id", "name")
+
+    def __init__(self, trace_id: str, name: str):
+        self.id = trace_id
+        self.name = name
+
+
+# Head-based sampling decision for the current request (None = not decided yet)
+_SAMPLED: ContextVar[Optional[bool]] = ContextVar("lf_sampled", default=None)
+_TRACE: ContextVar[Optional[TraceHandle]] = ContextVar("lf_trace", default=None)
+_PARENT: ContextVar[Optional[str]] = ContextVar("lf_parent", default=None)
+
+_QUEUE: "queue.Queue[Any]" = queue.Queue(maxsize=LANGFUSE_QUEUE_MAX)
+_SINK = None
+_EXPORTER: Optional[threading.Thread] = None
+_STOP = threading.Event()
+_LOCK = threading.Lock()
+_STATS = {"enqueued": 0, "dropped": 0, "exported": 0, "batches": 0, "export_errors": 0}
+
+
+class _Flush:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+# ------------------------------------------------------------------------------
+# Sinks
+# ------------------------------------------------------------------------------
+class IngestionSink:
+    """POST batches to the Langfuse public ingestion API."""
+
+    def __init__(self, host: str, public_key: str, secret_key: str, timeout: float = LANGFUSE_EXPORT_TIMEOUT_SEC):
+        import httpx
+
+        self.url = host.rstrip("/") + "/api/public/ingestion"
+        self._client = httpx.Client(auth=(public_key, secret_key), timeout=timeout)
+
+    def export(self, events: List[Dict[str, Any]]) -> None:
+        response = self._client.post(self.url, json={"batch": events})
+        response.raise_for_status()
+
+
+def set_sink(sink) -> None:
+    """Install the exporter sink (anything with export(events)); enables tracing. None resets."""
+    global _SINK
+    with _LOCK:
+        _SINK = sink
+
+
+def _sink():
+    global _SINK
+    if _SINK is None and LANGFUSE_ENABLED and LANGFUSE_HOST and LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY:
+        with _LOCK:
+            if _SINK is None:
+                _SINK = IngestionSink(LANGFUSE_HOST, LANGFUSE_PUBLIC_KEY, LANGFUSE_SECRET_KEY)
+    return _SINK
+
+
+def tracing_enabled() -> bool:
+    return _SINK is not None or bool(
+        LANGFUSE_ENABLED and LANGFUSE_HOST and LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY
+    )
+
+
+# ------------------------------------------------------------------------------
+# Background exporter
+# ------------------------------------------------------------------------------
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _envelope(kind: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    # Timestamps travel as epoch floats; ISO formatting happens here, off the request path
+    for key in ("timestamp", "startTime", "endTime"):
+        if isinstance(body.get(key), float):
+            body[key] = _iso(body[key])
+    return {"id": uuid.uuid4().hex, "type": kind, "timestamp": _iso(time.time()), "body": body}
+
+
+def _export(batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+    if not batch:
+        return
+    sink = _sink()
+    if sink is None:
+        return
+    try:
+        sink.export([_envelope(kind, body) for kind, body in batch])
+        _STATS["exported"] += len(batch)
+        _STATS["batches"] += 1
+    except Exception as e:
+        _STATS["export_errors"] += 1
+        logger.warning("Langfuse export of %d records failed: %s", len(batch), e)
+
+
+def _exporter_loop() -> None:
+    interval = LANGFUSE_FLUSH_INTERVAL_MS / 1000.0
+    while not _STOP.is_set():
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        flushes: List[_Flush] = []
+        deadline = time.monotonic() + interval
+        while len(batch) < LANGFUSE_BATCH_SIZE and not flushes:
+            try:
+                item = _QUEUE.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if isinstance(item, _Flush):
+                flushes.append(item)
+            else:
+                batch.append(item)
+        _export(batch)
+        for f in flushes:
+            f.done.set()
+
+
+def _ensure_exporter() -> None:
+    global _EXPORTER
+    if _EXPORTER is not None and _EXPORTER.is_alive():
+        return
+    with _LOCK:
+        if _EXPORTER is None or not _EXPORTER.is_alive():
+            _STOP.clear()
+            _EXPORTER = threading.Thread(target=_exporter_loop, name="langfuse-exporter", daemon=True)
+            _EXPORTER.start()
+
+
+def _emit(kind: str, body: Dict[str, Any]) -> None:
+    _ensure_exporter()
+    try:
+        _QUEUE.put_nowait((kind, body))
+        _STATS["enqueued"] += 1
+    except queue.Full:
+        _STATS["dropped"] += 1
+        record_trace_dropped()
+
+
+def flush_tracing(timeout: float = 5.0) -> bool:
+    """Export everything queued so far; True if it finished within `timeout`."""
+    if _EXPORTER is None or not _EXPORTER.is_alive():
+        return _QUEUE.empty()
+    marker = _Flush()
     try:
-        return random.random() < float(LANGFUSE_SAMPLING_RATE)
-    except Exception:
+        _QUEUE.put(marker, timeout=timeout)
+    except queue.Full:
         return False
+    return marker.done.wait(timeout)
+
+
+def shutdown_tracing(timeout: float = 5.0) -> None:
+    flush_tracing(timeout)
+    _STOP.set()
+
+
+def tracing_get_stats() -> Dict[str, Any]:
+    """Return trace export stats for /stats endpoint."""
+    return {**_STATS, "queued": _QUEUE.qsize(), "enabled": tracing_enabled()}
+
+
+# ------------------------------------------------------------------------------
+# Request-path API (enqueue only)
+# ------------------------------------------------------------------------------
+def _new_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_trace() -> Optional[TraceHandle]:
+    return _TRACE.get()
+
 
 def _truncate(s: Optional[str], limit: int = 2000) -> Optional[str]:
     if s is None:
         return None
     return s if len(s) <= limit else s[:limit] + "…[truncated]"
 
+
 def _redact(s: Optional[str]) -> Optional[str]:
     # Minimal redaction; extend if needed
     return s
 
+
 @contextmanager
 def lf_trace(name: str, user_id: Optional[str] = None, session_id: Optional[str] = None,
              input_text: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None,
              request_id: Optional[str] = None):
     """Context manager that yields (trace, enabled: bool). No-ops if disabled or not sampled."""
-    client = _client()
-    enabled = bool(client) and _sampled()
-    trace = None
+    outer = _TRACE.get()
+    if outer is not None:
+        # Nested traces join the outer one
+        yield outer, True
+        return
+
+    # Head-based: decided once here, inherited by everything inside
+    sampled = _SAMPLED.get()
+    sampled_token = None
+    if sampled is None:
+        sampled = tracing_enabled() and random.random() < float(LANGFUSE_SAMPLING_RATE)
+        sampled_token = _SAMPLED.set(sampled)
+    if not sampled:
+        try:
+            yield None, False
+        finally:
+            if sampled_token is not None:
+                _SAMPLED.reset(sampled_token)
+        return
+
+    trace = TraceHandle(_new_id(), name)
+    tokens = (_TRACE.set(trace), _PARENT.set(None))
     start = time.time()
+    body: Dict[str, Any] = {
+        "id": trace.id,
+        "name": name,
+        "timestamp": start,
+        "userId": str(user_id) if user_id is not None else None,
+        "sessionId": session_id,
+        "input": _truncate(_redact(input_text)),
+        "metadata": {**(metadata or {}), "request_id": request_id},
+    }
     try:
-        if enabled:
-            # Use the new LangFuse API - start_as_current_span for the main trace
-            trace = client.start_as_current_span(
-                name=name,
-                input=_truncate(_redact(input_text)),
-                metadata={
-                    **(metadata or {}),
-                    "user_id": user_id,
-                    "session_id": session_id,
-                    "request_id": request_id
-                }
-            )
-        yield trace, enabled
+        yield trace, True
     except Exception as e:
-        if trace is not None:
-            try:
-                client.update_current_trace(level="ERROR", metadata={"exception": repr(e), "stack": traceback.format_exc()})
-            except Exception:
-                pass
+        body["metadata"]["level"] = "ERROR"
+        body["metadata"]["exception"] = repr(e)
+        body["metadata"]["stack"] = traceback.format_exc()
         raise
     finally:
-        if enabled and trace is not None:
-            try:
-                client.update_current_trace(output=None, metadata={"duration_ms": int((time.time() - start) * 1000)})
-            except Exception:
-                pass
+        body["metadata"]["duration_ms"] = int((time.time() - start) * 1000)
+        _PARENT.reset(tokens[1])
+        _TRACE.reset(tokens[0])
+        if sampled_token is not None:
+            _SAMPLED.reset(sampled_token)
+        _emit("trace-create", body)
+
 
 @contextmanager
 def lf_span(trace, name: str, metadata: Optional[Dict[str, Any]] = None):
@@ -88,113 +284,75 @@ def lf_span(trace, name: str, metadata: Optional[Dict[str, Any]] = None):
     if trace is None:
         yield None
         return
-    client = _client()
-    if client is None:
-        yield None
-        return
-    span = None
+    span_id = _new_id()
+    parent = _PARENT.set(span_id)
+    start = time.time()
+    level = "DEFAULT"
+    meta = dict(metadata or {})
     try:
-        # Use the new LangFuse API for nested spans
-        span = client.start_as_current_span(name=name, metadata=metadata or {})
-        yield span
+        yield span_id
     except Exception as e:
-        try:
-            if span is not None:
-                client.update_current_span(level="ERROR", metadata={"exception": repr(e), "stack": traceback.format_exc()})
-        except Exception:
-            pass
+        level = "ERROR"
+        meta["exception"] = repr(e)
         raise
     finally:
-        try:
-            if span is not None:
-                # LangFuse automatically ends spans when exiting the context
-                pass
-        except Exception:
-            pass
+        _PARENT.reset(parent)
+        _emit("span-create", {
+            "id": span_id, "traceId": trace.id, "parentObservationId": _PARENT.get(), "name": name,
+            "startTime": start, "endTime": time.time(), "level": level, "metadata": meta,
+        })
+
+
+def record_stage_span(name: str, start: float, elapsed: float) -> None:
+    """Stage timings (utils/stage_timing.py) become spans of the sampled trace, if any."""
+    trace = _TRACE.get()
+    if trace is None:
+        return
+    _emit("span-create", {
+        "id": _new_id(), "traceId": trace.id, "parentObservationId": _PARENT.get(), "name": name,
+        "startTime": start, "endTime": start + elapsed, "metadata": {"stage": True},
+    })
+
 
 def lf_log_event(trace, name: str, data: Dict[str, Any]):
     """Attach small custom events; safe if trace is None."""
     if trace is None:
         return
-    client = _client()
-    if client is None:
-        return
-    try:
-        client.create_event(name=name, metadata=data)
-    except Exception:
-        pass
+    _emit("event-create", {
+        "id": _new_id(), "traceId": trace.id, "parentObservationId": _PARENT.get(), "name": name,
+        "startTime": time.time(), "metadata": dict(data),
+    })
+
 
-def lf_log_llm_usage(trace, model: str, prompt_tokens: int, completion_tokens: int, 
+def lf_log_llm_usage(trace, model: str, prompt_tokens: int, completion_tokens: int,
                     total_tokens: int, duration_ms: int, cost_usd: float = None):
     """Log detailed LLM usage metrics including cost calculation."""
     if trace is None:
         return
-    client = _client()
-    if client is None:
-        return
-    
+
     # Calculate cost if not provided (rough estimates for common models)
     if cost_usd is None:
         cost_usd = _calculate_model_cost(model, prompt_tokens, completion_tokens)
-    
-    try:
-        # Calculate metrics
-        tokens_per_second = round(total_tokens / (duration_ms / 1000), 2) if duration_ms > 0 else 0
-        cost_per_1k_tokens = round(cost_usd / (total_tokens / 1000), 6) if total_tokens > 0 else 0
-        
-        # Create scores for metrics visualization (these will show up in graphs)
-        try:
-            client.create_score(
-                name="cost_usd",
-                value=round(cost_usd, 6),
-                trace_id=client.get_current_trace_id()
-            )
-        except Exception:
-            pass
-            
-        try:
-            client.create_score(
-                name="tokens_per_second", 
-                value=tokens_per_second,
-                trace_id=client.get_current_trace_id()
-            )
-        except Exception:
-            pass
-            
-        try:
-            client.create_score(
-                name="total_tokens",
-                value=total_tokens,
-                trace_id=client.get_current_trace_id()
-            )
-        except Exception:
-            pass
-            
-        try:
-            client.create_score(
-                name="duration_ms",
-                value=duration_ms,
-                trace_id=client.get_current_trace_id()
-            )
-        except Exception:
-            pass
-        
-        # Also log as an event with detailed metrics
-        client.create_event(
-            name="llm.usage",
-            metadata={
-                "model": model,
-                "prompt_tokens": prompt_tokens,
-                "completion_tokens": completion_tokens,
-                "total_tokens": total_tokens,
-                "duration_ms": duration_ms,
-                "cost_usd": round(cost_usd, 6),
-                "tokens_per_second": tokens_per_second,
-                "cost_per_1k_tokens": cost_per_1k_tokens
-            }
-        )
-    except Exception:
-        pass
+
+    tokens_per_second = round(total_tokens / (duration_ms / 1000), 2) if duration_ms > 0 else 0
+    cost_per_1k_tokens = round(cost_usd / (total_tokens / 1000), 6) if total_tokens > 0 else 0
+    end = time.time()
+
+    _emit("generation-create", {
+        "id": _new_id(), "traceId": trace.id, "parentObservationId": _PARENT.get(), "name": "llm",
+        "model": model, "startTime": end - duration_ms / 1000.0, "endTime": end,
+        "usage": {"input": prompt_tokens, "output": completion_tokens, "total": total_tokens},
+        "metadata": {
+            "cost_usd": round(cost_usd, 6),
+            "tokens_per_second": tokens_per_second,
+            "cost_per_1k_tokens": cost_per_1k_tokens,
+        },
+    })
+    # Scores show up in Langfuse graphs
+    for score, value in (("cost_usd", round(cost_usd, 6)), ("tokens_per_second", tokens_per_second),
+                         ("total_tokens", total_tokens), ("duration_ms", duration_ms)):
+        _emit("score-create", {"id": _new_id(), "traceId": trace.id, "name": score, "value": value})
+
 
 def _calculate_model_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
     """Calculate approximate cost based on model pricing (as of 2024)."""
@@ -209,7 +367,7 @@ def _calculate_model_cost(model: str, prompt_tokens: int, completion_tokens: int
         "claude-3-5-haiku-20241022": {"input": 0.0008, "output": 0.004},
         "claude-3-opus-20240229": {"input": 0.015, "output": 0.075},
     }
-    
+
     # Normalize model name (remove version suffixes for matching)
     model_key = model.lower()
     for key in pricing.keys():
@@ -218,6 +376,6 @@ def _calculate_model_cost(model: str, prompt_tokens: int, completion_tokens: int
             input_cost = (prompt_tokens / 1000) * rates["input"]
             output_cost = (completion_tokens / 1000) * rates["output"]
             return input_cost + output_cost
-    
+
     # Default fallback pricing (GPT-4o-mini rates)
     return (prompt_tokens / 1000) * 0.00015 + (completion_tokens / 1000) * 0.0006
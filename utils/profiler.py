@@ -0,0 +1,199 @@
+# utils/profiler.py
+"""
+On-demand statistical sampling profiler.
+
+An admin starts a session (POST /admin/profile, or an `x-profile: <admin
+key>` header on one request). Until the session has seen N requests or T
+seconds, a daemon thread snapshots every thread's Python stack with
+sys._current_frames() each PROFILER_INTERVAL_MS and counts identical stacks.
+The result is collapsed-stack text ("thread;file:func;file:func count"),
+ready for flamegraph.pl or speedscope.
+
+Sampling is process-wide. An `x-profile` session is a short global window:
+it starts when that request arrives and ends when that request completes
+(other requests finishing meanwhile don't end it), and stacks of requests
+running concurrently in that window are included.
+
+Threads parked in threading/queue/selectors (idle workers, an idle event
+loop) are skipped; a stack ending in socket/ssl/psycopg code is an I/O wait
+and is kept. With no session running the only per-request cost is a global
+check and a header lookup in ProfilerMiddleware.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import hmac
+import time
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.profiler")
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+PROFILER_MAX_DEPTH = int(os.getenv("PROFILER_MAX_DEPTH", "64"))
+
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+# Requests that don't count toward "the next N requests"
+_UNCOUNTED_PATHS = ("/health", "/ready", "/metrics", "/admin/profile")
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class ProfileSession:
+    def __init__(self, requests: Optional[int], seconds: float, interval_ms: float):
+        self.requests_left = requests
+        self.seconds = seconds
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def status(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "active": not self.done.is_set(),
+            "requests_left": self.requests_left,
+            "duration_sec": round(end - self.started_at, 2),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": self.samples,
+            "idle_samples": self.idle_samples,
+            "distinct_stacks": len(self.stacks),
+        }
+
+
+_SESSION: Optional[ProfileSession] = None  # running
+_LAST: Optional[ProfileSession] = None     # running or most recently finished
+_LOCK = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _sample_once(session: ProfileSession, own_ident: int) -> None:
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks, idle = [], 0
+    for ident, frame in sys._current_frames().items():
+        if ident == own_ident:
+            continue
+        if os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+            idle += 1
+            continue
+        labels = []
+        while frame is not None and len(labels) < PROFILER_MAX_DEPTH:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.append(names.get(ident, "thread").replace(" ", "_"))
+        stacks.append(";".join(reversed(labels)))
+    with session.lock:
+        session.stacks.update(stacks)
+        session.samples += len(stacks)
+        session.idle_samples += idle
+
+
+def _run(session: ProfileSession) -> None:
+    global _SESSION
+    own = threading.get_ident()
+    deadline = time.monotonic() + session.seconds
+    while not session.done.is_set() and time.monotonic() < deadline:
+        _sample_once(session, own)
+        session.done.wait(session.interval)
+    with _LOCK:
+        session.finished_at = time.time()
+        session.done.set()
+        if _SESSION is session:
+            _SESSION = None
+    logger.info(f"Profile finished: {session.status()}")
+
+
+def start_profile(requests: Optional[int] = None, seconds: Optional[float] = None,
+                  interval_ms: Optional[float] = None) -> ProfileSession:
+    """Start sampling for the next `requests` requests or `seconds` (capped), whichever ends first."""
+    global _SESSION, _LAST
+    seconds = min(seconds or PROFILER_MAX_SECONDS, PROFILER_MAX_SECONDS)
+    with _LOCK:
+        if _SESSION is not None:
+            raise ProfilerBusy("A profile is already running")
+        session = ProfileSession(requests, seconds, interval_ms or PROFILER_INTERVAL_MS)
+        _SESSION = _LAST = session
+    threading.Thread(target=_run, args=(session,), name="profiler", daemon=True).start()
+    logger.info(f"Profile started: requests={requests} seconds={seconds}")
+    return session
+
+
+def stop_profile() -> Optional[ProfileSession]:
+    session = _SESSION
+    if session is not None:
+        session.done.set()
+    return _LAST
+
+
+def request_finished(path: str) -> None:
+    """Count one request against the running session's request budget."""
+    session = _SESSION
+    if session is None or session.requests_left is None or path.startswith(_UNCOUNTED_PATHS):
+        return
+    with _LOCK:
+        session.requests_left = max(0, session.requests_left - 1)
+        if session.requests_left == 0:
+            session.done.set()
+
+
+def last_profile() -> Optional[ProfileSession]:
+    return _LAST
+
+
+def collapsed_stacks(session: ProfileSession) -> str:
+    """Collapsed-stack text, hottest first (flamegraph.pl / speedscope input)."""
+    with session.lock:
+        ranked = session.stacks.most_common()
+    return "\n".join(f"{stack} {count}" for stack, count in ranked)
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware: counts requests against a running profile session
+    and, when `x-profile` carries the admin key, runs a session for exactly
+    the lifetime of that request.
+    """
+
+    def __init__(self, app, admin_key: Callable[[], str]):
+        self.app = app
+        self.admin_key = admin_key
+
+    def _wants_profile(self, scope) -> bool:
+        for name, value in scope.get("headers") or ():
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.admin_key().encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        own: Optional[ProfileSession] = None
+        if _SESSION is None and self._wants_profile(scope):
+            try:
+                # No request budget: only this request's completion ends it
+                own = start_profile()
+            except ProfilerBusy:
+                pass
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if own is not None:
+                own.done.set()
+            elif _SESSION is not None:
+                request_finished(scope.get("path", ""))
@@ -103,6 +103,18 @@ LLM_COST_PER_1K_TOKENS = Gauge(
     ['model']
 )
 
+LLM_PROVIDER_LATENCY = Histogram(
+    'startupscout_llm_provider_latency_seconds',
+    'LLM attempt latency per provider in seconds',
+    ['provider', 'status']
+)
+
+LLM_HEDGES_TOTAL = Counter(
+    'startupscout_llm_hedges_total',
+    'Hedged LLM attempts by outcome',
+    ['provider', 'outcome']  # outcome: fired, won
+)
+
 # Database metrics
 DB_CONNECTIONS_ACTIVE = Gauge(
     'startupscout_db_connections_active',
@@ -167,6 +179,66 @@ ERRORS_TOTAL = Counter(
     ['error_type', 'component']
 )
 
+CIRCUIT_BREAKER_STATE = Gauge(
+    'startupscout_circuit_breaker_state',
+    'Circuit breaker state (0=closed, 1=half-open, 2=open)',
+    ['name']
+)
+
+# Admission control metrics
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'startupscout_admission_queue_depth',
+    'Requests waiting for a stage slot',
+    ['stage']
+)
+
+ADMISSION_WAIT = Histogram(
+    'startupscout_admission_wait_seconds',
+    'Time spent waiting for a stage slot',
+    ['stage'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, float('inf'))
+)
+
+ADMISSION_REJECTED = Counter(
+    'startupscout_admission_rejected_total',
+    'Requests rejected by admission control',
+    ['stage', 'reason']  # reason: queue_full, deadline, timeout
+)
+
+# Dependency health (background prober, utils/health.py)
+HEALTH_PROBE_LATENCY = Histogram(
+    'startupscout_health_probe_latency_seconds',
+    'Dependency probe latency in seconds',
+    ['dependency', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, float('inf'))
+)
+
+DEPENDENCY_UP = Gauge(
+    'startupscout_dependency_up',
+    'Last probe result per dependency (1=up, 0=down)',
+    ['dependency']
+)
+
+# Per-stage request latency (utils/stage_timing.py)
+STAGE_DURATION = Histogram(
+    'startupscout_stage_duration_seconds',
+    'Request stage duration in seconds',
+    ['stage'],  # embed, vector, lexical, keyword, rerank, history, context, llm, persist
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+)
+
+STAGE_CPU_SECONDS = Counter(
+    'startupscout_stage_cpu_seconds_total',
+    'CPU time (thread_time of the timing thread) spent per request stage',
+    ['stage']
+)
+
+# Trace export (utils/observability/langfuse.py)
+TRACE_RECORDS_DROPPED = Counter(
+    'startupscout_trace_records_dropped_total',
+    'Trace records dropped because the export queue was full'
+)
+
 # System metrics
 ACTIVE_SESSIONS = Gauge(
     'startupscout_active_sessions',
@@ -215,6 +287,14 @@ def record_llm_call(model: str, status: str, duration: float,
     LLM_TOKENS_PER_SECOND.labels(model=model).set(tokens_per_second)
     LLM_COST_PER_1K_TOKENS.labels(model=model).set(cost_per_1k_tokens)
 
+def record_llm_attempt(provider: str, status: str, duration: float):
+    """Record one LLM gateway attempt"""
+    LLM_PROVIDER_LATENCY.labels(provider=provider, status=status).observe(duration)
+
+def record_llm_hedge(provider: str, outcome: str):
+    """Record a hedged LLM attempt being fired or winning"""
+    LLM_HEDGES_TOTAL.labels(provider=provider, outcome=outcome).inc()
+
 def record_db_query(query_type: str, duration: float):
     """Record database query metrics"""
     DB_QUERY_DURATION.labels(query_type=query_type).observe(duration)
@@ -250,3 +330,42 @@ def set_db_connections_active(count: int):
 def set_cache_size(cache_type: str, size_bytes: int):
     """Set cache size"""
     CACHE_SIZE.labels(cache_type=cache_type).set(size_bytes)
+
+def set_circuit_state(name: str, state: int):
+    """Set circuit breaker state (0=closed, 1=half-open, 2=open)"""
+    CIRCUIT_BREAKER_STATE.labels(name=name).set(state)
+
+def set_admission_queue_depth(stage: str, depth: int):
+    """Set admission queue depth for a stage"""
+    ADMISSION_QUEUE_DEPTH.labels(stage=stage).set(depth)
+
+def record_admission_wait(stage: str, seconds: float):
+    """Record time waited for a stage slot"""
+    ADMISSION_WAIT.labels(stage=stage).observe(seconds)
+
+def record_admission_rejected(stage: str, reason: str):
+    """Record an admission rejection"""
+    ADMISSION_REJECTED.labels(stage=stage, reason=reason).inc()
+
+def record_stage(stage: str, seconds: float):
+    """Record one request stage; also feeds the older per-stage histograms"""
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+    if stage == "vector":
+        VECTOR_SEARCH_DURATION.observe(seconds)
+    elif stage == "keyword":
+        KEYWORD_SEARCH_DURATION.observe(seconds)
+    elif stage == "rerank":
+        RERANK_DURATION.observe(seconds)
+
+def record_stage_cpu(stage: str, seconds: float):
+    """Record CPU time spent in one request stage"""
+    STAGE_CPU_SECONDS.labels(stage=stage).inc(max(0.0, seconds))
+
+def record_trace_dropped():
+    """Record a trace record dropped on a full export queue"""
+    TRACE_RECORDS_DROPPED.inc()
+
+def record_health_probe(dependency: str, ok: bool, seconds: float):
+    """Record a dependency probe result and latency"""
+    HEALTH_PROBE_LATENCY.labels(dependency=dependency, status="up" if ok else "down").observe(seconds)
+    DEPENDENCY_UP.labels(dependency=dependency).set(1 if ok else 0)
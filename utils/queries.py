@@ -0,0 +1,140 @@
+# utils/queries.py
+"""
+Registry of the hot retrieval statements behind /ask and /search.
+
+Each statement is defined once and its SQL text built once per variant
+(LIMIT, rank function, text-search language). run() asks psycopg to prepare
+it server-side on direct connections, so Postgres parses and plans it once
+per pooled connection. Behind a transaction pooler a named statement would
+not follow the backend, so it is sent as a protocol-level unnamed statement.
+
+Row limits are inlined as literals rather than bound: when Postgres moves a
+prepared statement to its generic plan, the plan still knows how many rows
+are wanted and keeps the ANN index scan instead of a full sort.
+"""
+from __future__ import annotations
+
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Sequence
+
+from utils.db import transaction_pooler
+
+VECTOR_DOC = "vector_doc"
+VECTOR_SHORT = "vector_short"
+VECTOR_CHUNK = "vector_chunk"
+LEXICAL = "lexical"
+KEYWORD = "keyword"
+
+_TS_VECTOR = "to_tsvector('{lang}', coalesce(title,'') || ' ' || coalesce(decision,'') || ' ' || coalesce(content,''))"
+_TS_QUERY = "websearch_to_tsquery('{lang}', %s)"
+
+_TEMPLATES: Dict[str, str] = {}
+_STATS: Dict[str, int] = {}
+_LOCK = threading.Lock()
+
+
+def register(name: str, sql: str) -> None:
+    """Add a statement; `{placeholders}` are filled per variant by sql_for()."""
+    _TEMPLATES[name] = sql
+    sql_for.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def sql_for(name: str, **variant: Any) -> str:
+    return _TEMPLATES[name].format(**variant)
+
+
+def run(cur, name: str, params: Sequence[Any], **variant: Any):
+    """Execute a registered statement (prepared unless behind a transaction pooler)."""
+    cur.execute(sql_for(name, **variant), params, prepare=not transaction_pooler())
+    with _LOCK:
+        _STATS[name] = _STATS.get(name, 0) + 1
+    return cur
+
+
+def queries_get_stats() -> Dict[str, Any]:
+    """Return statement mode and execution counts for /stats endpoint."""
+    with _LOCK:
+        executions = dict(_STATS)
+    return {
+        "mode": "unnamed" if transaction_pooler() else "prepared",
+        "executions": executions,
+        "variants_cached": sql_for.cache_info().currsize,
+    }
+
+
+# ------------------------------------------------------------------------------
+# Statements
+# ------------------------------------------------------------------------------
+register(VECTOR_DOC, """
+    SELECT
+        id, title, decision, summary, content, comments, tags, stage, source, url,
+        1 - (embedding <=> %s::vector) AS sim, fetched_at
+    FROM decisions
+    WHERE embedding IS NOT NULL
+    ORDER BY embedding <-> %s::vector
+    LIMIT {limit};
+""")
+
+register(VECTOR_SHORT, """
+    WITH cand AS (
+        SELECT id
+        FROM decisions
+        WHERE embedding_short IS NOT NULL
+        ORDER BY embedding_short <=> %s::vector
+        LIMIT {candidates}
+    )
+    SELECT
+        d.id, d.title, d.decision, d.summary, d.content, d.comments, d.tags, d.stage,
+        d.source, d.url, 1 - (d.embedding <=> %s::vector) AS sim, d.fetched_at
+    FROM decisions d
+    JOIN cand USING (id)
+    WHERE d.embedding IS NOT NULL
+    ORDER BY d.embedding <=> %s::vector
+    LIMIT {limit};
+""")
+
+register(VECTOR_CHUNK, """
+    WITH hits AS (
+        SELECT decision_id, text, 1 - (embedding <=> %s::vector) AS sim
+        FROM decision_chunks
+        WHERE embedding IS NOT NULL
+        ORDER BY embedding <=> %s::vector
+        LIMIT {candidates}
+    ), best AS (
+        SELECT decision_id, MAX(sim) AS sim,
+               (array_agg(text ORDER BY sim DESC))[1:{per_doc}] AS passages
+        FROM hits
+        GROUP BY decision_id
+    )
+    SELECT
+        d.id, d.title, d.decision, d.summary, d.content, d.comments, d.tags, d.stage,
+        d.source, d.url, b.sim, d.fetched_at, b.passages
+    FROM best b
+    JOIN decisions d ON d.id = b.decision_id
+    ORDER BY b.sim DESC
+    LIMIT {limit};
+""")
+
+# Variants: rank_fn (bm25 with pg_bm25, else ts_rank) and lang; tsq appears twice -> two %s
+register(LEXICAL, """
+    SELECT
+        id, title, decision, summary, content, comments, tags, stage, source, url,
+        0.0 AS sim, fetched_at,
+        {rank_fn}(TSV, TSQ) AS bm25_score
+    FROM decisions
+    WHERE TSV @@ TSQ
+    ORDER BY bm25_score DESC
+    LIMIT {limit};
+""".replace("TSV", _TS_VECTOR).replace("TSQ", _TS_QUERY))
+
+register(KEYWORD, """
+    SELECT
+        id, title, decision, summary, content, comments, tags, stage, source, url,
+        0.0 AS sim, fetched_at
+    FROM decisions
+    WHERE (title ILIKE ANY(%s) OR decision ILIKE ANY(%s) OR content ILIKE ANY(%s))
+    ORDER BY fetched_at DESC NULLS LAST
+    LIMIT {limit};
+""")
@@ -1,14 +1,37 @@
 # utils/rate_limiter.py
+"""
+Rate limiting with GCRA (generic cell rate algorithm).
+
+Each client key stores a single number, its theoretical arrival time (TAT), so
+every check is O(1) regardless of traffic. A class allows `requests` per
+`window` with bursts of up to `requests`.
+
+Backends:
+- MemoryBackend: per-process dict, idle keys (TAT in the past) are swept.
+- RedisBackend: one atomic Lua script per check, shared by all workers; falls
+  back to memory while the "redis" circuit breaker is open.
+
+RateLimitMiddleware applies RATE_LIMITS classes by path (/ask -> ask,
+/admin -> admin, everything else -> default) when RATE_LIMIT_ENABLED is set.
+It charges one unit per request; handlers that do N units of work (e.g.
+/ask/batch, one per question) charge the rest with charge_request().
+"""
 from __future__ import annotations
 
+import os
+import json
+import math
 import time
-import hashlib
-from typing import Dict, Optional, Tuple
-from collections import defaultdict
+import threading
+from typing import Any, Dict, Optional, Tuple
 from dataclasses import dataclass
 
 from fastapi import Request, HTTPException, status
-from fastapi.responses import JSONResponse
+
+from utils.circuit_breaker import get_breaker
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.rate_limiter")
 
 # Rate limiting configuration
 RATE_LIMITS = {
@@ -17,8 +40,12 @@ RATE_LIMITS = {
     "admin": {"requests": 1000, "window": 3600},   # 1000 admin requests per hour
 }
 
-# In-memory storage (use Redis in production)
-_rate_limit_storage: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() in ("1", "true", "yes")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "auto").lower()  # auto | memory | redis
+RATE_LIMIT_SWEEP_EVERY = int(os.getenv("RATE_LIMIT_SWEEP_EVERY", "1000"))
+
+# Paths never rate limited by the middleware
+_EXEMPT_PATHS = ("/health", "/ready", "/metrics", "/docs", "/openapi.json")
 
 
 @dataclass
@@ -27,95 +54,170 @@ class RateLimitInfo:
     remaining: int
     reset_time: int
     window: int
+    allowed: bool = True
+    retry_after: int = 0
+
+
+# ------------------------------------------------------------------------------
+# Backends: check(key, limit, window, cost) -> (allowed, tat, now)
+# cost=0 peeks without consuming.
+# ------------------------------------------------------------------------------
+class MemoryBackend:
+    """In-process GCRA state with periodic eviction of idle keys."""
+
+    def __init__(self, sweep_every: int = RATE_LIMIT_SWEEP_EVERY):
+        self._tat: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._sweep_every = max(1, sweep_every)
+
+    def _sweep(self, now: float) -> None:
+        # A key whose TAT has passed has a full allowance again: same as absent
+        idle = [k for k, tat in self._tat.items() if tat <= now]
+        for k in idle:
+            del self._tat[k]
+
+    def check(self, key: str, limit: int, window: int, cost: int = 1) -> Tuple[bool, float, float]:
+        interval = window / limit
+        with self._lock:
+            now = time.time()
+            self._checks += 1
+            if self._checks % self._sweep_every == 0:
+                self._sweep(now)
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + interval * cost
+            if new_tat - window > now:
+                return False, tat, now
+            if cost:
+                self._tat[key] = new_tat
+            return True, new_tat, now
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then tat = now end
+local new_tat = tat + interval * cost
+if new_tat - window > now then
+  return {0, tostring(tat), tostring(now)}
+end
+if cost > 0 then
+  redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+end
+return {1, tostring(new_tat), tostring(now)}
+"""
+
+
+class RedisBackend:
+    """GCRA in one Lua script so all workers share limits atomically."""
+
+    def __init__(self, client, prefix: Optional[str] = None, fallback: Optional[MemoryBackend] = None):
+        self._client = client
+        self._script = client.register_script(_GCRA_LUA)
+        self._prefix = prefix or f"startupscout:{os.getenv('ENV', 'dev')}:rl:"
+        self._fallback = fallback or MemoryBackend()
+        self._breaker = get_breaker("redis")
+
+    def check(self, key: str, limit: int, window: int, cost: int = 1) -> Tuple[bool, float, float]:
+        if self._breaker.allow():
+            try:
+                allowed, tat, now = self._script(keys=[self._prefix + key], args=[window / limit, window, cost])
+                self._breaker.record_success()
+                return bool(int(allowed)), float(tat), float(now)
+            except Exception as e:
+                self._breaker.record_failure()
+                logger.warning(f"Redis rate limit check failed, using memory: {e}")
+        return self._fallback.check(key, limit, window, cost)
+
+
+def _default_backend():
+    url = os.getenv("REDIS_URL")
+    if RATE_LIMIT_BACKEND == "memory" or (RATE_LIMIT_BACKEND == "auto" and not url):
+        return MemoryBackend()
+    try:
+        import redis
+        client = redis.from_url(url, decode_responses=True)
+        client.ping()
+        logger.info("Rate limiter using Redis backend.")
+        return RedisBackend(client)
+    except Exception as e:
+        logger.warning(f"Redis unavailable for rate limiting, using memory: {e}")
+        return MemoryBackend()
 
 
 class RateLimiter:
-    """Simple in-memory rate limiter with sliding window."""
-    
-    def __init__(self, storage: Optional[Dict] = None):
-        self.storage = storage or _rate_limit_storage
-    
+    """GCRA rate limiter over a pluggable backend (memory or Redis)."""
+
+    def __init__(self, backend: Optional[Any] = None):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = _default_backend()
+        return self._backend
+
     def _get_key(self, request: Request, user_id: Optional[str] = None) -> str:
         """Generate a unique key for rate limiting."""
         if user_id:
             return f"user:{user_id}"
-        
+
         # Fallback to IP-based limiting
         client_ip = request.client.host if request.client else "unknown"
         return f"ip:{client_ip}"
-    
-    def _cleanup_expired_entries(self, key: str, window: int):
-        """Remove expired entries from the rate limit storage."""
-        current_time = time.time()
-        cutoff_time = current_time - window
-        
-        # Remove entries older than the window
-        expired_keys = [
-            timestamp_str for timestamp_str in self.storage[key].keys()
-            if float(timestamp_str) < cutoff_time
-        ]
-        
-        for expired_key in expired_keys:
-            del self.storage[key][expired_key]
-    
-    def check_rate_limit(
-        self, 
-        request: Request, 
-        limit_type: str = "default",
-        user_id: Optional[str] = None
-    ) -> RateLimitInfo:
-        """Check if request is within rate limits."""
+
+    def check_key(self, key: str, limit_type: str = "default", cost: int = 1) -> RateLimitInfo:
+        """Check (and with cost=1 consume) one request for a client key."""
         limits = RATE_LIMITS.get(limit_type, RATE_LIMITS["default"])
         limit = limits["requests"]
         window = limits["window"]
-        
-        key = self._get_key(request, user_id)
-        current_time = time.time()
-        
-        # Cleanup expired entries
-        self._cleanup_expired_entries(key, window)
-        
-        # Count current requests in the window
-        current_requests = len(self.storage[key])
-        
-        # Check if limit exceeded
-        if current_requests >= limit:
-            # Calculate reset time (oldest request + window)
-            oldest_timestamp = min(float(ts) for ts in self.storage[key].keys())
-            reset_time = int(oldest_timestamp + window)
-            
+        interval = window / limit
+
+        allowed, tat, now = self.backend.check(f"{limit_type}:{key}", limit, window, cost)
+        if not allowed:
             return RateLimitInfo(
                 limit=limit,
                 remaining=0,
-                reset_time=reset_time,
-                window=window
+                reset_time=int(math.ceil(tat)),
+                window=window,
+                allowed=False,
+                retry_after=max(1, int(math.ceil(tat + interval - window - now))),
             )
-        
-        # Add current request
-        self.storage[key][str(current_time)] = current_time
-        
-        # Calculate remaining requests
-        remaining = max(0, limit - current_requests - 1)
-        
-        # Calculate reset time (current time + window)
-        reset_time = int(current_time + window)
-        
+        remaining = max(0, min(limit, int((window - (tat - now)) // interval)))
         return RateLimitInfo(
             limit=limit,
             remaining=remaining,
-            reset_time=reset_time,
-            window=window
+            reset_time=int(math.ceil(tat)),
+            window=window,
         )
-    
+
+    def check_rate_limit(
+        self,
+        request: Request,
+        limit_type: str = "default",
+        user_id: Optional[str] = None
+    ) -> RateLimitInfo:
+        """Check if request is within rate limits (counts the request)."""
+        return self.check_key(self._get_key(request, user_id), limit_type)
+
     def is_allowed(
-        self, 
-        request: Request, 
+        self,
+        request: Request,
         limit_type: str = "default",
         user_id: Optional[str] = None
     ) -> bool:
         """Check if request is allowed without throwing exception."""
-        rate_limit_info = self.check_rate_limit(request, limit_type, user_id)
-        return rate_limit_info.remaining > 0
+        return self.check_rate_limit(request, limit_type, user_id).allowed
 
 
 # Global rate limiter instance
@@ -132,21 +234,21 @@ def rate_limit_middleware(limit_type: str = "default"):
                 if isinstance(arg, Request):
                     request = arg
                     break
-            
+
             if not request:
                 for value in kwargs.values():
                     if isinstance(value, Request):
                         request = value
                         break
-            
+
             if not request:
                 # If no request found, skip rate limiting
                 return await func(*args, **kwargs)
-            
+
             # Check rate limit
             rate_limit_info = rate_limiter.check_rate_limit(request, limit_type)
-            
-            if rate_limit_info.remaining <= 0:
+
+            if not rate_limit_info.allowed:
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     detail={
@@ -154,22 +256,128 @@ def rate_limit_middleware(limit_type: str = "default"):
                         "limit": rate_limit_info.limit,
                         "window": rate_limit_info.window,
                         "reset_time": rate_limit_info.reset_time
-                    }
+                    },
+                    headers={"Retry-After": str(rate_limit_info.retry_after)},
                 )
-            
+
             # Add rate limit headers
             response = await func(*args, **kwargs)
             if hasattr(response, 'headers'):
                 response.headers["X-RateLimit-Limit"] = str(rate_limit_info.limit)
                 response.headers["X-RateLimit-Remaining"] = str(rate_limit_info.remaining)
                 response.headers["X-RateLimit-Reset"] = str(rate_limit_info.reset_time)
-            
+
             return response
-        
+
         return wrapper
     return decorator
 
 
 def get_rate_limit_info(request: Request, limit_type: str = "default", user_id: Optional[str] = None) -> RateLimitInfo:
     """Get current rate limit information without incrementing the counter."""
-    return rate_limiter.check_rate_limit(request, limit_type, user_id)
+    return rate_limiter.check_key(rate_limiter._get_key(request, user_id), limit_type, cost=0)
+
+
+# ------------------------------------------------------------------------------
+# ASGI middleware
+# ------------------------------------------------------------------------------
+def limit_type_for_path(path: str) -> str:
+    if path == "/ask" or path.startswith("/ask/"):
+        return "ask"
+    if path.startswith("/admin"):
+        return "admin"
+    return "default"
+
+
+def _exceeded_detail(info: RateLimitInfo) -> Dict[str, Any]:
+    return {
+        "error": "Rate limit exceeded",
+        "limit": info.limit,
+        "window": info.window,
+        "reset_time": info.reset_time,
+    }
+
+
+def charge_request(request: Request, cost: int) -> None:
+    """
+    Charge `cost` more units against the limit the middleware admitted this
+    request under; 429 if they don't fit. No-op when rate limiting is off.
+    """
+    charge = request.scope.get("state", {}).get("rate_limit")
+    if charge is None or cost <= 0:
+        return
+    info = charge["limiter"].check_key(charge["key"], charge["limit_type"], cost)
+    if not info.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=_exceeded_detail(info),
+            headers={"Retry-After": str(info.retry_after)},
+        )
+    charge["info"] = info
+
+
+def _headers(info: RateLimitInfo) -> list:
+    return [
+        (b"x-ratelimit-limit", str(info.limit).encode()),
+        (b"x-ratelimit-remaining", str(info.remaining).encode()),
+        (b"x-ratelimit-reset", str(info.reset_time).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware: one backend check per request, 429 with Retry-After
+    when over the limit, X-RateLimit-* headers otherwise. Authenticated
+    requests (x-auth-token) are keyed by user, others by client IP.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, enabled: Optional[bool] = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.enabled = RATE_LIMIT_ENABLED if enabled is None else enabled
+
+    def _client_key(self, scope) -> str:
+        for name, value in scope.get("headers") or ():
+            if name == b"x-auth-token" and value:
+                from utils.auth import decode_user_id, verify_jwt  # avoid import cycle at module load
+                uid = decode_user_id(verify_jwt(value.decode("latin-1")))
+                if uid is not None:
+                    return f"user:{uid}"
+                break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if not self.enabled or scope["type"] != "http" or scope.get("method") == "OPTIONS" \
+                or path.startswith(_EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        key, limit_type = self._client_key(scope), limit_type_for_path(path)
+        info = self.limiter.check_key(key, limit_type)
+        if not info.allowed:
+            body = json.dumps({"detail": _exceeded_detail(info)}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(info.retry_after).encode()),
+                    *_headers(info),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # request.state.rate_limit: lets charge_request() bill more units to the same key
+        charge = {"limiter": self.limiter, "key": key, "limit_type": limit_type, "info": info}
+        scope.setdefault("state", {})["rate_limit"] = charge
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers") or []) + _headers(charge["info"])}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
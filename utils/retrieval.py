@@ -0,0 +1,268 @@
+# utils/retrieval.py
+"""
+Hybrid candidate retrieval shared by /ask and /search: vector ANN (document,
+two-stage or passage mode) + BM25/ts_rank + keyword ILIKE, fused with RRF,
+the keyword reranker, similarity, recency and an evidence nudge.
+"""
+from __future__ import annotations
+
+import os
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.cross_rerank import rerank as cross_rerank
+from utils.db import PG_STMT_TIMEOUT_MS, db_capabilities, probe_capabilities, transaction_pooler
+from utils.embeddings import get_short_embedding_dim, shorten_embedding
+from utils.logger import setup_logger
+from utils.queries import KEYWORD, LEXICAL, VECTOR_CHUNK, VECTOR_DOC, VECTOR_SHORT, run
+from utils.rerank import keyword_score, evidence_bonus
+from utils.stage_timing import timed
+
+logger = setup_logger("startupscout.retrieval")
+
+
+def prepare_session(cur) -> None:
+    """
+    statement_timeout is set once per pooled connection; only behind a
+    transaction pooler does it still need a SET LOCAL per request.
+    """
+    if transaction_pooler():
+        cur.execute(f"SET LOCAL statement_timeout = '{PG_STMT_TIMEOUT_MS}ms';")
+
+
+def recency_score(fetched_at) -> float:
+    if not fetched_at or not isinstance(fetched_at, datetime):
+        return 0.0
+    try:
+        fa = fetched_at if fetched_at.tzinfo else fetched_at.replace(tzinfo=timezone.utc)
+        age_days = (datetime.now(timezone.utc) - fa).days
+    except Exception:
+        return 0.0
+    if age_days <= 0:
+        return 1.0
+    if age_days >= 365:
+        return 0.3
+    return max(0.3, 1.0 - (age_days / 365.0) * 0.7)
+
+
+def chunk_search(cur, q_vec: List[float], fetch_k: int) -> Tuple[List[tuple], Dict[Any, List[str]]]:
+    """
+    Passage-level ANN over `decision_chunks`, aggregated to documents by max
+    similarity. Returns decision rows (same shape as the other stages) and the
+    best-matching passages per decision id.
+    """
+    oversample = max(1, int(os.getenv("CHUNK_OVERSAMPLE", "4")))
+    per_doc = max(1, int(os.getenv("CHUNK_PASSAGES_PER_DOC", "2")))
+    run(cur, VECTOR_CHUNK, (q_vec, q_vec), candidates=fetch_k * oversample, per_doc=per_doc, limit=fetch_k)
+    rows = cur.fetchall()
+    passages = {r[0]: list(r[12] or []) for r in rows}
+    return [r[:12] for r in rows], passages
+
+
+@timed("vector")
+def vector_search(cur, q_vec: List[float], fetch_k: int) -> Tuple[List[tuple], Dict[Any, List[str]]]:
+    """
+    Vector ANN stage. RETRIEVAL_MODE=chunk searches passages instead of whole
+    documents. With EMBED_SHORT_DIM set, candidates come from the shortened
+    `embedding_short` index (oversampled) and are re-scored with the
+    full-size vectors; otherwise a single pass over `embedding`.
+    """
+    if os.getenv("RETRIEVAL_MODE", "doc").lower() == "chunk":
+        return chunk_search(cur, q_vec, fetch_k)
+
+    short_dim = get_short_embedding_dim()
+    if not short_dim:
+        run(cur, VECTOR_DOC, (q_vec, q_vec), limit=fetch_k)
+        return cur.fetchall(), {}
+
+    short_vec = shorten_embedding(q_vec, short_dim)
+    oversample = max(1, int(os.getenv("EMBED_SHORT_OVERSAMPLE", "4")))
+    run(cur, VECTOR_SHORT, (short_vec, q_vec, q_vec), candidates=fetch_k * oversample, limit=fetch_k)
+    return cur.fetchall(), {}
+
+
+def bm25_available(cur) -> bool:
+    """From the cached capability probe; probes on `cur` only if startup's didn't run."""
+    caps = db_capabilities()
+    if caps is None:
+        try:
+            caps = probe_capabilities(cur)
+        except Exception:
+            return False
+    return caps["bm25"]
+
+
+@timed("lexical")
+def lexical_search(cur, q: str, fetch_k: int) -> List[tuple]:
+    """BM25 (if the pg_bm25 extension is present) else ts_rank full-text search."""
+    rank_fn = "bm25" if bm25_available(cur) else "ts_rank"
+    run(cur, LEXICAL, (q, q), rank_fn=rank_fn, lang=os.getenv("TS_LANG", "english"), limit=fetch_k)
+    return cur.fetchall()
+
+
+@timed("keyword")
+def keyword_search(cur, kw_patterns: List[str], fetch_k: int) -> List[tuple]:
+    """Broad ILIKE match over title/decision/content, newest first."""
+    run(cur, KEYWORD, (kw_patterns, kw_patterns, kw_patterns), limit=fetch_k)
+    return cur.fetchall()
+
+
+def keyword_patterns(q: str, kws: List[str]) -> List[str]:
+    return [f"%{kw}%" for kw in kws][:8] or [f"%{q[:32]}%"]
+
+
+def fetch_candidates(
+    cur, q: str, q_vec: Optional[List[float]], kws: List[str], fetch_k: int
+) -> Tuple[List[tuple], List[tuple], List[tuple], Dict[Any, List[str]]]:
+    """
+    Run the three candidate stages on one cursor.
+    Returns (vec_rows, bm25_rows, kw_rows, passages_by_id).
+    q_vec=None (embeddings unavailable) skips the vector stage: lexical only.
+    """
+    prepare_session(cur)
+
+    if q_vec is None:
+        logger.warning("No usable query embedding; running lexical-only retrieval")
+        vec_rows, passages = [], {}
+    else:
+        logger.debug("Executing vector similarity search...")
+        vec_rows, passages = vector_search(cur, q_vec, fetch_k)
+        logger.debug("Vector search returned %d results", len(vec_rows))
+
+    logger.debug("Executing BM25/ts_rank search...")
+    bm25_rows = lexical_search(cur, q, fetch_k)
+    logger.debug("BM25/ts_rank search returned %d results", len(bm25_rows))
+
+    logger.debug("Executing keyword ILIKE search...")
+    kw_rows = keyword_search(cur, keyword_patterns(q, kws), fetch_k)
+    logger.debug("Keyword search returned %d results", len(kw_rows))
+
+    return vec_rows, bm25_rows, kw_rows, passages
+
+
+def fetch_candidates_batch(
+    cur, items: List[Tuple[str, Optional[List[float]], List[str]]], fetch_k: int
+) -> List[Tuple[List[tuple], List[tuple], List[tuple], Dict[Any, List[str]]]]:
+    """
+    fetch_candidates() for many questions on one cursor (/ask/batch): one
+    session setup, and a lexical or keyword query whose inputs match an
+    earlier question's (same text up to case, same ILIKE pattern set) is run
+    once and its rows shared. Returns one result per item, in order.
+    """
+    prepare_session(cur)
+    lexical: Dict[str, List[tuple]] = {}
+    keyword: Dict[Tuple[str, ...], List[tuple]] = {}
+    out = []
+    for q, q_vec, kws in items:
+        vec_rows, passages = vector_search(cur, q_vec, fetch_k) if q_vec is not None else ([], {})
+        lex_key = " ".join(q.lower().split())
+        if lex_key not in lexical:
+            lexical[lex_key] = lexical_search(cur, q, fetch_k)
+        patterns = keyword_patterns(q, kws)
+        kw_key = tuple(sorted(set(patterns)))
+        if kw_key not in keyword:
+            keyword[kw_key] = keyword_search(cur, patterns, fetch_k)
+        out.append((vec_rows, lexical[lex_key], keyword[kw_key], passages))
+    logger.debug(
+        "Batch retrieval: %d questions, %d lexical and %d keyword queries",
+        len(items), len(lexical), len(keyword),
+    )
+    return out
+
+
+def row_key(r: tuple) -> Any:
+    """Dedup key across stages: url, else (title, source)."""
+    return r[9] or (r[1], r[8])
+
+
+@timed("rerank")
+def rank_candidates(
+    q: str,
+    kws: List[str],
+    vec_rows: List[tuple],
+    bm25_rows: List[tuple],
+    kw_rows: List[tuple],
+    rrf_k: int = 60,
+) -> List[Tuple[float, tuple]]:
+    """Merge the stage results and return [(score, row)] sorted best-first."""
+    # Build rank maps for RRF
+    def _rank_map(rows: List[tuple]) -> Dict[Any, int]:
+        return {row_key(r): i + 1 for i, r in enumerate(rows)}
+
+    vec_rank = _rank_map(vec_rows)
+    bm25_rank = _rank_map(bm25_rows)
+    kw_rank = _rank_map(kw_rows)
+
+    # Merge by key and keep best vector sim per key
+    merged: Dict[Any, Dict[str, Any]] = {}
+    for source_rows, tag in [(vec_rows, "vec"), (bm25_rows, "bm25"), (kw_rows, "kw")]:
+        for r in source_rows:
+            key = row_key(r)
+            if key not in merged:
+                merged[key] = {
+                    "row": r,
+                    "sim": float(r[10]),
+                    "bm25": 0.0,
+                    "vec_rank": vec_rank.get(key),
+                    "bm25_rank": bm25_rank.get(key),
+                    "kw_rank": kw_rank.get(key),
+                }
+            else:
+                if float(r[10]) > merged[key]["sim"]:
+                    merged[key]["row"] = r
+                    merged[key]["sim"] = float(r[10])
+                if tag == "vec":
+                    merged[key]["vec_rank"] = vec_rank.get(key)
+                elif tag == "bm25":
+                    merged[key]["bm25_rank"] = bm25_rank.get(key)
+                else:
+                    merged[key]["kw_rank"] = kw_rank.get(key)
+
+    # Attach bm25 score
+    bm25_scores: Dict[Any, float] = {}
+    for r in bm25_rows:
+        bm25_scores[row_key(r)] = float(r[12]) if len(r) > 12 and r[12] is not None else 0.0
+    for k in merged.keys():
+        merged[k]["bm25"] = bm25_scores.get(k, 0.0)
+
+    # Cross-encoder inputs
+    candidates = list(merged.values())
+    logger.debug("Processing %d candidates for reranking", len(candidates))
+    blobs: List[Tuple[str, str]] = []
+    for c in candidates:
+        r = c["row"]
+        title, decision, summary, content = r[1], r[2], r[3], r[4]
+        blob = " ".join(t for t in (decision, summary, content) if t)[:2000]
+        blobs.append((title or "", blob or ""))
+
+    try:
+        ce_scores = cross_rerank(q, blobs)  # 0..1 list aligned to candidates
+    except Exception as e:
+        logger.warning("Cross-encoder rerank failed, falling back to zeros: %s", e)
+        ce_scores = [0.0] * len(candidates)
+
+    def rrf(rank: Optional[int]) -> float:
+        if rank is None:
+            return 0.0
+        return 1.0 / (rrf_k + rank)
+
+    scored: List[Tuple[float, tuple]] = []
+    for (c, ce) in zip(candidates, ce_scores):
+        r = c["row"]
+        title, decision, summary, content = r[1], r[2], r[3], r[4]
+        sim = float(c["sim"])
+        rec = recency_score(r[11])
+        text = " ".join(t for t in (title, decision, summary, content) if t)
+        kw = keyword_score(text, kws)               # 0..1
+        ev = evidence_bonus(text)                   # 0..0.05
+        rrf_score = rrf(c["vec_rank"]) + rrf(c["bm25_rank"]) + rrf(c["kw_rank"])
+
+        # Weighted hybrid + small evidence nudge
+        score = (0.50 * ce) + (0.22 * rrf_score) + (0.18 * sim) + (0.07 * kw) + (0.03 * rec) + ev
+        scored.append((score, r))
+
+    scored.sort(key=lambda x: x[0], reverse=True)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Top 3 scores: %s", [f"{s[0]:.3f}" for s in scored[:3]])
+    return scored
@@ -0,0 +1,162 @@
+# utils/stage_timing.py
+"""
+Per-stage latency for /ask and /search.
+
+`with stage("vector"):` (or `@timed("rerank")`) observes the elapsed time in
+the startupscout_stage_duration_seconds histogram and, inside a request,
+adds it to that request's timings. ServerTimingMiddleware returns those as a
+`Server-Timing` header, so browser devtools and curl -v show where one
+request's time went while /metrics has the distribution, and logs them as
+one `request ...` summary line (LOG_REQUEST_SUMMARY).
+
+The per-request list lives in a contextvar set by the middleware; handlers
+running in the threadpool see the same list object, so stages timed in
+worker threads still land on the right response.
+
+Every stage also accumulates the CPU time of its thread (time.thread_time),
+always on: a stage with wall >> cpu is waiting on I/O or a lock, one with
+cpu close to wall is burning the GIL.
+"""
+from __future__ import annotations
+
+import os
+import time
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import setup_logger
+from utils.observability.langfuse import record_stage_span
+from utils.prometheus_metrics import record_stage, record_stage_cpu
+
+logger = setup_logger("startupscout.request")
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("1", "true", "yes")
+LOG_REQUEST_SUMMARY = os.getenv("LOG_REQUEST_SUMMARY", "true").lower() in ("1", "true", "yes")
+
+_TIMINGS: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stage_timings", default=None)
+
+# stage -> [count, wall seconds, cpu seconds]
+_TOTALS: Dict[str, List[float]] = {}
+_LOCK = threading.Lock()
+
+
+class StageTimer:
+    __slots__ = ("name", "elapsed", "cpu")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.elapsed = 0.0
+        self.cpu = 0.0
+
+
+@contextmanager
+def stage(name: str) -> Iterator[StageTimer]:
+    """Time a block; `.elapsed`/`.cpu` (seconds) are set on the yielded timer when it exits."""
+    timer = StageTimer(name)
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield timer
+    finally:
+        timer.elapsed = time.perf_counter() - start
+        timer.cpu = time.thread_time() - cpu_start
+        record_stage(name, timer.elapsed)
+        record_stage_cpu(name, timer.cpu)
+        with _LOCK:
+            totals = _TOTALS.setdefault(name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += timer.elapsed
+            totals[2] += timer.cpu
+        timings = _TIMINGS.get()
+        if timings is not None:
+            timings.append((name, timer.elapsed))
+        record_stage_span(name, time.time() - timer.elapsed, timer.elapsed)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of stage()."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_timings() -> Dict[str, float]:
+    """Seconds per stage for the current request (repeated stages are summed)."""
+    totals: Dict[str, float] = {}
+    for name, elapsed in _TIMINGS.get() or ():
+        totals[name] = totals.get(name, 0.0) + elapsed
+    return totals
+
+
+def stage_get_stats() -> Dict[str, Dict[str, Any]]:
+    """Return per-stage count, wall/cpu totals and cpu share for /stats endpoint."""
+    with _LOCK:
+        snapshot = {name: list(t) for name, t in _TOTALS.items()}
+    return {
+        name: {
+            "count": int(count),
+            "wall_sec": round(wall, 3),
+            "cpu_sec": round(cpu, 3),
+            "cpu_ratio": round(cpu / wall, 3) if wall > 0 else 0.0,
+        }
+        for name, (count, wall, cpu) in snapshot.items()
+    }
+
+
+def server_timing_header(totals: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+def request_summary(method: str, path: str, status: Optional[int], totals: Dict[str, float]) -> str:
+    """One logfmt line per request: `request method=GET path=/ask status=200 total_ms=.. embed_ms=..`."""
+    fields = " ".join(f"{name}_ms={seconds * 1000:.1f}" for name, seconds in totals.items())
+    return f"request method={method} path={path} status={status} {fields}"
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware: collects the stages timed while handling a request,
+    adds `Server-Timing: embed;dur=.., vector;dur=.., total;dur=..` to the
+    response (stages finished before the response starts) and, for requests
+    that timed any stage, logs one summary line once the body is sent.
+    """
+
+    def __init__(self, app, enabled: Optional[bool] = None, summary: Optional[bool] = None):
+        self.app = app
+        self.enabled = SERVER_TIMING_ENABLED if enabled is None else enabled
+        self.summary = LOG_REQUEST_SUMMARY if summary is None else summary
+
+    async def __call__(self, scope, receive, send):
+        if not (self.enabled or self.summary) or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _TIMINGS.set([])
+        start = time.perf_counter()
+        status: List[Optional[int]] = [None]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message.get("status")
+                if self.enabled:
+                    totals = request_timings()
+                    totals["total"] = time.perf_counter() - start
+                    headers = list(message.get("headers") or [])
+                    headers.append((b"server-timing", server_timing_header(totals).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if self.summary and _TIMINGS.get():
+                totals = request_timings()
+                totals["total"] = time.perf_counter() - start
+                logger.info(request_summary(scope.get("method", ""), scope.get("path", ""), status[0], totals))
+            _TIMINGS.reset(token)
@@ -9,7 +9,7 @@ from datetime import datetime, timedelta
 from psycopg_pool import ConnectionPool
 from passlib.hash import pbkdf2_sha256
 
-from utils.auth import hash_password, verify_password, create_jwt, verify_jwt
+from utils.auth import hash_password, verify_password, create_jwt, verify_jwt, decode_user_id
 from utils.rate_limiter import get_rate_limit_info, RateLimitInfo
 from utils.logger import setup_logger
 
@@ -158,7 +158,7 @@ class UserManager:
             if not payload:
                 return None
             
-            user_id = payload.get("user_id")
+            user_id = decode_user_id(payload)
             if not user_id:
                 return None
             
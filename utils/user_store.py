@@ -0,0 +1,96 @@
+# utils/user_store.py
+"""
+User lookups for /auth on the shared pool.
+
+get_user() backs get_current_user and keeps a short-TTL in-process cache, so
+an authenticated request costs a verified-token lookup plus a dict lookup.
+Writes to a user invalidate its entry.
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from utils.db import get_pool, pool_connection
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.user_store")
+
+USER_CACHE_TTL_SEC = int(os.getenv("USER_CACHE_TTL_SEC", "30"))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", "10000"))
+
+# user_id -> (user or None, expires_at monotonic); misses are cached too
+_USERS: "OrderedDict[int, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0}
+
+
+class EmailTaken(Exception):
+    pass
+
+
+def _fetchone(sql: str, params: Tuple[Any, ...]) -> Optional[tuple]:
+    pool = get_pool()
+    if pool is None:
+        raise RuntimeError("Database pool unavailable")
+    with pool_connection(pool) as conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchone()
+
+
+def get_credentials(email: str) -> Optional[Tuple[int, str]]:
+    """(user_id, password_hash) for login; None if unknown."""
+    row = _fetchone("SELECT id, password_hash FROM users WHERE email = %s", (email,))
+    return (int(row[0]), row[1]) if row else None
+
+
+def create_user(email: str, password_hash: str) -> int:
+    """Insert a user; raises EmailTaken if the email is registered."""
+    row = _fetchone(
+        """
+        INSERT INTO users (email, password_hash) VALUES (%s, %s)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id
+        """,
+        (email, password_hash),
+    )
+    if not row:
+        raise EmailTaken(email)
+    uid = int(row[0])
+    invalidate_user(uid)
+    return uid
+
+
+def get_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """{"id", "email"} for an existing user, or None. Cached for USER_CACHE_TTL_SEC."""
+    now = time.monotonic()
+    with _LOCK:
+        entry = _USERS.get(user_id)
+        if entry is not None and now < entry[1]:
+            _USERS.move_to_end(user_id)
+            _STATS["hits"] += 1
+            return entry[0]
+        _STATS["misses"] += 1
+
+    row = _fetchone("SELECT id, email FROM users WHERE id = %s", (user_id,))
+    user = {"id": int(row[0]), "email": row[1]} if row else None
+    with _LOCK:
+        _USERS[user_id] = (user, time.monotonic() + USER_CACHE_TTL_SEC)
+        _USERS.move_to_end(user_id)
+        while len(_USERS) > USER_CACHE_MAX:
+            _USERS.popitem(last=False)
+    return user
+
+
+def invalidate_user(user_id: int) -> None:
+    with _LOCK:
+        _USERS.pop(user_id, None)
+
+
+def user_store_get_stats() -> Dict[str, Any]:
+    """Return user cache stats for /stats endpoint."""
+    with _LOCK:
+        return {**_STATS, "cached_users": len(_USERS)}
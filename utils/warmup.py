@@ -0,0 +1,171 @@
+# utils/warmup.py
+"""
+Cache warm-up from the historical query log.
+
+Reads the most frequent recent user questions (chat_messages, falling back to
+rag_events), pre-embeds them in batches so the embedding lru_cache is hot, and
+optionally precomputes /ask answers into the answer cache. Runs once in the
+background at startup and then every WARMUP_INTERVAL_SEC.
+"""
+from __future__ import annotations
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from psycopg_pool import ConnectionPool
+
+from utils.cache import cache_put_question
+from utils.embeddings import get_embeddings
+from utils.logger import setup_logger
+
+logger = setup_logger("startupscout.warmup")
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "100"))
+WARMUP_LOOKBACK_DAYS = int(os.getenv("WARMUP_LOOKBACK_DAYS", "7"))
+WARMUP_INTERVAL_SEC = int(os.getenv("WARMUP_INTERVAL_SEC", "1800"))
+WARMUP_EMBED_BATCH = int(os.getenv("WARMUP_EMBED_BATCH", "64"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "2"))
+WARMUP_PRECOMPUTE_ANSWERS = os.getenv("WARMUP_PRECOMPUTE_ANSWERS", "false").lower() in ("1", "true", "yes")
+WARMUP_ANSWER_TTL_SEC = int(os.getenv("WARMUP_ANSWER_TTL_SEC", str(WARMUP_INTERVAL_SEC)))
+
+_STATS: Dict[str, Any] = {
+    "enabled": WARMUP_ENABLED,
+    "running": False,
+    "runs": 0,
+    "source": None,
+    "questions": 0,
+    "embedded": 0,
+    "answers_cached": 0,
+    "failures": 0,
+    "last_run_at": None,
+    "last_duration_ms": None,
+}
+_STATS_LOCK = threading.Lock()
+_STOP = threading.Event()
+_THREAD: Optional[threading.Thread] = None
+
+
+def _bump(**counts: int) -> None:
+    with _STATS_LOCK:
+        for k, v in counts.items():
+            _STATS[k] += v
+
+
+def _set(**values: Any) -> None:
+    with _STATS_LOCK:
+        _STATS.update(values)
+
+
+def warmup_get_stats() -> Dict[str, Any]:
+    """Return warm-up progress for /stats endpoint."""
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def top_questions(pool: ConnectionPool, limit: int = WARMUP_TOP_N,
+                  days: int = WARMUP_LOOKBACK_DAYS) -> Tuple[List[str], str]:
+    """Most frequent recent questions, from chat history or else rag_events."""
+    with pool.connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT MIN(content), COUNT(*) AS n
+            FROM chat_messages
+            WHERE role = 'user' AND created_at > NOW() - make_interval(days => %s)
+            GROUP BY lower(content)
+            ORDER BY n DESC, MAX(id) DESC
+            LIMIT %s
+            """,
+            (days, limit),
+        )
+        rows = cur.fetchall()
+        if rows:
+            return [r[0] for r in rows], "chat_messages"
+
+        cur.execute(
+            """
+            SELECT MIN(question), COUNT(*) AS n
+            FROM rag_events
+            WHERE question IS NOT NULL AND ts > NOW() - make_interval(days => %s)
+            GROUP BY lower(question)
+            ORDER BY n DESC, MAX(id) DESC
+            LIMIT %s
+            """,
+            (days, limit),
+        )
+        return [r[0] for r in cur.fetchall()], "rag_events"
+
+
+def run_warmup(pool: ConnectionPool,
+               answer_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+    """
+    One warm-up pass. answer_fn(question) returns an /ask-shaped result (or
+    None to skip) and is only used when WARMUP_PRECOMPUTE_ANSWERS is set.
+    """
+    start = time.time()
+    _set(running=True)
+    try:
+        questions, source = top_questions(pool)
+        questions = [" ".join(q.split()) for q in questions if q and q.strip()]
+        _set(source=source, questions=len(questions))
+        logger.info(f"Warm-up: {len(questions)} questions from {source}")
+
+        for i in range(0, len(questions), WARMUP_EMBED_BATCH):
+            if _STOP.is_set():
+                break
+            batch = questions[i:i + WARMUP_EMBED_BATCH]
+            try:
+                get_embeddings(batch)
+                _bump(embedded=len(batch))
+            except Exception as e:
+                _bump(failures=len(batch))
+                logger.warning("Warm-up embedding batch failed: %s", e)
+
+        if WARMUP_PRECOMPUTE_ANSWERS and answer_fn is not None:
+            def _one(q: str) -> None:
+                if _STOP.is_set():
+                    return
+                try:
+                    result = answer_fn(q)
+                    if result:
+                        cache_put_question("ask", q, result, WARMUP_ANSWER_TTL_SEC)
+                        _bump(answers_cached=1)
+                except Exception as e:
+                    _bump(failures=1)
+                    logger.warning("Warm-up answer failed: %s", e)
+
+            with ThreadPoolExecutor(max_workers=max(1, WARMUP_CONCURRENCY),
+                                    thread_name_prefix="warmup") as ex:
+                list(ex.map(_one, questions))
+    except Exception as e:
+        _bump(failures=1)
+        logger.warning("Warm-up run failed: %s", e)
+    finally:
+        _bump(runs=1)
+        _set(running=False, last_run_at=int(time.time()),
+             last_duration_ms=int((time.time() - start) * 1000))
+    return warmup_get_stats()
+
+
+def start_warmup(pool: Optional[ConnectionPool],
+                 answer_fn: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None) -> None:
+    """Start the background warm-up loop (first pass immediately)."""
+    global _THREAD
+    if not WARMUP_ENABLED or pool is None or (_THREAD is not None and _THREAD.is_alive()):
+        return
+    _STOP.clear()
+
+    def _loop() -> None:
+        while not _STOP.is_set():
+            run_warmup(pool, answer_fn)
+            _STOP.wait(WARMUP_INTERVAL_SEC)
+
+    _THREAD = threading.Thread(target=_loop, name="cache-warmup", daemon=True)
+    _THREAD.start()
+
+
+def stop_warmup() -> None:
+    _STOP.set()